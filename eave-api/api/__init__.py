@@ -1,8 +1,10 @@
 from .energy import calculate_energy_values
 from .environment import get_env_data
 from .mappings import *
-from .model import get_PUE_prediction
+from .model import get_PUE_prediction, get_PUE_prediction_batch, get_PUE_distribution, get_PUE_distribution_batch
+from .pipeline import PUERequest
 from .casual_model import CausalBNN
+from . import datastore
 
 import numpy as np
 import random
@@ -0,0 +1,287 @@
+import os
+import re
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .mappings import tdp_mapping, proc_tdp_mapp, proc_cores_map, host_proc_core_count_mapping
+from . import telemetry
+
+'''
+Hardware catalog: the processor, accelerator and system tables of mappings.py under canonical keys.
+
+A name resolves to a catalog entry in the first of these ways that succeeds:
+
+    exact       the name is spelled as in mappings.py                      (hash lookup)
+    normalized  normalize_name() equals that of an entry, i.e. it differs  (hash lookup)
+                only in case, trademark signs, punctuation, "NN-Core",
+                "Processor" or the clock speed
+    fuzzy       the entry whose name shares the most character trigrams     (inverted trigram index)
+                with it, if their Jaccard similarity is >= FUZZY_THRESHOLD
+                and they have the same model number (see model_number)
+    fallback    none; the fields take the dataset averages (DEFAULT_*)
+
+Case and spelling variants of one model in mappings.py ('INTEL(R) XEON(R) PLATINUM 8592+' and
+'Intel(R) Xeon(R) Platinum 8592+') are one entry. Exact names are looked up in a prebuilt index; the
+other resolutions are kept in an LRU of EAVE_CATALOG_CACHE_SIZE names per catalog. Every lookup counts
+a catalog.<kind>.<method> event, and fuzzy matches, fallbacks and entries without a field are
+recorded by name in report() and logged once, instead of silently using the averages. Names whose
+closest entry is a different SKU ('AMD EPYC 9554 64-Core' vs 'AMD EPYC 9654 96-Core') fall back and are
+listed with that entry under "rejected".
+'''
+
+CATALOG_CACHE_SIZE = int(os.environ.get("EAVE_CATALOG_CACHE_SIZE", 4096))
+
+# minimum trigram Jaccard similarity of a fuzzy match
+FUZZY_THRESHOLD = 0.6
+
+# fallbacks (dataset averages) for hardware missing from the mappings
+DEFAULT_TDP_ACC = 457.25
+DEFAULT_TDP_PROC = 342.69
+DEFAULT_CORES_PER_PROCESSOR = 62.56
+DEFAULT_HOST_PROC_CORE_COUNT = 63.21
+
+logger = logging.getLogger(__name__)
+
+_TRADEMARKS = re.compile(r"\((R|TM)\)|®|™", re.IGNORECASE)
+_NOISE = re.compile(r"\bCPU\s*@\s*[\d.]+\s*GHZ|@\s*[\d.]+\s*GHZ|\b\d+-CORE\b|\bPROCESSOR\b")
+_CORES = re.compile(r"\b(\d+)-CORE\b", re.IGNORECASE)
+
+
+def normalize_name(name):
+    """Canonical key of a hardware name: upper case, without trademark signs, core count, "Processor" and
+    clock speed, and with runs of punctuation and whitespace as one space."""
+    name = _TRADEMARKS.sub(" ", str(name)).upper()
+    name = _NOISE.sub(" ", name)
+    return " ".join(re.sub(r"[^0-9A-Z+.]+", " ", name).split())
+
+
+def model_number(name):
+    """The tokens of normalize_name(name) with a digit ('9554', 'H100', 'SXM5', '80GB'), and the core count
+    ("NN-Core", None if the name doesn't state one). Fuzzy matches must agree on both."""
+    cores = _CORES.search(str(name))
+    return frozenset(token for token in normalize_name(name).split() if any(c.isdigit() for c in token)), \
+        int(cores.group(1)) if cores else None
+
+
+def _same_model(number, other):
+    (tokens, cores), (other_tokens, other_cores) = number, other
+    return tokens == other_tokens and (cores is None or other_cores is None or cores == other_cores)
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Resolution:
+    __slots__ = ("name", "entry", "method", "score")
+    name: str               # the name looked up
+    entry: Optional[str]    # display name of the matched entry (None for a fallback)
+    method: str             # "exact", "normalized", "fuzzy" or "fallback"
+    score: float            # trigram similarity (1.0 for exact and normalized matches)
+
+
+class HardwareCatalog:
+    """
+    Entries of one kind of hardware with the fields from several name -> value mappings.
+
+    fields: {field: (mapping, default)}; entries missing from a mapping take its default for that field.
+    """
+
+    def __init__(self, kind, fields, cache_size=CATALOG_CACHE_SIZE):
+        self.kind = kind
+        self.fields = list(fields)
+        self.defaults = np.array([default for _, default in fields.values()], dtype=float)
+
+        keys = {}           # normalized key -> entry id
+        names = []          # entry id -> display name (first spelling in mappings.py)
+        aliases = {}        # spelling in mappings.py -> entry id
+        numbers = []        # entry id -> model_number() (with the core count of any spelling that has one)
+        rows = []
+        for j, (field, (mapping, _)) in enumerate(fields.items()):
+            for name, value in mapping.items():
+                key = normalize_name(name)
+                if key not in keys:
+                    keys[key] = len(names)
+                    names.append(name)
+                    numbers.append(model_number(name))
+                    rows.append([np.nan] * len(fields))
+                entry = keys[key]
+                aliases[name] = entry
+                tokens, cores = model_number(name)
+                if cores is not None and numbers[entry][1] is None:
+                    numbers[entry] = (tokens, cores)
+                if np.isnan(rows[entry][j]):
+                    rows[entry][j] = float(value)
+                elif rows[entry][j] != value:
+                    logger.warning("%s catalog: %r has %s %s, but %r has %s; using the first",
+                                   kind, name, field, value, names[entry], rows[entry][j])
+        self.names = names
+        self._numbers = numbers
+        self._keys = keys
+        self._aliases = pd.Index(list(aliases))
+        self._alias_entries = np.array(list(aliases.values()), dtype=np.int64)
+        # entry rows with the fallback as the last row; missing fields take their default
+        table = np.array(rows + [[np.nan] * len(fields)], dtype=float).reshape(len(names) + 1, len(fields))
+        self._missing = np.isnan(table)
+        self._incomplete = self._missing.any(axis=1)
+        self._incomplete[-1] = False     # the fallback row is reported as a fallback
+        self.table = np.where(self._missing, self.defaults, table)
+        self.fallback = len(names)
+
+        self._trigram_index = {}    # trigram -> entry ids
+        self._trigram_counts = np.zeros(len(names), dtype=np.int64)
+        for key, entry in keys.items():
+            grams = _trigrams(key)
+            self._trigram_counts[entry] = len(grams)
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(entry)
+
+        self._lock = threading.Lock()
+        self._fuzzy = {}                # name -> (entry, score)
+        self._rejected = {}             # name -> (closest entry, score) of fuzzy matches to a different model
+        self._fallbacks = Counter()     # name -> lookups
+        self._missing_fields = {field: Counter() for field in self.fields}
+        self._resolve = lru_cache(maxsize=cache_size)(self._resolve_uncached)
+
+    def _resolve_uncached(self, name):
+        """(entry id, method, score) of a name that isn't spelled as in mappings.py."""
+        key = normalize_name(name)
+        entry = self._keys.get(key)
+        if entry is not None:
+            return entry, "normalized", 1.0
+        grams = _trigrams(key)
+        shared = Counter(entry for gram in grams for entry in self._trigram_index.get(gram, ()))
+        if shared:
+            candidates = np.array(list(shared), dtype=np.int64)
+            counts = np.array(list(shared.values()), dtype=float)
+            scores = counts / (len(grams) + self._trigram_counts[candidates] - counts)
+            best = np.argmax(scores)    # ties go to the entry that was seen first in shared
+            if scores[best] >= FUZZY_THRESHOLD:
+                number = model_number(name)
+                similar = [i for i in np.flatnonzero(scores >= FUZZY_THRESHOLD)
+                           if _same_model(number, self._numbers[candidates[i]])]
+                if similar:
+                    match = similar[int(np.argmax(scores[similar]))]
+                    return int(candidates[match]), "fuzzy", float(scores[match])
+                with self._lock:
+                    self._rejected[name] = (int(candidates[best]), float(scores[best]))
+        return self.fallback, "fallback", 0.0
+
+    def _record(self, name, entry, method, score, lookups):
+        telemetry.count(f"catalog.{self.kind}.{method}", lookups)
+        if method == "fuzzy":
+            with self._lock:
+                first = name not in self._fuzzy
+                self._fuzzy[name] = (entry, score)
+            if first:
+                logger.warning("%s %r is not in the catalog; using %r (similarity %.2f)",
+                               self.kind, name, self.names[entry], score)
+        elif method == "fallback":
+            with self._lock:
+                first = name not in self._fallbacks
+                self._fallbacks[name] += lookups
+                rejected = self._rejected.get(name)
+            if first and rejected is not None:
+                logger.warning("%s %r is not in the catalog and its closest entry %r is a different model; "
+                               "using the dataset averages", self.kind, name, self.names[rejected[0]])
+            elif first:
+                logger.warning("%s %r is not in the catalog; using the dataset averages", self.kind, name)
+        if self._incomplete[entry]:
+            self._record_missing_fields(entry, lookups)
+
+    def _record_missing_fields(self, entry, lookups):
+        with self._lock:
+            for field, is_missing in zip(self.fields, self._missing[entry]):
+                if is_missing:
+                    self._missing_fields[field][self.names[entry]] += lookups
+
+    def encode(self, names, record=True):
+        """Entry ids of an array of names (the fallback row for names that don't resolve). `record`: count the
+        lookups and report fuzzy matches and fallbacks (off for repeated lookups of names already counted)."""
+        names = np.asarray(names, dtype=object)
+        positions = self._aliases.get_indexer(names)
+        entries = np.where(positions >= 0, self._alias_entries[positions], self.fallback)
+        exact = positions >= 0
+        if exact.any() and record:
+            telemetry.count(f"catalog.{self.kind}.exact", int(exact.sum()))
+            incomplete = entries[exact][self._incomplete[entries[exact]]]
+            for entry, lookups in zip(*np.unique(incomplete, return_counts=True)):
+                self._record_missing_fields(entry, int(lookups))
+        if not exact.all():
+            unknown, inverse, counts = np.unique(names[~exact].astype(str), return_inverse=True, return_counts=True)
+            resolved = np.empty(len(unknown), dtype=np.int64)
+            for i, (name, lookups) in enumerate(zip(unknown.tolist(), counts.tolist())):
+                entry, method, score = self._resolve(name)
+                if record:
+                    self._record(name, entry, method, score, lookups)
+                resolved[i] = entry
+            entries[~exact] = resolved[inverse]
+        return entries
+
+    def lookup(self, names, field, record=True):
+        """Values of `field` for an array of names."""
+        return self.table[self.encode(names, record), self.fields.index(field)]
+
+    def value(self, name, field):
+        return float(self.lookup([name], field)[0])
+
+    def resolve(self, name) -> Resolution:
+        entry = self.encode([name])[0]
+        if name in self._aliases:
+            return Resolution(name, self.names[entry], "exact", 1.0)
+        entry, method, score = self._resolve(str(name))
+        return Resolution(name, None if entry == self.fallback else self.names[entry], method, score)
+
+    def report(self):
+        """Names resolved by fuzzy match or fallback, and entries without some fields, in this process."""
+        with self._lock:
+            return {
+                "entries": len(self.names),
+                "fuzzy": {name: {"match": self.names[entry], "similarity": round(score, 3)}
+                          for name, (entry, score) in self._fuzzy.items()},
+                "fallbacks": dict(self._fallbacks.most_common()),
+                "rejected": {name: {"closest": self.names[entry], "similarity": round(score, 3)}
+                             for name, (entry, score) in self._rejected.items()},
+                "missingFields": {field: dict(counts) for field, counts in self._missing_fields.items() if counts},
+            }
+
+    def clear(self):
+        self._resolve.cache_clear()
+        with self._lock:
+            self._fuzzy.clear()
+            self._rejected.clear()
+            self._fallbacks.clear()
+            for counts in self._missing_fields.values():
+                counts.clear()
+
+
+processors = HardwareCatalog("processor", {
+    "tdp": (proc_tdp_mapp, DEFAULT_TDP_PROC),
+    "cores_per_processor": (proc_cores_map, DEFAULT_CORES_PER_PROCESSOR),
+})
+accelerators = HardwareCatalog("accelerator", {
+    "tdp": (tdp_mapping, DEFAULT_TDP_ACC),
+})
+systems = HardwareCatalog("system", {
+    "host_proc_core_count": (host_proc_core_count_mapping, DEFAULT_HOST_PROC_CORE_COUNT),
+})
+
+CATALOGS = {"processor": processors, "accelerator": accelerators, "system": systems}
+
+
+def report():
+    return {kind: catalog.report() for kind, catalog in CATALOGS.items()}
+
+
+def clear():
+    for catalog in CATALOGS.values():
+        catalog.clear()
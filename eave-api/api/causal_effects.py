@@ -0,0 +1,262 @@
+import os
+import json
+import hashlib
+import argparse
+import functools
+import threading
+
+import numpy as np
+import torch
+import pyro
+from pyro.infer import SVI, Trace_ELBO
+from pyro.optim import Adam
+from sklearn.preprocessing import StandardScaler
+
+from . import model, telemetry
+from .casual_model import CausalBNN
+from .executor import inference_executor
+from .inference import PosteriorSampleBank, summarize_samples, quantile_name, DEFAULT_QUANTILES
+
+'''
+Average treatment effects (ATE) of the 19 model features on PUE, from the CausalBNN posterior.
+
+The effect of a feature is that of the intervention do(feature += one standard deviation) on the
+training rows, all other features held at their observed values:
+
+    ATE_s = mean over rows of  μ_s(x with x_j + σ_j) - μ_s(x)
+
+for every weight sample s of the served sample bank (see inference.py), so its posterior mean, std
+and quantiles come from the same S samples as the served predictions. In scaled features the
+intervention is x_j + 1; the interventions of several features are stacked into one input matrix and
+evaluated in a single pass over the bank. "per_unit" divides by σ_j, i.e. the effect per unit of the
+feature.
+
+Two refutation tests:
+    subset  - the ATE recomputed on NUM_SUBSETS random SUBSET_FRACTION subsets of the rows (from the
+              posterior-mean effect of every row); passed if every subset estimate is inside the
+              posterior's quantile interval
+    placebo - the feature is permuted across the rows, a new posterior is trained on that data and its
+              ATE is estimated the same way; passed if the placebo's quantile interval contains 0 or its
+              mean is within PLACEBO_TOLERANCE of the feature's ATE.
+              One SVI run per feature, fanned out over the inference process pool.
+
+Results are cached in memory and as JSON files in CACHE_DIR under a hash of the dataset fingerprint
+(model.get_fingerprint: training data, model definition and training settings) and the settings here,
+so they are recomputed only when the data changes.
+'''
+
+CACHE_DIR = os.environ.get("EAVE_ATE_CACHE_DIR", os.path.join(model.file_dir, '..', 'data', 'ate'))
+
+# most training rows intervened on (a seeded sample beyond that)
+MAX_ROWS = 5000
+
+# bound on the (samples x interventions x rows) outputs of one pass over the bank
+MAX_PASS_ELEMENTS = 16_000_000
+
+NUM_SUBSETS = 20
+SUBSET_FRACTION = 0.5
+
+# SVI steps and weight samples of each placebo posterior
+PLACEBO_SVI_STEPS = model.NUM_SVI_STEPS
+NUM_PLACEBO_SAMPLES = 200
+
+# largest placebo ATE, relative to the feature's ATE, that still passes if its interval excludes 0
+PLACEBO_TOLERANCE = 0.1
+
+
+def _intervention_effects(sample_bank, X, columns):
+    """Per-sample ATEs (S, len(columns)) and posterior-mean effects per row (len(columns), N) of
+    do(x_j += 1) on the scaled rows X, several interventions per pass over the bank."""
+    rows = len(X)
+    baseline = sample_bank.sample_mean(X)    # (S, N)
+    per_sample = np.empty((sample_bank.num_samples, len(columns)))
+    per_row = np.empty((len(columns), rows))
+    group = max(1, MAX_PASS_ELEMENTS // (sample_bank.num_samples * rows))
+    for start in range(0, len(columns), group):
+        block = columns[start:start + group]
+        intervened = np.repeat(X[None], len(block), axis=0)    # (G, N, D)
+        intervened[np.arange(len(block)), :, block] += 1
+        outcome = sample_bank.sample_mean(intervened.reshape(-1, X.shape[1]))
+        difference = outcome.reshape(sample_bank.num_samples, len(block), rows) - baseline[:, None, :]
+        per_sample[:, start:start + len(block)] = difference.mean(axis=2)
+        per_row[start:start + len(block)] = difference.mean(axis=0)
+    return per_sample, per_row
+
+
+def _summaries(per_sample, quantiles):
+    """{statistic: value} per column of (S, F) samples."""
+    summary = summarize_samples(per_sample, quantiles)
+    return [{name: float(values[i]) for name, values in summary.items()} for i in range(per_sample.shape[1])]
+
+
+def _interval(summary, quantiles):
+    return summary[quantile_name(min(quantiles))], summary[quantile_name(max(quantiles))]
+
+
+def training_rows(seed=0):
+    """Raw feature and target rows of the training data, at most MAX_ROWS of them."""
+    df = model.read_training_data()[model.features + [model.target]].dropna()
+    if len(df) > MAX_ROWS:
+        df = df.sample(MAX_ROWS, random_state=seed)
+    return df.reset_index(drop=True)
+
+
+def estimate_effects(quantiles=DEFAULT_QUANTILES, seed=0):
+    """ATE of every feature under the served posterior, with the subset refutation."""
+    scaler, sample_bank = model.get_sample_bank()
+    rows = training_rows(seed)
+    X = scaler.transform(rows[model.features].to_numpy()).astype(np.float32)
+    with telemetry.span("causal_effects.interventions"):
+        per_sample, per_row = _intervention_effects(sample_bank, X, np.arange(len(model.features)))
+
+    rng = np.random.default_rng(seed)
+    subsets = np.array([rng.choice(len(X), max(1, int(SUBSET_FRACTION * len(X))), replace=False)
+                        for _ in range(NUM_SUBSETS)])
+    subset_effects = per_row[:, subsets].mean(axis=2)     # (F, NUM_SUBSETS)
+
+    effects = {}
+    for j, (feature, summary) in enumerate(zip(model.features, _summaries(per_sample, quantiles))):
+        low, high = _interval(summary, quantiles)
+        effects[feature] = {
+            **summary,
+            "per_unit": summary["mean"] / float(scaler.scale_[j]),
+            "subset": {
+                "min": float(subset_effects[j].min()),
+                "max": float(subset_effects[j].max()),
+                "passed": bool(low <= subset_effects[j].min() and subset_effects[j].max() <= high),
+            },
+        }
+    return {"rows": len(X), "samples": sample_bank.num_samples, "effects": effects}
+
+
+def _fit(X, y, steps, seed):
+    """A (bnn, guide) pair trained from scratch on scaled X; leaves its parameters in the param store."""
+    torch.manual_seed(seed)
+    bnn = CausalBNN()
+    guide = pyro.infer.autoguide.AutoDiagonalNormal(bnn)
+    svi = SVI(bnn, guide, Adam({"lr": model.LEARNING_RATE}), loss=Trace_ELBO())
+    X_tensor, y_tensor = torch.tensor(X, dtype=torch.float32), torch.tensor(y, dtype=torch.float32)
+    for _ in range(steps):
+        svi.step(X_tensor, y_tensor)
+    return bnn, guide
+
+
+def placebo_effect(column, quantiles=DEFAULT_QUANTILES, seed=0, steps=PLACEBO_SVI_STEPS):
+    """
+    Placebo test of one feature: permute it across the training rows, train a posterior on that data
+    and return the summary of its ATE. Trains in its own param store scope; meant to run in a worker
+    process, as swapping the param store would disturb the "predictive" serving mode of this process.
+    """
+    rows = training_rows(seed)
+    raw = rows[model.features].to_numpy()
+    rng = np.random.default_rng([seed, column])
+    raw[:, column] = rng.permutation(raw[:, column])
+    X = StandardScaler().fit_transform(raw).astype(np.float32)
+
+    param_store = pyro.get_param_store()
+    with telemetry.span("causal_effects.placebo"), torch.random.fork_rng(), param_store.scope():
+        bnn, guide = _fit(X, rows[model.target].to_numpy(), steps, seed)
+        sample_bank = PosteriorSampleBank.from_guide(bnn, guide, NUM_PLACEBO_SAMPLES, X.shape[1], seed=seed)
+    per_sample, _ = _intervention_effects(sample_bank, X, np.array([column]))
+    return _summaries(per_sample, quantiles)[0]
+
+
+def placebo_effects(quantiles=DEFAULT_QUANTILES, seed=0, parallel=True):
+    """Placebo test of every feature, one per task in the inference process pool (or in this process)."""
+    run = functools.partial(placebo_effect, quantiles=quantiles, seed=seed)
+    columns = range(len(model.features))
+    if parallel:
+        results = inference_executor.map(run, columns)
+    else:
+        with model._posterior_lock:
+            results = [run(column) for column in columns]
+    return dict(zip(model.features, results))
+
+
+def cache_key(quantiles=DEFAULT_QUANTILES, seed=0):
+    """Hash of the dataset fingerprint and every setting the effects depend on."""
+    settings = {
+        "fingerprint": model.get_fingerprint(),
+        "bank": [model.NUM_BANK_SAMPLES, model.BANK_SEED],
+        "quantiles": list(quantiles),
+        "seed": seed,
+        "rows": MAX_ROWS,
+        "subsets": [NUM_SUBSETS, SUBSET_FRACTION],
+        "placebo": [PLACEBO_SVI_STEPS, NUM_PLACEBO_SAMPLES, PLACEBO_TOLERANCE],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _read_cache(key, directory):
+    if key in _cache:
+        return _cache[key]
+    try:
+        with open(os.path.join(directory, f"{key}.json"), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(key, result, directory):
+    _cache[key] = result
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, f"{key}.json")
+    tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_filepath, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    os.replace(tmp_filepath, filepath)
+
+
+def estimate(placebo=False, refresh=False, quantiles=DEFAULT_QUANTILES, seed=0, parallel=True, directory=CACHE_DIR):
+    """
+    ATE of every feature on PUE, with the subset refutation and, with `placebo`, the placebo test.
+
+    Served from the cache while the dataset and settings are unchanged, unless `refresh`. A cached
+    result without placebo tests only runs those when they are asked for.
+
+    Returns:
+      {"dataset": fingerprint, "rows", "samples", "cached": bool,
+       "effects": {feature: {"mean", "std", "p5", ..., "per_unit", "subset": {...}, "placebo": {...}}}}
+    """
+    quantiles = tuple(sorted(set(quantiles)))
+    with _lock:
+        key = cache_key(quantiles, seed)
+        result = None if refresh else _read_cache(key, directory)
+        cached = result is not None and (not placebo or result["placebo"])
+        if result is None:
+            result = {"dataset": model.get_fingerprint(), **estimate_effects(quantiles, seed), "placebo": False}
+        if placebo and not result["placebo"]:
+            for feature, summary in placebo_effects(quantiles, seed, parallel).items():
+                effect = result["effects"][feature]
+                low, high = _interval(summary, quantiles)
+                passed = low <= 0 <= high or abs(summary["mean"]) <= PLACEBO_TOLERANCE * abs(effect["mean"])
+                effect["placebo"] = {**summary, "passed": bool(passed)}
+            result["placebo"] = True
+        if not cached:
+            _write_cache(key, result, directory)
+        telemetry.count("causal_effects.hit" if cached else "causal_effects.miss")
+        return {**result, "cached": cached}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate the average treatment effect of every model feature on PUE.")
+    parser.add_argument("--placebo", action="store_true", help="also run the placebo test of every feature")
+    parser.add_argument("--refresh", action="store_true", help="recompute even if the dataset hasn't changed")
+    parser.add_argument("--serial", action="store_true", help="run the placebo tests in this process")
+    parser.add_argument("--seed", type=int, default=0, help="seed for row samples, subsets and placebo permutations")
+    parser.add_argument("--directory", default=CACHE_DIR, help=f"cache directory (default: {CACHE_DIR})")
+    args = parser.parse_args(argv)
+
+    try:
+        result = estimate(args.placebo, args.refresh, seed=args.seed, parallel=not args.serial, directory=args.directory)
+    finally:
+        inference_executor.shutdown()
+    print(json.dumps(result, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import argparse
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+'''
+Columnar copies of the reference CSVs: one .npy file per column plus a meta.json, memory-mapped on load.
+
+The build step (`python -m api.columnar`) parses each CSV once, with its dates already converted to
+datetime64 and its column names normalized (e.g. `Carbon Intensity gCO₂eq/kWh (direct)` ->
+`carbon_intensity_gco2eq_kwh_direct`). Numeric and date columns are written as plain arrays,
+text columns as int32 codes into a list of categories kept in meta.json.
+
+load_table() maps the arrays read-only (np.load(mmap_mode='r')) and wraps them in a DataFrame. Numeric and
+date columns stay memory-mapped, so all worker processes share the same page-cache pages instead of each
+holding its own parsed copy. Text columns are not shared: pandas copies their codes into a per-process
+Categorical (one small integer per row and each category string once, still far less than parsed strings).
+A table is only used while its source CSV is unchanged; otherwise callers fall back to the CSV.
+
+Append-only tables (e.g. ingested MLPerf rounds, see ingest_mlperf.py) are a directory of parts in the
+same layout plus a manifest.json listing them: append_part() writes one part per chunk without reading
+the earlier ones, and load_parts() concatenates them.
+'''
+file_dir = os.path.dirname(__file__)
+COLUMNAR_DIR = os.environ.get("EAVE_COLUMNAR_DIR", os.path.join(file_dir, '..', 'data', 'columnar'))
+
+META_FILENAME = "meta.json"
+MANIFEST_FILENAME = "manifest.json"
+FORMAT_VERSION = 1
+
+_TRANSLITERATIONS = {"ä": "ae", "ö": "oe", "ü": "ue", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ß": "ss"}
+_SYMBOLS = {"€": "eur", "∅": "avg", "%": "pct", "#": "num"}
+
+
+def normalize_column(name):
+    """snake_case ASCII version of a column name."""
+    for character, replacement in _TRANSLITERATIONS.items():
+        name = name.replace(character, replacement)
+    for symbol, word in _SYMBOLS.items():
+        name = name.replace(symbol, f" {word} ")
+    # NFKD turns e.g. "₂" into "2" and strips accents
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
+
+
+def normalize_columns(columns):
+    """Normalized names, made unique with a numeric suffix where two columns collide."""
+    names = []
+    for column in columns:
+        name = normalize_column(column) or "column"
+        candidate, suffix = name, 1
+        while candidate in names:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        names.append(candidate)
+    return names
+
+
+def _sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_version(filepath):
+    stat = os.stat(filepath)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+##################################################################
+# Build
+##################################################################
+
+def _write_columns(df, target):
+    """Write the columns of `df` as .npy files into `target`; returns their meta entries."""
+    columns = []
+    for normalized, (original, series) in zip(normalize_columns(df.columns), df.items()):
+        column = {"name": normalized, "original": original}
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = series.to_numpy(dtype="datetime64[ns]")
+            column["kind"] = "datetime"
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            values = series.to_numpy()
+            column["kind"] = "numeric"
+        else:
+            categorical = pd.Categorical(series)
+            values = categorical.codes.astype(np.int32)     # -1 for missing values
+            column["kind"] = "category"
+            column["categories"] = [str(category) for category in categorical.categories]
+        column["dtype"] = str(values.dtype)
+        np.save(os.path.join(target, f"{normalized}.npy"), np.ascontiguousarray(values))
+        columns.append(column)
+    return columns
+
+
+def _write_json(data, filepath):
+    tmp_filepath = f"{filepath}.tmp-{os.getpid()}"
+    with open(tmp_filepath, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_filepath, filepath)
+
+
+def build_table(df, name, source_filepath, directory=COLUMNAR_DIR):
+    """Write `df` (parsed from `source_filepath`) as the columnar table `name`. Replaces an existing table atomically."""
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, name)
+    tmp_target = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_target, ignore_errors=True)
+    os.makedirs(tmp_target)
+
+    columns = _write_columns(df, tmp_target)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "source": os.path.basename(source_filepath),
+        "source_version": _source_version(source_filepath),
+        "source_sha256": _sha256(source_filepath),
+        "rows": len(df),
+        "columns": columns,
+    }
+    _write_json(meta, os.path.join(tmp_target, META_FILENAME))
+
+    # swap directories; processes that still map the old files keep reading them until they reload
+    old_target = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, old_target)
+    os.replace(tmp_target, target)
+    shutil.rmtree(old_target, ignore_errors=True)
+    return meta
+
+
+##################################################################
+# Load
+##################################################################
+
+def _read_json(filepath):
+    try:
+        with open(filepath, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_meta(name, directory=COLUMNAR_DIR):
+    return _read_json(os.path.join(directory, name, META_FILENAME))
+
+
+def is_fresh(meta, source_filepath):
+    """True if the table was built from the current contents of `source_filepath`."""
+    if meta is None or meta.get("format_version") != FORMAT_VERSION:
+        return False
+    try:
+        if meta["source_version"] == _source_version(source_filepath):
+            return True
+        # e.g. a checkout touched the file without changing it
+        return meta["source_sha256"] == _sha256(source_filepath)
+    except OSError:
+        return False
+
+
+def load_table(name, source_filepath, columns=None, original_names=True, directory=COLUMNAR_DIR):
+    """
+    The memory-mapped table `name` as a DataFrame, or None if it was not built or `source_filepath`
+    changed since. `columns` selects columns by their original (or, with original_names=False,
+    normalized) names; the DataFrame uses the same kind of names.
+    """
+    meta = read_meta(name, directory)
+    if not is_fresh(meta, source_filepath):
+        return None
+    return _map_columns(os.path.join(directory, name), meta, columns, original_names)
+
+
+def _map_columns(path, meta, columns, original_names):
+    data = {}
+    for column in meta["columns"]:
+        label = column["original"] if original_names else column["name"]
+        if columns is not None and label not in columns:
+            continue
+        values = np.load(os.path.join(path, f"{column['name']}.npy"), mmap_mode="r")
+        if column["kind"] == "category":
+            # from_codes copies the codes (narrowed to the smallest integer type) into memory
+            values = pd.Categorical.from_codes(values, categories=column["categories"])
+        data[label] = values
+    if columns is not None:
+        data = {label: data[label] for label in columns}
+    return pd.DataFrame(data, copy=False)
+
+
+##################################################################
+# Append-only tables
+##################################################################
+
+def read_manifest(name, directory=COLUMNAR_DIR):
+    """{"format_version", "parts": [{"name", "rows", "source"}, ...], "sources": {...}} of the
+    append-only table `name`, or None if it doesn't exist."""
+    manifest = _read_json(os.path.join(directory, name, MANIFEST_FILENAME))
+    if manifest is None or manifest.get("format_version") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def append_part(df, name, source=None, sources=None, directory=COLUMNAR_DIR):
+    """
+    Append `df` as a new part of the table `name` and record it in the manifest. `source` describes where
+    the rows came from; `sources` entries are merged into the manifest's "sources" (e.g. which input files
+    were ingested). Not safe for concurrent writers.
+    """
+    table_dir = os.path.join(directory, name)
+    os.makedirs(table_dir, exist_ok=True)
+    manifest = read_manifest(name, directory) or {"format_version": FORMAT_VERSION, "parts": [], "sources": {}}
+
+    part = f"part-{len(manifest['parts']):05d}"
+    tmp_target = os.path.join(table_dir, f"{part}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_target, ignore_errors=True)
+    os.makedirs(tmp_target)
+    meta = {"format_version": FORMAT_VERSION, "rows": len(df), "columns": _write_columns(df, tmp_target)}
+    _write_json(meta, os.path.join(tmp_target, META_FILENAME))
+    os.replace(tmp_target, os.path.join(table_dir, part))
+
+    # the part only becomes visible once the manifest lists it
+    manifest["parts"].append({"name": part, "rows": len(df), "source": source})
+    manifest["sources"].update(sources or {})
+    _write_json(manifest, os.path.join(table_dir, MANIFEST_FILENAME))
+    return manifest
+
+
+def record_sources(name, sources, directory=COLUMNAR_DIR):
+    """Merge `sources` into the manifest of the table `name` without adding a part."""
+    table_dir = os.path.join(directory, name)
+    os.makedirs(table_dir, exist_ok=True)
+    manifest = read_manifest(name, directory) or {"format_version": FORMAT_VERSION, "parts": [], "sources": {}}
+    manifest["sources"].update(sources)
+    _write_json(manifest, os.path.join(table_dir, MANIFEST_FILENAME))
+    return manifest
+
+
+def iter_parts(name, columns=None, original_names=True, directory=COLUMNAR_DIR):
+    """The parts of the table `name` as memory-mapped DataFrames, one at a time."""
+    manifest = read_manifest(name, directory)
+    for part in (manifest or {}).get("parts", []):
+        path = os.path.join(directory, name, part["name"])
+        yield _map_columns(path, _read_json(os.path.join(path, META_FILENAME)), columns, original_names)
+
+
+def load_parts(name, columns=None, original_names=True, directory=COLUMNAR_DIR):
+    """All parts of the table `name` concatenated (a copy), or None if it has none."""
+    parts = list(iter_parts(name, columns, original_names, directory))
+    if not parts:
+        return None
+    return pd.concat(parts, ignore_index=True)
+
+
+def main(argv=None):
+    from . import datastore
+
+    parser = argparse.ArgumentParser(description="Convert the reference CSVs to memory-mappable columnar tables.")
+    parser.add_argument("datasets", nargs="*", help=f"datasets to convert, of {list(datastore.DATASETS)} (default: all)")
+    parser.add_argument("--directory", default=COLUMNAR_DIR, help=f"output directory (default: {COLUMNAR_DIR})")
+    args = parser.parse_args(argv)
+    unknown = set(args.datasets) - set(datastore.DATASETS)
+    if unknown:
+        parser.error(f"unknown datasets {sorted(unknown)}")
+
+    for name in args.datasets or datastore.DATASETS:
+        spec = datastore.DATASETS[name]
+        meta = build_table(datastore.read_csv_dataset(name), name, spec["filepath"], args.directory)
+        print(f"{name}: {meta['rows']} rows, {len(meta['columns'])} columns -> {os.path.join(args.directory, name)}")
+
+
+if __name__ == "__main__":
+    main()
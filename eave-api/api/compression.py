@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from . import datastore, telemetry, timeseries
+from .catalog import processors, systems
+from .energy import compute_energy
+from .environment import get_env_data_batch
+from .mappings import selected_countries
+from .optimizer import pareto_mask, PRICING
+
+'''
+Compression search for /api/optimize/pareto: every (compression technique, hardware, location, date)
+combination in one vectorized pass, reduced to the Pareto front over energy, cost, CO₂, parameters
+(minimized) and performance (maximized).
+
+Each row of compression_technique_data.csv is evaluated like /api/optimize/baseline evaluates one:
+the row's TDPs, accelerators, nodes and throughput, the processors per node of the hardware option
+(host core count / cores per processor from the catalog), and the environmental impact factor at the
+location and date. The grid is laid out as index arrays, so the energy formula runs once over all
+candidates; prices and carbon intensities are looked up once per (location, date), or per
+(technique, location, date) with runtime pricing, through timeseries.py.
+'''
+
+# objectives of the front and their direction: 1 minimized, -1 maximized
+OBJECTIVES = {"energy": 1, "cost": 1, "co2": 1, "params": 1, "performance": -1}
+
+# largest grid evaluated in one call
+MAX_CANDIDATES = 250_000
+
+
+def compression_rows(model_names=None, techniques=None) -> pd.DataFrame:
+    """The rows of compression_technique_data.csv for `model_names` and `techniques` (default: all)."""
+    df = datastore.get_compression_data()
+    if model_names is not None:
+        df = df[df["model_name"].isin(model_names)]
+    if techniques is not None:
+        df = df[df["compressionTech"].isin(techniques)]
+    return df.reset_index(drop=True)
+
+
+def _environmental_impact(dates, locations):
+    """(locations, dates) grid of environmental impact factors, at midday like get_env_data."""
+    timestamps = pd.DatetimeIndex(pd.to_datetime(dates))
+    return np.array([get_env_data_batch(timestamps, location)["Environmental_Impact_Factor"] for location in locations])
+
+
+def _unit_prices(dates, locations, runtime_hours=None):
+    """Energy price (€/MWh) and carbon intensity (g/kWh) grids: (locations, dates) for runs priced at their
+    start day, (len(runtime_hours), locations, dates) for runs of these lengths priced over their runtime."""
+    runtimes = np.zeros(1) if runtime_hours is None else np.asarray(runtime_hours, dtype=float)
+    r, l, d = np.indices((len(runtimes), len(locations), len(dates))).reshape(3, -1)
+    priced = timeseries.price_windows(np.ones(len(r)), np.asarray(dates, dtype=object)[d], runtimes[r],
+                                      np.asarray(locations, dtype=object)[l])
+    shape = (len(runtimes), len(locations), len(dates))
+    prices = priced["energy_price"].reshape(shape)
+    intensities = priced["co2_equivalents"].reshape(shape)
+    if runtime_hours is None:
+        return prices[0], intensities[0]
+    return prices, intensities
+
+
+def search(hardware, dates, locations=None, model_names=None, techniques=None, cooling_efficiency=0.5,
+           pricing="daily", min_performance=None, max_cost=None, rng=None):
+    """
+    Evaluate compression techniques x hardware x locations x dates and return the Pareto front.
+
+    hardware:  list of dicts with system_name and processor, optionally their own cooling_efficiency
+    dates:     start dates of the runs
+    min_performance, max_cost: candidates below / above are excluded before the front is taken
+
+    Returns:
+      {"evaluated": number of candidates, "feasible": number meeting the constraints,
+       "front": [{"model_name", "compressionTech", "system_name", "processor", "location", "date",
+                  "energy", "cost", "co2", "co2_equivalents", "pue", "runtime_hours", "performance",
+                  "params"}, ...] ordered by cost}
+    """
+    if pricing not in PRICING:
+        raise ValueError(f"Unknown pricing '{pricing}', expected one of {PRICING}")
+    locations = list(selected_countries) if locations is None else list(locations)
+    unknown = [location for location in locations if location.lower() not in selected_countries]
+    if unknown:
+        raise ValueError(f"Unknown locations {unknown}, expected some of {list(selected_countries)}")
+    dates = [pd.Timestamp(date).date() for date in dates]
+    rows = compression_rows(model_names, techniques)
+    shape = (len(rows), len(hardware), len(locations), len(dates))
+    if not all(shape):
+        return {"evaluated": 0, "feasible": 0, "front": []}
+    if np.prod(shape) > MAX_CANDIDATES:
+        raise ValueError(f"{np.prod(shape)} candidates; at most {MAX_CANDIDATES} can be evaluated in one call")
+    rng = np.random.default_rng() if rng is None else rng
+
+    with telemetry.span("compression.evaluate"):
+        t, h, l, d = np.indices(shape).reshape(4, -1)
+        column = {name: rows[name].to_numpy(dtype=float) for name in
+                  ("tdp_proc", "tdp_acc", "num_accelerator", "num_nodes", "throughput", "performance", "params")}
+
+        # processors per node of each hardware option, as in /api/optimize/baseline
+        host_proc_core_count = systems.lookup([option["system_name"] for option in hardware], "host_proc_core_count")
+        cores_per_processor = processors.lookup([option["processor"] for option in hardware], "cores_per_processor")
+        no_of_processors = host_proc_core_count / cores_per_processor
+        cooling = np.array([cooling_efficiency if option.get("cooling_efficiency") is None else option["cooling_efficiency"]
+                            for option in hardware], dtype=float)
+
+        energy = compute_energy(
+            column["tdp_proc"][t], no_of_processors[h], column["tdp_acc"][t], column["num_accelerator"][t],
+            column["num_nodes"][t], column["throughput"][t], cooling[h], _environmental_impact(dates, locations)[l, d],
+            rng.uniform(0.85, 0.90, len(t)))
+        facility = energy["E_Total_Facility_kWh"]
+
+        # the runtime only depends on the technique's throughput, so runtime pricing is per (technique, location, date)
+        if pricing == "runtime":
+            runtime_hours = energy["runtime_hours"][::shape[1] * shape[2] * shape[3]]   # one per technique
+            prices, intensities = _unit_prices(dates, locations, runtime_hours)
+            prices, intensities = prices[t, l, d], intensities[t, l, d]
+        else:
+            prices, intensities = _unit_prices(dates, locations)
+            prices, intensities = prices[l, d], intensities[l, d]
+        values = {
+            "energy": facility,
+            "cost": facility * prices / 1000,
+            "co2": facility * intensities,
+            "params": column["params"][t],
+            "performance": column["performance"][t],
+        }
+
+    with telemetry.span("compression.front"):
+        feasible = np.ones(len(t), dtype=bool)
+        if min_performance is not None:
+            feasible &= values["performance"] >= min_performance
+        if max_cost is not None:
+            feasible &= values["cost"] <= max_cost
+        candidates = np.flatnonzero(feasible)
+        objectives = np.column_stack([direction * values[name][candidates] for name, direction in OBJECTIVES.items()])
+        front = candidates[pareto_mask(objectives)] if len(candidates) else candidates
+        front = front[np.argsort(values["cost"][front], kind="stable")]
+
+    model_names, compression_techs = rows["model_name"].to_numpy(), rows["compressionTech"].to_numpy()
+    return {
+        "evaluated": len(t),
+        "feasible": len(candidates),
+        "front": [
+            {
+                "model_name": model_names[t[i]],
+                "compressionTech": compression_techs[t[i]],
+                "system_name": hardware[h[i]]["system_name"],
+                "processor": hardware[h[i]]["processor"],
+                "location": locations[l[i]],
+                "date": dates[d[i]].isoformat(),
+                "energy": float(facility[i]),
+                "cost": float(values["cost"][i]),
+                "co2": float(values["co2"][i]),
+                "co2_equivalents": float(intensities[i]),
+                "pue": float(facility[i] / energy["E_IT_Total_kWh"][i]),
+                "runtime_hours": float(energy["runtime_hours"][i]),
+                "performance": float(values["performance"][i]),
+                "params": int(values["params"][i]),
+            }
+            for i in front.tolist()
+        ],
+    }
@@ -1,10 +1,10 @@
 import pandas as pd
 from datetime import date
-import pickle
 import numpy as np
-import os
-import joblib
 from .mappings import selected_countries
+from .registry import forecast_models
+from .datastore import lookup_energy_prices, lookup_carbon_intensity
+from . import telemetry
 
 # Function to predict future prices
 def predict_energy_price(date, country: str):
@@ -13,39 +13,26 @@ def predict_energy_price(date, country: str):
     day = date.day
     
     if country=="Usa":  # capitalize the USA because the predict_energy_price function takes country as Country
-        # Build the absolute path to the pickle file
-        model_dir = os.path.dirname(__file__) 
-        pickle_file_path = os.path.join(model_dir, "us_energy_price_model.pkl")
-
-        model = joblib.load(pickle_file_path)
+        model = forecast_models.get("us_energy_price")
         input_data = np.array([[year, month]])
-        return model.predict(input_data)[0]*10*0.93 # prediction is in cents; convert it to Eur (1 dollar -> 0.93 euro; 26-03-2025)
+        with telemetry.span("forecast.us_energy_price"):
+            return model.predict(input_data)[0]*10*0.93 # prediction is in cents; convert it to Eur (1 dollar -> 0.93 euro; 26-03-2025)
 
     else:
-        # Build the absolute path to the pickle file
-        model_dir = os.path.dirname(__file__) 
-        pickle_file_path = os.path.join(model_dir, "daily_energy_price_model.pkl")
-
-        # load the model
-        with open(pickle_file_path, "rb") as f:
-            model, encoder = pickle.load(f)
+        model, encoder = forecast_models.get("daily_energy_price")
 
         country_encoded = encoder.transform([country])[0]
         
         input_data = np.array([[year, month, day, country_encoded]])
-        predicted_price = model.predict(input_data)[0]
+        with telemetry.span("forecast.daily_energy_price"):
+            predicted_price = model.predict(input_data)[0]
         
         return predicted_price
 
 def predict_carbon_intensity(date, country):
     """Predicts carbon intensity given a date and country."""
-    # Build the absolute path to the pickle file
-    model_dir = os.path.dirname(__file__) 
-    pickle_file_path = os.path.join(model_dir, "carbon_intensity_rf.pkl")
+    model, encoder = forecast_models.get("carbon_intensity")
 
-    with open(pickle_file_path, "rb") as f:
-        model, encoder = pickle.load(f)
-    
     # Convert date to features
     date = pd.to_datetime(date)
     features = pd.DataFrame({
@@ -62,47 +49,56 @@ def predict_carbon_intensity(date, country):
     final_features = pd.concat([features, encoded_country_df], axis=1)
     
     # Make prediction
-    prediction = model.predict(final_features)
+    with telemetry.span("forecast.carbon_intensity"):
+        prediction = model.predict(final_features)
     return prediction[0]
 
+def predict_energy_prices(dates, country: str):
+    """predict_energy_price for many dates at once (one model call). `dates` is a pd.DatetimeIndex."""
+    if country=="Usa":
+        model = forecast_models.get("us_energy_price")
+        input_data = np.column_stack([dates.year, dates.month])
+        with telemetry.span("forecast.us_energy_price"):
+            return model.predict(input_data)*10*0.93
+    model, encoder = forecast_models.get("daily_energy_price")
+    country_encoded = encoder.transform([country])[0]
+    input_data = np.column_stack([dates.year, dates.month, dates.day, np.full(len(dates), country_encoded)])
+    with telemetry.span("forecast.daily_energy_price"):
+        return model.predict(input_data)
+
+def predict_carbon_intensities(dates, country):
+    """predict_carbon_intensity for many dates at once (one model call). `dates` is a pd.DatetimeIndex."""
+    model, encoder = forecast_models.get("carbon_intensity")
+    features = pd.DataFrame({"Year": dates.year, "Month": dates.month, "Day": dates.day})
+    encoded_country = encoder.transform([[country]])
+    encoded_country_df = pd.DataFrame(np.repeat(encoded_country, len(dates), axis=0),
+                                      columns=encoder.get_feature_names_out(["Country"]))
+    final_features = pd.concat([features, encoded_country_df], axis=1)
+    with telemetry.span("forecast.carbon_intensity"):
+        return model.predict(final_features)
+
 # Calculate Cost
 def calculate_cost(energy_consumption: float, target_date: date, location: str) -> float:
     target_date = pd.to_datetime(target_date)
-    df = pd.read_csv('data/energy_price_daily.csv')
-    df['Datum von'] = pd.to_datetime(df['Datum von'], format='%Y-%m-%d')
     if location.lower()=="usa":  # capitalize the USA because the predict_energy_price function takes country as Country
-        # Build the absolute path to the pickle file
-        model_dir = os.path.dirname(__file__) 
-        pickle_file_path = os.path.join(model_dir, "us_energy_price_model.pkl")
-        model = joblib.load(pickle_file_path)
+        model = forecast_models.get("us_energy_price")
         input_data = np.array([[target_date.year, target_date.month]])
-        price_per_kwh = model.predict(input_data)[0]*10*0.93 # prediction is in cents; convert it to Eur (1 dollar -> 0.93 euro; 26-03-2025)
+        with telemetry.span("forecast.us_energy_price"):
+            price_per_kwh = model.predict(input_data)[0]*10*0.93 # prediction is in cents; convert it to Eur (1 dollar -> 0.93 euro; 26-03-2025)
     else:
-        row = df[df['Datum von']==target_date]
-        if not row.empty:
-            row_dict = row.iloc[0].to_dict()
+        row_dict = lookup_energy_prices(target_date)
+        if row_dict is not None:
             price_per_kwh = row_dict[selected_countries[location.lower()]]
         else:
+            telemetry.count("energy_price.forecast_fallback")
             price_per_kwh = predict_energy_price(date=target_date, country=location.capitalize())
     return energy_consumption * price_per_kwh / 1000
 
 # Calculate CO2 Equivalents (example formula, replace with real one)
 def calculate_co2_equivalents(energy_consumption: float, target_date: date, location: str) -> float:
     target_date = pd.to_datetime(target_date)
-    # load data and query
-    # Load the dataset
-    file_path = "data/merged_carbon_intensity.csv"
-    df = pd.read_csv(file_path)
-    # Keep only relevant columns
-    df = df[["Datetime (UTC)", "Country", "Carbon Intensity gCO₂eq/kWh (direct)"]]
-
-    # df = pd.read_csv('data/carbon_intensity_germany.csv')
-    df['Datetime (UTC)'] = pd.to_datetime(df['Datetime (UTC)'])
-
-    row = df[(df['Datetime (UTC)']==target_date) & (df['Country']==location)]
-    if not row.empty:
-        row_dict = row.iloc[0].to_dict()
-        carbon_index = row_dict['Carbon Intensity gCO₂eq/kWh (direct)']
-    else:
+    carbon_index = lookup_carbon_intensity(target_date, location)
+    if carbon_index is None:
+        telemetry.count("carbon_intensity.forecast_fallback")
         carbon_index = predict_carbon_intensity(date=target_date, country=location)
     return carbon_index, energy_consumption * carbon_index
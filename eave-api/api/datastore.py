@@ -0,0 +1,260 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from . import columnar, telemetry
+
+'''
+Reference datasets used by the API.
+
+Each CSV is read and parsed once per process and kept in memory together with hash indexes
+for the lookups done on the request path, so endpoints do dict lookups instead of re-reading
+and filtering the files. Call load_all() at startup to pay the loading cost before the first request.
+
+A dataset is read from its memory-mapped columnar copy (see columnar.py, built with
+`python -m api.columnar`) when that copy is up to date, and parsed from the CSV otherwise.
+
+The modification time and size of each file are recorded when it is read; reload_changed() drops the
+dataset and its indexes when the file on disk has changed since, so they are rebuilt on next use.
+'''
+file_dir = os.path.dirname(__file__)
+data_dir = os.path.join(file_dir, '..', 'data')
+
+PUE_CSV_filepath = os.path.join(file_dir, 'PUE_data.csv')
+COMPRESSION_CSV_filepath = os.path.join(data_dir, 'compression_technique_data.csv')
+ENERGY_PRICE_CSV_filepath = os.path.join(data_dir, 'energy_price_daily.csv')
+CARBON_INTENSITY_CSV_filepath = os.path.join(data_dir, 'merged_carbon_intensity.csv')
+MLPERF_CSV_filepath = os.path.join(file_dir, 'MLPerf_Inference_data.csv')
+
+# append-only columnar table of the ingested MLPerf results (ingest_mlperf.py)
+MLPERF_TABLE = "pue_mlperf"
+
+CARBON_INTENSITY_COLUMN = 'Carbon Intensity gCO₂eq/kWh (direct)'
+
+# columns identifying a benchmarked system in PUE_data.csv (see energy.get_avg_result)
+SYSTEM_KEY_COLUMNS = ['System Name', '# of Nodes', 'Processor', 'Accelerator',
+                      '# of Accelerators', 'Host Processor Core Count', 'Model MLC']
+
+
+# How each dataset is read: its CSV, pandas.read_csv options and date columns with their format
+DATASETS = {
+    "pue": {"filepath": PUE_CSV_filepath, "dates": {"Timestamp": "%Y-%m-%d %H:%M:%S"}},
+    "compression": {"filepath": COMPRESSION_CSV_filepath},
+    "energy_price": {"filepath": ENERGY_PRICE_CSV_filepath, "dates": {"Datum von": "%Y-%m-%d", "Datum bis": "%Y-%m-%d"}},
+    "carbon_intensity": {"filepath": CARBON_INTENSITY_CSV_filepath, "dates": {"Datetime (UTC)": "%Y-%m-%d %H:%M:%S"}},
+    "mlperf": {"filepath": MLPERF_CSV_filepath, "read_csv": {"sep": "\t", "encoding": "utf-16"}},
+}
+
+# filepath -> (mtime_ns, size) of the copy that is loaded
+_loaded_versions = {}
+
+
+def file_version(filepath):
+    """(mtime_ns, size) of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_csv_dataset(name, columns=None) -> pd.DataFrame:
+    """Parse a dataset from its CSV, with its dates converted."""
+    spec = DATASETS[name]
+    df = pd.read_csv(spec["filepath"], usecols=columns, **spec.get("read_csv", {}))
+    if columns is not None:
+        df = df[columns]    # usecols keeps the file's column order
+    for column, date_format in spec.get("dates", {}).items():
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format=date_format)
+    return df
+
+
+def read_dataset(name, columns=None) -> pd.DataFrame:
+    """A dataset from its columnar copy if that is up to date, otherwise from its CSV."""
+    filepath = DATASETS[name]["filepath"]
+    # record the version before reading, so a write during the read is seen as a change later
+    _loaded_versions[filepath] = file_version(filepath)
+    df = columnar.load_table(name, filepath, columns=columns)
+    if df is None:
+        df = read_csv_dataset(name, columns)
+    return df
+
+
+def _first_by_key(keys, values):
+    """Build {key: value} keeping the first value per key (matches `.iloc[0]` on a filter)."""
+    index = {}
+    for key, value in zip(keys, values):
+        if key not in index:
+            index[key] = value
+    return index
+
+
+##################################################################
+# Raw datasets
+##################################################################
+
+@lru_cache(maxsize=None)
+@telemetry.span("datastore.load_pue_csv")
+def get_pue_data() -> pd.DataFrame:
+    return read_dataset("pue")
+
+
+@lru_cache(maxsize=None)
+@telemetry.span("datastore.load_compression_csv")
+def get_compression_data() -> pd.DataFrame:
+    return read_dataset("compression")
+
+
+@lru_cache(maxsize=None)
+@telemetry.span("datastore.load_energy_price_csv")
+def get_energy_price_data() -> pd.DataFrame:
+    return read_dataset("energy_price")
+
+
+@lru_cache(maxsize=None)
+@telemetry.span("datastore.load_carbon_intensity_csv")
+def get_carbon_intensity_data() -> pd.DataFrame:
+    # Keep only relevant columns
+    return read_dataset("carbon_intensity", columns=["Datetime (UTC)", "Country", CARBON_INTENSITY_COLUMN])
+
+
+##################################################################
+# Indexes
+##################################################################
+
+@lru_cache(maxsize=None)
+def get_avg_result_index() -> dict:
+    """(system name, # nodes, processor, accelerator, # accelerators, host core count, model MLC) -> avg. result"""
+    df = get_pue_data()
+    keys = df[SYSTEM_KEY_COLUMNS].itertuples(index=False, name=None)
+    return _first_by_key(keys, df['Avg. Result at System Name'].tolist())
+
+
+@lru_cache(maxsize=None)
+def get_avg_result_arrays():
+    """The avg. result index as (pd.MultiIndex of system keys, np.ndarray of values) for vectorized joins."""
+    index = get_avg_result_index()
+    return pd.MultiIndex.from_tuples(list(index), names=SYSTEM_KEY_COLUMNS), np.array(list(index.values()), dtype=float)
+
+
+@lru_cache(maxsize=None)
+def get_hardware_index() -> dict:
+    """
+    model MLC -> {
+        "processors":   [processor, ...],
+        "accelerators": [accelerator, ...],
+        "by_accelerator": {accelerator: [processor, ...]},
+        "by_processor":   {processor: [accelerator, ...]},
+    }
+    Lists keep the order of first appearance in PUE_data.csv, like `Series.unique()`.
+    """
+    df = get_pue_data()
+    index = {}
+    for model_mlc, processor, accelerator in df[["Model MLC", "Processor", "Accelerator"]].itertuples(index=False, name=None):
+        entry = index.setdefault(model_mlc, {"processors": {}, "accelerators": {}, "by_accelerator": {}, "by_processor": {}})
+        if pd.notna(processor):
+            entry["processors"][processor] = None
+        if pd.notna(accelerator):
+            entry["accelerators"][accelerator] = None
+        if pd.notna(accelerator) and pd.notna(processor):
+            entry["by_accelerator"].setdefault(accelerator, {})[processor] = None
+            entry["by_processor"].setdefault(processor, {})[accelerator] = None
+    for entry in index.values():
+        entry["processors"] = list(entry["processors"])
+        entry["accelerators"] = list(entry["accelerators"])
+        entry["by_accelerator"] = {k: list(v) for k, v in entry["by_accelerator"].items()}
+        entry["by_processor"] = {k: list(v) for k, v in entry["by_processor"].items()}
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_compression_index() -> dict:
+    """(model_name, compressionTech) -> row dict"""
+    df = get_compression_data()
+    keys = df[["model_name", "compressionTech"]].itertuples(index=False, name=None)
+    return _first_by_key(keys, df.to_dict('records'))
+
+
+@lru_cache(maxsize=None)
+def get_compression_techniques() -> dict:
+    """model_name -> [compressionTech, ...] in file order"""
+    techniques = {}
+    for model_name, tech in get_compression_data()[["model_name", "compressionTech"]].itertuples(index=False, name=None):
+        techniques.setdefault(model_name, []).append(tech)
+    return techniques
+
+
+@lru_cache(maxsize=None)
+def get_energy_price_index() -> dict:
+    """date (pd.Timestamp) -> row dict of daily prices per market"""
+    df = get_energy_price_data()
+    return _first_by_key(df['Datum von'], df.to_dict('records'))
+
+
+@lru_cache(maxsize=None)
+def get_carbon_intensity_index() -> dict:
+    """(date (pd.Timestamp), lower-case country) -> direct carbon intensity in gCO₂eq/kWh"""
+    df = get_carbon_intensity_data()
+    # the CSV has "Germany", callers pass the selected_countries keys ("germany")
+    keys = zip(df['Datetime (UTC)'], df['Country'].str.lower())
+    return _first_by_key(keys, df[CARBON_INTENSITY_COLUMN].tolist())
+
+
+##################################################################
+# Lookups
+##################################################################
+
+def lookup_avg_result(system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc):
+    key = (system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)
+    return get_avg_result_index().get(key)
+
+
+def lookup_energy_prices(target_date):
+    return get_energy_price_index().get(pd.Timestamp(target_date))
+
+
+def lookup_carbon_intensity(target_date, country):
+    return get_carbon_intensity_index().get((pd.Timestamp(target_date), country.lower()))
+
+
+def load_all():
+    """Load every dataset and build every index (used to warm up at startup)."""
+    get_avg_result_index()
+    get_avg_result_arrays()
+    get_hardware_index()
+    get_compression_index()
+    get_compression_techniques()
+    get_energy_price_index()
+    get_carbon_intensity_index()
+
+
+# source file -> the cached dataset and indexes built from it
+DATASET_CACHES = {
+    PUE_CSV_filepath: (get_pue_data, get_avg_result_index, get_avg_result_arrays, get_hardware_index),
+    COMPRESSION_CSV_filepath: (get_compression_data, get_compression_index, get_compression_techniques),
+    ENERGY_PRICE_CSV_filepath: (get_energy_price_data, get_energy_price_index),
+    CARBON_INTENSITY_CSV_filepath: (get_carbon_intensity_data, get_carbon_intensity_index),
+}
+
+
+def reload_changed():
+    """Drop the datasets whose file changed on disk since it was loaded. Returns their file paths."""
+    changed = []
+    for filepath, loaders in DATASET_CACHES.items():
+        if filepath in _loaded_versions and file_version(filepath) != _loaded_versions[filepath]:
+            _loaded_versions.pop(filepath, None)
+            for loader in loaders:
+                loader.cache_clear()
+            changed.append(filepath)
+    return changed
+
+
+def clear():
+    """Drop all cached datasets and indexes so they are reloaded from disk on next use."""
+    for loaders in DATASET_CACHES.values():
+        for loader in loaders:
+            loader.cache_clear()
+    _loaded_versions.clear()
@@ -1,56 +1,40 @@
+import logging
 import numpy as np
 import pandas as pd
 from datetime import date
-from .mappings import tdp_mapping,proc_tdp_mapp,proc_cores_map,host_proc_core_count_mapping
-import os
+from .catalog import processors, accelerators, systems
+from .throughput import estimate_one, estimate_throughput
 
 import random
 random.seed(42)
 np.random.seed(42)
 
-def get_avg_result(system_name: str, processor: str, accelerator: str, num_nodes: int,num_accelerator: int, model_mlc: str,host_proc_core_count: int):
-    # Get the directory of the current file (model.py)
-    file_dir = os.path.dirname(__file__)
-    PUE_CSV_filepath = os.path.join(file_dir, 'PUE_data.csv')
-    df = pd.read_csv(PUE_CSV_filepath)  
-    # Filter rows where column B equals value_b and column C equals value_c
-    result = df[
-        (df['System Name'] == system_name) & 
-        (df['# of Nodes'] == num_nodes) & 
-        (df['Processor'] == processor) & 
-        (df['Accelerator'] == accelerator) & 
-        (df['# of Accelerators'] == num_accelerator) & 
-        (df['Host Processor Core Count'] == host_proc_core_count) &
-        (df['Model MLC'] == model_mlc) 
-        ]
-    if not result.empty:
-        print('Data Found!!!')
-        avg_result = result['Avg. Result at System Name'].iloc[0]  # Taking the first matching row
-        return avg_result
-    else:
-        print('Data NOT Found!!! Returning average')
-        return 66869.50     # average value
+logger = logging.getLogger(__name__)
 
-# Function to calculate energy values
-def calculate_energy_values(system_name: str, processor: str, accelerator: str, num_nodes: int, 
-                            num_accelerator: int, model_mlc: str, cooling_efficiency_factor: float, environmental_impact_factor: float):
-    # Constants
-    total_tokens = 5e9 * 30 * 3     # avg. tokens per day (1e9) * days in a month * num. of months
-    # total_tokens = 1e11 * 5  # Total tokens to be processed (example)
-
-    # Get the processor TDP, cores per processor, and host processor core count from the mappings
-    tdp_acc = tdp_mapping.get(accelerator, 457.25)  # Get accelerator TDP value
-    tdp_proc = proc_tdp_mapp.get(processor, 342.69)  # Get processor TDP value
-    cores_per_processor = proc_cores_map.get(processor, 62.56)  # Get cores per processor value
-    host_proc_core_count = host_proc_core_count_mapping.get(system_name, 63.21)  # Get host processor core count
-
-    average_result_at_system_name = get_avg_result(system_name, processor, accelerator, num_nodes, num_accelerator, model_mlc, host_proc_core_count)
-    print(f'Model_mlc: {model_mlc}\tThroughput: {average_result_at_system_name}')
-    # Compute runtime (in hours)
-    runtime_hours = total_tokens / (average_result_at_system_name * 3600)  # Using model_mlc for tokens/sec
+# Constants
+TOTAL_TOKENS = 5e9 * 30 * 3     # avg. tokens per day (1e9) * days in a month * num. of months
+# total_tokens = 1e11 * 5  # Total tokens to be processed (example)
 
-    # Compute number of processors per node
-    no_of_processors = host_proc_core_count / cores_per_processor
+
+ENERGY_FIELDS = ["tdp_acc", "tdp_proc", "cores_per_processor", "host_proc_core_count", "runtime_hours",
+                 "average_result_at_system_name", "no_of_processors", "E_IT_per_node_kWh", "E_IT_Total_kWh",
+                 "adjusted_cooling_efficiency", "E_Cooling_per_node_kWh", "E_Cooling_total_kWh",
+                 "UPS_and_battery_inefficiency", "UPS_and_battery_inefficiency_kWh", "E_Total_Facility_kWh",
+                 "throughput_confidence"]
+
+def get_avg_result(system_name: str, processor: str, accelerator: str, num_nodes: int,num_accelerator: int, model_mlc: str,host_proc_core_count: int):
+    # Measured value on an exact match of the 7-column system key, otherwise the nearest-neighbour estimate (throughput.py)
+    avg_result, _ = estimate_one(system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)
+    return avg_result
+
+def compute_energy(tdp_proc, no_of_processors, tdp_acc, num_accelerator, num_nodes, throughput,
+                   cooling_efficiency_factor, environmental_impact_factor, UPS_and_battery_inefficiency):
+    """
+    Energy formula shared by calculate_energy_values, calculate_energy_values_batch and /api/optimize/baseline.
+    Works on scalars as well as NumPy arrays of equal length.
+    """
+    # Compute runtime (in hours)
+    runtime_hours = TOTAL_TOKENS / (throughput * 3600)  # runtime_hours = number of samples / throughput(per sec) * secs in hour
 
     # Compute the energy consumption per node (in kWh)
     E_IT_per_node_kWh = (
@@ -70,24 +54,14 @@ def calculate_energy_values(system_name: str, processor: str, accelerator: str,
     # Calculate cooling energy * number of nodes
     E_Cooling_total_kWh = E_Cooling_per_node_kWh * num_nodes
 
-    # Generate random percentages for UPS and battery inefficiency
-    UPS_and_battery_inefficiency = np.random.uniform(0.85, 0.90)
-
     # Calculate UPS inefficiency (as a percentage of the total energy)
     UPS_and_battery_inefficiency_kWh = E_IT_Total_kWh * (1 - UPS_and_battery_inefficiency)
 
     # Calculate total energy consumption for the facility (in kWh)
     E_Total_Facility_kWh = E_IT_Total_kWh + E_Cooling_per_node_kWh + UPS_and_battery_inefficiency_kWh
 
-    # Return the calculated values as a dictionary
     return {
-        "tdp_acc": tdp_acc,
-        "tdp_proc": tdp_proc,
-        "cores_per_processor": cores_per_processor,
-        "host_proc_core_count": host_proc_core_count,
         "runtime_hours": runtime_hours,
-        "average_result_at_system_name": average_result_at_system_name,
-        "no_of_processors": no_of_processors,
         "E_IT_per_node_kWh": E_IT_per_node_kWh,
         "E_IT_Total_kWh": E_IT_Total_kWh,
         "adjusted_cooling_efficiency" : adjusted_cooling_efficiency,
@@ -95,6 +69,112 @@ def calculate_energy_values(system_name: str, processor: str, accelerator: str,
         "E_Cooling_total_kWh": E_Cooling_total_kWh,
         "UPS_and_battery_inefficiency": UPS_and_battery_inefficiency,
         "UPS_and_battery_inefficiency_kWh": UPS_and_battery_inefficiency_kWh,
-        "E_Total_Facility_kWh": E_Total_Facility_kWh
+        "E_Total_Facility_kWh": E_Total_Facility_kWh,
     }
 
+# Function to calculate energy values
+def calculate_energy_values(system_name: str, processor: str, accelerator: str, num_nodes: int, 
+                            num_accelerator: int, model_mlc: str, cooling_efficiency_factor: float, environmental_impact_factor: float):
+    # Get the processor TDP, cores per processor, and host processor core count from the hardware catalog
+    tdp_acc = accelerators.value(accelerator, "tdp")  # Get accelerator TDP value
+    tdp_proc = processors.value(processor, "tdp")  # Get processor TDP value
+    cores_per_processor = processors.value(processor, "cores_per_processor")  # Get cores per processor value
+    host_proc_core_count = systems.value(system_name, "host_proc_core_count")  # Get host processor core count
+
+    average_result_at_system_name, throughput_confidence = estimate_one(
+        system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)
+    logger.debug("Model_mlc: %s\tThroughput: %s", model_mlc, average_result_at_system_name)
+
+    # Compute number of processors per node
+    no_of_processors = host_proc_core_count / cores_per_processor
+
+    # Generate random percentages for UPS and battery inefficiency
+    UPS_and_battery_inefficiency = np.random.uniform(0.85, 0.90)
+
+    energy = compute_energy(tdp_proc, no_of_processors, tdp_acc, num_accelerator, num_nodes,
+                            average_result_at_system_name, cooling_efficiency_factor,
+                            environmental_impact_factor, UPS_and_battery_inefficiency)
+
+    # Return the calculated values as a dictionary
+    return {
+        "tdp_acc": tdp_acc,
+        "tdp_proc": tdp_proc,
+        "cores_per_processor": cores_per_processor,
+        "host_proc_core_count": host_proc_core_count,
+        "average_result_at_system_name": average_result_at_system_name,
+        "no_of_processors": no_of_processors,
+        **energy,
+        "throughput_confidence": throughput_confidence,
+    }
+
+
+##################################################################
+# Vectorized engine
+##################################################################
+
+HARDWARE_FIELDS = ["tdp_acc", "tdp_proc", "cores_per_processor", "host_proc_core_count",
+                   "average_result_at_system_name", "no_of_processors", "throughput_confidence"]
+
+
+def lookup_component_specs(processor, accelerator) -> dict:
+    """TDP of the accelerator and processor and cores per processor, as arrays (resolved through the catalog)."""
+    processor_entries = processors.encode(processor)
+    return {
+        "tdp_acc": accelerators.lookup(accelerator, "tdp"),
+        "tdp_proc": processors.table[processor_entries, processors.fields.index("tdp")],
+        "cores_per_processor": processors.table[processor_entries, processors.fields.index("cores_per_processor")],
+    }
+
+
+def lookup_hardware(system_name, processor, accelerator, num_nodes, num_accelerator, model_mlc) -> dict:
+    """The hardware inputs of the energy formula (HARDWARE_FIELDS) for arrays of configurations, as arrays."""
+    system_name = np.asarray(system_name, dtype=object)
+    processor = np.asarray(processor, dtype=object)
+    accelerator = np.asarray(accelerator, dtype=object)
+
+    specs = lookup_component_specs(processor, accelerator)
+    cores_per_processor = specs["cores_per_processor"]
+    host_proc_core_count = systems.lookup(system_name, "host_proc_core_count")
+
+    average_result_at_system_name, throughput_confidence = estimate_throughput(
+        system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)
+    return {
+        **specs,
+        "host_proc_core_count": host_proc_core_count,
+        "average_result_at_system_name": average_result_at_system_name,
+        # Compute number of processors per node
+        "no_of_processors": host_proc_core_count / cores_per_processor,
+        "throughput_confidence": throughput_confidence,
+    }
+
+
+def calculate_energy_values_batch(configurations, rng=None) -> pd.DataFrame:
+    """
+    calculate_energy_values for N configurations in one vectorized pass.
+
+    configurations: DataFrame (or dict of columns) with system_name, processor, accelerator, num_nodes,
+                    num_accelerator, model_mlc, cooling_efficiency_factor and environmental_impact_factor.
+    rng:            np.random.Generator for the UPS inefficiency draws (default: the global NumPy RNG).
+    Returns a DataFrame with the fields of calculate_energy_values (ENERGY_FIELDS), one row per configuration.
+    """
+    configurations = pd.DataFrame(configurations)
+    n = len(configurations)
+    num_nodes = configurations["num_nodes"].to_numpy()
+    num_accelerator = configurations["num_accelerator"].to_numpy()
+    hardware = lookup_hardware(configurations["system_name"].to_numpy(dtype=object),
+                               configurations["processor"].to_numpy(dtype=object),
+                               configurations["accelerator"].to_numpy(dtype=object),
+                               num_nodes, num_accelerator,
+                               configurations["model_mlc"].to_numpy(dtype=object))
+
+    if rng is None:
+        UPS_and_battery_inefficiency = np.random.uniform(0.85, 0.90, n)
+    else:
+        UPS_and_battery_inefficiency = rng.uniform(0.85, 0.90, n)
+
+    energy = compute_energy(hardware["tdp_proc"], hardware["no_of_processors"], hardware["tdp_acc"],
+                            num_accelerator, num_nodes, hardware["average_result_at_system_name"],
+                            configurations["cooling_efficiency_factor"].to_numpy(dtype=float),
+                            configurations["environmental_impact_factor"].to_numpy(dtype=float),
+                            UPS_and_battery_inefficiency)
+    return pd.DataFrame({**hardware, **energy}, index=configurations.index)[ENERGY_FIELDS]
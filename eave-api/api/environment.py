@@ -1,3 +1,6 @@
+import zlib
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 import random
@@ -11,80 +14,86 @@ ASHRAE_TEMP_MAX = 27  # °C
 ASHRAE_HUMIDITY_MIN = 30  # %
 ASHRAE_HUMIDITY_MAX = 70  # %
 
-def get_env_data(date_input):
-    """Generate environmental data for a given date or timestamp.
-    
-    If only a date is provided, defaults to 12:00 PM (midday).
-    """
-    
-    # Convert input to pandas Timestamp
-    timestamp = pd.to_datetime(date_input)
+ENV_SEED = 42
 
-    # If no specific time is given, set it to 12:00 PM (midday)
-    if timestamp.hour == 0 and timestamp.minute == 0 and timestamp.second == 0:
-        timestamp = timestamp.replace(hour=12)
+# Seasonal temperature baselines (°C) per month, index 0 = January
+MONTHLY_AVG_TEMP = np.array([
+    2, 2,           # Winter (Jan, Feb)
+    10, 10, 10,     # Spring (Mar-May)
+    20, 20, 20,     # Summer (Jun-Aug)
+    10, 10, 10,     # Fall (Sep-Nov)
+    2,              # Winter (Dec)
+], dtype=float)
+
+
+def _location_key(location):
+    return (location or "").strip().lower()
 
-    # Extract month and hour for seasonal and daily variations
-    month = timestamp.month
-    hour = timestamp.hour
-    
-    # Define seasonal temperature baselines
-    if month in [12, 1, 2]:  # Winter
-        avg_temp = 2
-    elif month in [3, 4, 5]:  # Spring
-        avg_temp = 10
-    elif month in [6, 7, 8]:  # Summer
-        avg_temp = 20
-    else:  # Fall (Sep-Nov)
-        avg_temp = 10
+
+def _table_seed(location_key, year):
+    # stable across processes (unlike hash()), so every worker generates the same table
+    return [ENV_SEED, year, zlib.crc32(location_key.encode("utf-8"))]
+
+
+@lru_cache(maxsize=64)
+def _env_table(location_key: str, year: int):
+    """Hourly environmental data for a whole year at one location, generated in one vectorized pass.
+
+    Returns a dict of arrays indexed by hour of the year (0 = Jan 1st 00:00).
+    """
+    hours = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h", inclusive="left")
+    month = hours.month.to_numpy()
+    hour = hours.hour.to_numpy()
+    n = len(hours)
+    rng = np.random.default_rng(_table_seed(location_key, year))
+
+    avg_temp = MONTHLY_AVG_TEMP[month - 1]
 
     # Daily variation (sinusoidal fluctuation)
     daily_variation = 5 * np.sin(2 * np.pi * hour / 24)
-    
+
     # Random noise for real-world variability
-    random_noise = np.random.normal(0, 2)
-    
+    random_noise = rng.normal(0, 2, n)
+
     # Compute temperature
     temperature = avg_temp + daily_variation + random_noise
-    
+
     # Humidity (%) inversely related to temperature
-    humidity = 75 - 0.4 * (temperature - avg_temp) + np.random.normal(0, 5)
-    
+    humidity = 75 - 0.4 * (temperature - avg_temp) + rng.normal(0, 5, n)
+
     # Solar radiation (zero at night, peaks at midday)
-    solar_radiation = max(
+    solar_radiation = np.maximum(
         0,
         800 * np.sin((hour / 24) * np.pi) * (1 + 0.3 * np.cos(2 * np.pi * (month - 1) / 12))
     )
-    
+
     # Wind speed (normally distributed, average 4 m/s)
-    wind_speed = np.random.normal(4, 1.5)
-    
+    wind_speed = rng.normal(4, 1.5, n)
+
     # === ASHRAE IMPACT CALCULATIONS ===
-    
+
     # Temperature impact
-    temp_impact = (
-        (temperature - ASHRAE_TEMP_MAX) * 0.02 if temperature > ASHRAE_TEMP_MAX else
-        (ASHRAE_TEMP_MIN - temperature) * 0.01 if temperature < ASHRAE_TEMP_MIN else 0
+    temp_impact = np.where(
+        temperature > ASHRAE_TEMP_MAX, (temperature - ASHRAE_TEMP_MAX) * 0.02,
+        np.where(temperature < ASHRAE_TEMP_MIN, (ASHRAE_TEMP_MIN - temperature) * 0.01, 0.0)
     )
-    
+
     # Humidity impact
-    humidity_impact = (
-        (humidity - ASHRAE_HUMIDITY_MAX) * 0.01 if humidity > ASHRAE_HUMIDITY_MAX else
-        (ASHRAE_HUMIDITY_MIN - humidity) * 0.01 if humidity < ASHRAE_HUMIDITY_MIN else 0
+    humidity_impact = np.where(
+        humidity > ASHRAE_HUMIDITY_MAX, (humidity - ASHRAE_HUMIDITY_MAX) * 0.01,
+        np.where(humidity < ASHRAE_HUMIDITY_MIN, (ASHRAE_HUMIDITY_MIN - humidity) * 0.01, 0.0)
     )
-    
+
     # Solar radiation impact (higher solar radiation increases cooling load)
     solar_impact = solar_radiation * 0.0010  # 0.1% increase per W/m²
-    
+
     # Wind speed impact (higher wind speeds aid cooling, reducing impact)
-    wind_impact = (3 - wind_speed) * 0.02 if wind_speed > 3 else 0  # 2% decrease per m/s above baseline
-    
+    wind_impact = np.where(wind_speed > 3, (3 - wind_speed) * 0.02, 0.0)  # 2% decrease per m/s above baseline
+
     # Total environmental impact factor
     environmental_impact_factor = 1 + temp_impact + humidity_impact + solar_impact + wind_impact
 
-    # Return the calculated values
-    return {
-        "Timestamp": timestamp,
+    table = {
         "Temperature_C": temperature,
         "Humidity_%": humidity,
         "Solar_Radiation_Wm2": solar_radiation,
@@ -95,6 +104,68 @@ def get_env_data(date_input):
         "Wind_Impact": wind_impact,
         "Environmental_Impact_Factor": environmental_impact_factor,
     }
+    for values in table.values():
+        values.flags.writeable = False    # shared by every caller
+    return table
+
+
+def _default_to_midday(timestamp):
+    # If no specific time is given, set it to 12:00 PM (midday)
+    if timestamp.hour == 0 and timestamp.minute == 0 and timestamp.second == 0:
+        timestamp = timestamp.replace(hour=12)
+    return timestamp
+
+
+def _hour_of_year(timestamp):
+    return (timestamp.dayofyear - 1) * 24 + timestamp.hour
+
+
+def get_env_table(year: int, location=None) -> pd.DataFrame:
+    """The full hourly table for `year` at `location`, as a DataFrame indexed by timestamp."""
+    table = _env_table(_location_key(location), int(year))
+    index = pd.date_range(f"{year}-01-01", periods=len(table["Temperature_C"]), freq="h", name="Timestamp")
+    return pd.DataFrame(table, index=index)
+
+
+def get_env_data(date_input, location=None):
+    """Generate environmental data for a given date or timestamp.
+    
+    If only a date is provided, defaults to 12:00 PM (midday).
+    Values come from a seeded hourly table per (location, year), so the same
+    timestamp and location always give the same result.
+    """
+    
+    # Convert input to pandas Timestamp
+    timestamp = _default_to_midday(pd.Timestamp(date_input))
+
+    table = _env_table(_location_key(location), timestamp.year)
+    i = _hour_of_year(timestamp)
+
+    # Return the calculated values
+    env_data = {"Timestamp": timestamp}
+    for name, values in table.items():
+        env_data[name] = float(values[i])
+    return env_data
+
+
+def get_env_data_batch(timestamps, location=None) -> dict:
+    """Vectorized get_env_data for many timestamps at one location: a dict of arrays."""
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    midnight = (timestamps.hour == 0) & (timestamps.minute == 0) & (timestamps.second == 0)
+    timestamps = timestamps.where(~midnight, timestamps + pd.Timedelta(hours=12))
+    hour_of_year = (timestamps.dayofyear.to_numpy() - 1) * 24 + timestamps.hour.to_numpy()
+    years = timestamps.year.to_numpy()
+
+    location_key = _location_key(location)
+    columns = list(_env_table(location_key, int(years[0])).keys()) if len(years) else []
+    env_data = {"Timestamp": timestamps}
+    env_data.update({name: np.empty(len(timestamps)) for name in columns})
+    for year in np.unique(years):
+        table = _env_table(location_key, int(year))
+        rows = years == year
+        for name in columns:
+            env_data[name][rows] = table[name][hour_of_year[rows]]
+    return env_data
 
 
 
@@ -102,4 +173,5 @@ if __name__=="__main__":
     # Example usage:
     print(get_env_data("2023-06-15"))  # Only date
     print(get_env_data("2023-06-15 08:00:00"))  # Date with time
+    print(get_env_data("2023-06-15", location="germany"))  # Date at a location
 
@@ -0,0 +1,210 @@
+import os
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from . import telemetry
+
+'''
+Execution layer for the FastAPI app.
+
+Blocking work is kept off the asyncio event loop:
+    io        - thread pool for disk reads, pickle loads, dict lookups and orchestration
+    inference - process pool for CPU-bound model inference (BNN sampling, candidate sweeps)
+
+Each pool admits at most `max_workers + max_queue` tasks at a time. Requests beyond that are
+rejected with ExecutorSaturated (served as 503) instead of queueing without bound, and the
+current queue depth and saturation of both pools are reported by stats().
+
+Tasks in the process pool return their worker's telemetry (see telemetry.py) with the result; thread
+pool tasks run in a copy of the caller's context, so their spans count towards the calling request.
+'''
+
+
+class ExecutorSaturated(Exception):
+    def __init__(self, name):
+        super().__init__(f"The {name} executor is saturated, retry later")
+        self.name = name
+
+
+def _init_inference_worker():
+    # importing the api package restores the persisted BNN posterior; also build the data indexes
+    from . import datastore
+    from .registry import forecast_models
+    datastore.load_all()
+    forecast_models.warm_up()
+
+
+def _noop():
+    return os.getpid()
+
+
+def _call_and_drain(call):
+    # runs in a worker process: ship the worker's spans and events back with the result
+    return call(), telemetry.drain()
+
+
+class BoundedExecutor:
+    def __init__(self, name, pool_factory, max_workers, max_queue, separate_process=False):
+        self.name = name
+        self.separate_process = separate_process
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool_factory = pool_factory
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self._pool_factory(self.max_workers)
+        return self._pool
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _acquire(self, count=1, reject=True):
+        with self._lock:
+            if reject and self._pending + count > self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name)
+            self._pending += count
+            self.submitted += count
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def ensure_capacity(self):
+        """Raise ExecutorSaturated now if no new task would be admitted."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and await its result, or raise ExecutorSaturated."""
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(fn, *args, **kwargs)
+            with telemetry.span(f"executor.{self.name}"):
+                if self.separate_process:
+                    result, drained = await loop.run_in_executor(self.pool, _call_and_drain, call)
+                    telemetry.merge(drained)
+                    return result
+                return await loop.run_in_executor(self.pool, contextvars.copy_context().run, call)
+        finally:
+            self._release()
+
+    def map(self, fn, iterable):
+        """Blocking map for use from worker threads. Internal fan-out waits for capacity rather than failing."""
+        items = list(iterable)
+        self._acquire(len(items), reject=False)
+        futures = []
+        try:
+            for item in items:
+                if self.separate_process:
+                    future = self.pool.submit(_call_and_drain, functools.partial(fn, item))
+                else:
+                    future = self.pool.submit(contextvars.copy_context().run, fn, item)
+                future.add_done_callback(self._release)
+                futures.append(future)
+        finally:
+            # release the slots of items that never got submitted
+            for _ in range(len(items) - len(futures)):
+                self._release()
+        if not self.separate_process:
+            return [future.result() for future in futures]
+        results = []
+        for future in futures:
+            result, drained = future.result()
+            telemetry.merge(drained)
+            results.append(result)
+        return results
+
+    def warm_up(self):
+        """Start every worker now rather than on the first request."""
+        if self.separate_process:
+            # also collects the workers' start-up spans (model and data loading)
+            futures = [self.pool.submit(_call_and_drain, _noop) for _ in range(self.max_workers)]
+            for future in futures:
+                telemetry.merge(future.result()[1])
+        else:
+            futures = [self.pool.submit(_noop) for _ in range(self.max_workers)]
+            for future in futures:
+                future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+            return {
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": min(pending, self.max_workers),
+                "queue_depth": max(pending - self.max_workers, 0),
+                "saturation": pending / self.capacity,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+def _thread_pool(max_workers):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="eave-io")
+
+
+def _process_pool(max_workers):
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_inference_worker,
+    )
+
+
+io_executor = BoundedExecutor(
+    "io",
+    _thread_pool,
+    max_workers=int(os.environ.get("EAVE_IO_WORKERS", 8)),
+    max_queue=int(os.environ.get("EAVE_IO_QUEUE", 64)),
+)
+inference_executor = BoundedExecutor(
+    "inference",
+    _process_pool,
+    max_workers=int(os.environ.get("EAVE_INFERENCE_WORKERS", os.cpu_count() or 1)),
+    max_queue=int(os.environ.get("EAVE_INFERENCE_QUEUE", 32)),
+    separate_process=True,
+)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await io_executor.run(fn, *args, **kwargs)
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await inference_executor.run(fn, *args, **kwargs)
+
+
+def stats():
+    return {"io": io_executor.stats(), "inference": inference_executor.stats()}
+
+
+def shutdown():
+    io_executor.shutdown()
+    inference_executor.shutdown()
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import argparse
+import calendar
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from . import columnar, datastore, pipeline
+from .energy import lookup_component_specs
+from .catalog import processors, accelerators
+
+'''
+Ingestion of MLPerf Inference result exports into the PUE training data.
+
+    python -m api.ingest_mlperf api/MLPerf_Inference_data.csv new_round.csv ...
+
+An export (UTF-16, tab-separated, with some columns duplicated as "<name>.1") is streamed in chunks
+through a chain of generators:
+
+    read_export -> clean -> normalize_hardware -> enrich -> append to the columnar table MLPERF_TABLE
+
+clean merges the duplicated columns and drops invalid or incomplete results, normalize_hardware maps
+processor and accelerator names onto the spellings of the hardware catalog (catalog.py), and enrich expands
+every result into one row per season (as in PUE_data.csv), with environment and energy features from the
+vectorized pipeline stages and PUE = facility energy / IT energy. Each chunk becomes one part of the
+append-only table (see columnar.py), so memory is bounded by the chunk size and earlier rounds are never
+re-read. Export files already ingested (by content hash) and results already present (by RESULT_KEY)
+are skipped, so re-running on a growing set of exports only adds the new rounds.
+
+model.read_training_data() adds the ingested rows to PUE_data.csv, and the posterior fingerprint covers
+them, so the BNN is retrained on its next start.
+'''
+
+MLPERF_TABLE = datastore.MLPERF_TABLE
+CHUNK_ROWS = 10_000
+
+# identifies one result across exports
+RESULT_KEY = ["Public ID", "Model MLC", "Scenario"]
+
+EXPORT_RENAMES = {"System Name (click + for details)": "System Name"}
+REQUIRED_COLUMNS = ["System Name", "# of Nodes", "Processor", "# of Accelerators", "Model MLC",
+                    "Host Processor Core Count", "Avg. Result at System Name"]
+
+# how PUE_data.csv was sampled: one timestamp per season in one year, a uniform cooling efficiency factor
+SEASON_MONTHS = {"Winter": (12, 1, 2), "Spring": (3, 4, 5), "Summer": (6, 7, 8), "Fall": (9, 10, 11)}
+DEFAULT_YEAR = 2023
+COOLING_EFFICIENCY_RANGE = (0.2, 0.7)
+
+# PUE_data.csv columns -> (stage, field) they are computed from
+OUTPUT_SOURCES = {
+    "TDP_acc": ("energy", "tdp_acc"),
+    "TDP_proc": ("energy", "tdp_proc"),
+    "Cooling_Efficiency_Factor": ("request", "cooling_efficiency"),
+    "Cores per Processor": ("energy", "cores_per_processor"),
+    "No_of_Processors": ("energy", "no_of_processors"),
+    "runtime_hours": ("energy", "runtime_hours"),
+    "E_IT_per_node_kWh": ("energy", "E_IT_per_node_kWh"),
+    "E_IT_Total_kWh": ("energy", "E_IT_Total_kWh"),
+    "E_Cooling_per_node_kWh": ("energy", "E_Cooling_per_node_kWh"),
+    "E_Cooling_total_kWh": ("energy", "E_Cooling_total_kWh"),
+    "UPS_and_battery_inefficiency": ("energy", "UPS_and_battery_inefficiency"),
+    "UPS_and_battery_inefficiency_kWh": ("energy", "UPS_and_battery_inefficiency_kWh"),
+    "E_Total_Facility_kWh": ("energy", "E_Total_Facility_kWh"),
+}
+ENVIRONMENT_COLUMNS = ["Temperature_C", "Humidity_%", "Solar_Radiation_Wm2", "Wind_Speed_mps"]
+
+
+##################################################################
+# Stages
+##################################################################
+
+def read_export(filepath, chunk_rows=CHUNK_ROWS, read_csv=None):
+    """The raw export in DataFrames of at most `chunk_rows` rows."""
+    options = {**datastore.DATASETS["mlperf"]["read_csv"], **(read_csv or {})}
+    with pd.read_csv(filepath, chunksize=chunk_rows, **options) as reader:
+        yield from reader
+
+
+def merge_duplicate_columns(chunk):
+    """Fold the "<name>.<n>" copies pandas makes of duplicated headers into "<name>" (first non-null wins)."""
+    for column in list(chunk.columns):
+        match = re.fullmatch(r"(.+)\.(\d+)", str(column))
+        if match and match.group(1) in chunk.columns:
+            chunk[match.group(1)] = chunk[match.group(1)].combine_first(chunk[column])
+            chunk = chunk.drop(columns=column)
+    return chunk
+
+
+def clean(chunks):
+    for chunk in chunks:
+        chunk = merge_duplicate_columns(chunk).rename(columns=EXPORT_RENAMES)
+        if "Valid / Invalid" in chunk.columns:
+            chunk = chunk[chunk["Valid / Invalid"].astype(str).str.strip().str.lower() != "invalid"]
+        chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+        # CPU-only systems have no accelerator in the export; PUE_data.csv and tdp_mapping call them "CPU-only"
+        cpu_only = chunk["Accelerator"].isna() & (chunk["# of Accelerators"] == 0)
+        chunk = chunk.assign(Accelerator=chunk["Accelerator"].mask(cpu_only, "CPU-only"))
+        yield chunk.reset_index(drop=True)
+
+
+def _normalize_column(names, catalog, unmatched):
+    renames = {}
+    for name, count in names.value_counts().items():
+        resolution = catalog.resolve(name)
+        if resolution.method == "fallback":
+            unmatched[name] += count
+        # fuzzy matches keep their own name: they are a different model priced like the match
+        elif resolution.method == "normalized":
+            renames[name] = resolution.entry
+    return names.replace(renames) if renames else names
+
+
+def normalize_hardware(chunks, report):
+    """Rename processors and accelerators spelled differently from the catalog to its spelling; names the
+    catalog can't resolve are kept (the energy formula then uses dataset averages) and counted in
+    report["unmatched_*"]."""
+    for chunk in chunks:
+        chunk["Processor"] = _normalize_column(chunk["Processor"], processors, report["unmatched_processors"])
+        chunk["Accelerator"] = _normalize_column(chunk["Accelerator"], accelerators, report["unmatched_accelerators"])
+        yield chunk
+
+
+def _season_timestamps(seasons, year, rng):
+    """A random hour in each season of `year`."""
+    months = np.array([rng.choice(SEASON_MONTHS[season]) for season in seasons])
+    days_in_month = np.array([calendar.monthrange(year, month)[1] for month in months])
+    days = rng.integers(0, days_in_month) + 1
+    hours = rng.integers(0, 24, len(months))
+    return pd.to_datetime(pd.DataFrame({"year": year, "month": months, "day": days, "hour": hours}))
+
+
+def enrich(chunks, year=DEFAULT_YEAR, location=None, rng=None):
+    """One PUE_data.csv row per (result, season), with environment and energy features and PUE."""
+    rng = np.random.default_rng() if rng is None else rng
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        rows = chunk.loc[chunk.index.repeat(len(SEASON_MONTHS))].reset_index(drop=True)
+        seasons = list(SEASON_MONTHS) * len(chunk)
+        timestamps = _season_timestamps(seasons, year, rng)
+        cooling_efficiency = rng.uniform(*COOLING_EFFICIENCY_RANGE, len(rows))
+
+        requests = [
+            pipeline.PUERequest(system_name, processor, accelerator, num_nodes, num_accelerator, model_mlc,
+                                cooling, timestamp, location)
+            for system_name, processor, accelerator, num_nodes, num_accelerator, model_mlc, cooling, timestamp
+            in zip(rows["System Name"], rows["Processor"], rows["Accelerator"], rows["# of Nodes"],
+                   rows["# of Accelerators"], rows["Model MLC"], cooling_efficiency, timestamps)
+        ]
+        environment = pipeline.environment_stage(requests)
+        # the export has the throughput and host core count of each result; the catalog has the TDPs
+        host_proc_core_count = rows["Host Processor Core Count"].to_numpy(dtype=float)
+        specs = lookup_component_specs(rows["Processor"].to_numpy(dtype=object), rows["Accelerator"].to_numpy(dtype=object))
+        hardware = {
+            **specs,
+            "host_proc_core_count": host_proc_core_count,
+            "average_result_at_system_name": rows["Avg. Result at System Name"].to_numpy(dtype=float),
+            "no_of_processors": host_proc_core_count / specs["cores_per_processor"],
+            "throughput_confidence": np.ones(len(rows)),    # measured
+        }
+        energy = pipeline.energy_stage(requests, environment, hardware, rng)
+
+        sources = {"request": {"cooling_efficiency": cooling_efficiency}, "energy": energy}
+        enriched = rows.assign(
+            Season=seasons,
+            Timestamp=timestamps,
+            **{column: environment[column] for column in ENVIRONMENT_COLUMNS},
+            **{column: sources[stage][field] for column, (stage, field) in OUTPUT_SOURCES.items()},
+            PUE=energy["E_Total_Facility_kWh"] / energy["E_IT_Total_kWh"],
+        )
+        yield enriched
+
+
+##################################################################
+# Ingestion
+##################################################################
+
+def ingested_keys(directory=columnar.COLUMNAR_DIR):
+    """RESULT_KEY tuples of the results already in the table."""
+    keys = set()
+    for part in columnar.iter_parts(MLPERF_TABLE, columns=RESULT_KEY, directory=directory):
+        keys.update(part[RESULT_KEY].astype(str).itertuples(index=False, name=None))
+    return keys
+
+
+def ingest(filepaths, chunk_rows=CHUNK_ROWS, year=DEFAULT_YEAR, location=None, seed=None,
+           directory=columnar.COLUMNAR_DIR, read_csv=None):
+    """Ingest MLPerf exports into MLPERF_TABLE. Returns a report of what was read, skipped and appended."""
+    rng = np.random.default_rng(seed)
+    report = {"files": {}, "unmatched_processors": Counter(), "unmatched_accelerators": Counter()}
+    manifest = columnar.read_manifest(MLPERF_TABLE, directory) or {"sources": {}}
+    known = ingested_keys(directory)
+
+    for filepath in filepaths:
+        digest = columnar._sha256(filepath)
+        if digest in manifest["sources"]:
+            report["files"][filepath] = {"skipped": "already ingested"}
+            continue
+        stats = {"results": 0, "duplicates": 0, "rows": 0, "parts": 0}
+        chunks = normalize_hardware(clean(read_export(filepath, chunk_rows, read_csv)), report)
+        for chunk in chunks:
+            keys = list(chunk[RESULT_KEY].astype(str).itertuples(index=False, name=None))
+            new = np.array([key not in known for key in keys], dtype=bool)
+            stats["results"] += len(keys)
+            stats["duplicates"] += int((~new).sum())
+            for enriched in enrich([chunk[new].reset_index(drop=True)], year, location, rng):
+                enriched["Source"] = os.path.basename(filepath)
+                columnar.append_part(enriched, MLPERF_TABLE, source=os.path.basename(filepath), directory=directory)
+                stats["rows"] += len(enriched)
+                stats["parts"] += 1
+            known.update(key for key, is_new in zip(keys, new) if is_new)
+        # only now is the whole file in the table; an interrupted run re-reads it and skips the results it has
+        manifest = columnar.record_sources(MLPERF_TABLE, {digest: {"file": os.path.basename(filepath), **stats}},
+                                           directory=directory)
+        report["files"][filepath] = stats
+
+    report["unmatched_processors"] = dict(report["unmatched_processors"])
+    report["unmatched_accelerators"] = dict(report["unmatched_accelerators"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest MLPerf Inference result exports into the PUE training data.")
+    parser.add_argument("exports", nargs="*", default=[datastore.MLPERF_CSV_filepath],
+                        help=f"export files (default: {datastore.MLPERF_CSV_filepath})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="export rows per chunk")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR, help="year of the seasonal timestamps")
+    parser.add_argument("--location", default=None, help="location of the environment data (default: none, as PUE_data.csv)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for timestamps, cooling factors and UPS draws")
+    parser.add_argument("--encoding", default=None, help="export encoding (default: utf-16)")
+    parser.add_argument("--sep", default=None, help="export separator (default: tab)")
+    parser.add_argument("--directory", default=columnar.COLUMNAR_DIR, help=f"columnar store (default: {columnar.COLUMNAR_DIR})")
+    args = parser.parse_args(argv)
+
+    read_csv = {key: value for key, value in (("encoding", args.encoding), ("sep", args.sep)) if value is not None}
+    report = ingest(args.exports, args.chunk_rows, args.year, args.location, args.seed, args.directory, read_csv)
+    print(json.dumps(report, indent=1, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import json
+import hashlib
+import threading
+
+from . import datastore
+
+'''
+Precomputed answers of the dropdown endpoints (hardware per model, processors per accelerator,
+accelerators per processor, compression techniques and baseline models).
+
+Every answer is rendered once into its JSON body together with a strong ETag (a hash of the body),
+so a request is a dict lookup, and a client that already has the answer gets a 304. The tables are
+rebuilt when PUE_data.csv or compression_technique_data.csv change on disk.
+'''
+
+SOURCE_FILES = (datastore.PUE_CSV_filepath, datastore.COMPRESSION_CSV_filepath)
+
+
+def render(payload):
+    """(JSON body, strong ETag) of a response payload."""
+    # same encoding as FastAPI's JSONResponse
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def build_tables():
+    """
+    {
+        "hardware":     {model_mlc: answer},
+        "processors":   {model_mlc: {accelerator: answer}},
+        "accelerators": {model_mlc: {processor: answer}},
+        "compression":  {model_name: answer},
+        "baselines":    answer,
+        "empty_hardware", "empty_processors", "empty_accelerators": answers for unknown keys,
+    }
+    where answer is (JSON body, ETag).
+    """
+    hardware_index = datastore.get_hardware_index()
+    techniques = datastore.get_compression_techniques()
+    return {
+        "hardware": {
+            model_mlc: render({"processors": entry["processors"], "accelerators": entry["accelerators"]})
+            for model_mlc, entry in hardware_index.items()
+        },
+        "processors": {
+            model_mlc: {accelerator: render({"processors": processors})
+                        for accelerator, processors in entry["by_accelerator"].items()}
+            for model_mlc, entry in hardware_index.items()
+        },
+        "accelerators": {
+            model_mlc: {processor: render({"accelerators": accelerators})
+                        for processor, accelerators in entry["by_processor"].items()}
+            for model_mlc, entry in hardware_index.items()
+        },
+        # 'original' is the baseline itself, not a compression technique
+        "compression": {
+            model_name: render({"compressionList": [tech for tech in techs if tech.lower() != 'original']})
+            for model_name, techs in techniques.items()
+        },
+        "baselines": render({"baselineList": list(techniques)}),
+        "empty_hardware": render({"processors": [], "accelerators": []}),
+        "empty_processors": render({"processors": []}),
+        "empty_accelerators": render({"accelerators": []}),
+    }
+
+
+_tables = None
+_tables_versions = None
+_lock = threading.Lock()
+
+
+def get_tables():
+    """The lookup tables, rebuilt first if a source file changed since they were built."""
+    global _tables, _tables_versions
+    versions = tuple(datastore.file_version(filepath) for filepath in SOURCE_FILES)
+    if _tables is None or versions != _tables_versions:
+        with _lock:
+            if _tables is None or versions != _tables_versions:
+                datastore.reload_changed()
+                _tables = build_tables()
+                _tables_versions = versions
+    return _tables
+
+
+def hardware(model_mlc):
+    tables = get_tables()
+    return tables["hardware"].get(model_mlc, tables["empty_hardware"])
+
+
+def processors(model_mlc, accelerator):
+    tables = get_tables()
+    return tables["processors"].get(model_mlc, {}).get(accelerator, tables["empty_processors"])
+
+
+def accelerators(model_mlc, processor):
+    tables = get_tables()
+    return tables["accelerators"].get(model_mlc, {}).get(processor, tables["empty_accelerators"])
+
+
+def compression_list(model_name):
+    """The answer for `model_name`, or None for an unknown model."""
+    return get_tables()["compression"].get(model_name)
+
+
+def baseline_list():
+    return get_tables()["baselines"]
@@ -37,7 +37,6 @@ proc_tdp_mapp = {
     '2xAMD EPYC 9374F' :640,
     'AMD EPYC 9654 96-Core Processor': 360,
  'AMD EPYC 9374F 32-Core Processor' : 320 ,
-'INTEL(R) XEON(R) PLATINUM 8592+': 350 ,
  'Intel Xeon Gold 6448H' : 250 ,
 'AMD EPYC 9684X 96-Core Processor': 400,
  'INTEL(R) XEON(R) PLATINUM 8562Y+' : 300,
@@ -60,7 +59,6 @@ proc_tdp_mapp = {
 'Intel(R) Xeon(R) Platinum 8480C': 350,
  'NVIDIA Grace CPU' : 500,
 'AMD EPYC 9254 24-Core Processor': 200,
- 'Intel(R) Xeon(R) Platinum 8592+': 350,
 'Intel(R) Xeon(R) Platinum 8458P': 350,
  'Intel(R) Xeon(R) Platinum 8480CL' : 350,
 'AMD EPYC 9654':360,
@@ -70,7 +68,6 @@ proc_tdp_mapp = {
  'Intel(R) Xeon(R) Gold 6448Y':225,
 '2xAMD EPYC TURIN': 1000,
 'AMD EPYC 9B14':400,
- 'INTEL(R) XEON(R) 6980P': 500,
 'Intel(R) Xeon(R) Silver 4410Y':150,
  'AMD EPYC 9124 16-Core Processor': 200,
  'Intel(R) Xeon(R) CPU E5-2698 v4 @ 2.20GHz' : 135,
@@ -1,4 +1,13 @@
 import os
+import copy
+import fcntl
+import hashlib
+import inspect
+import json
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import date
 import numpy as np
 import joblib
@@ -14,18 +23,53 @@ from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
-from .energy import calculate_energy_values
-from .environment import get_env_data
+from . import pipeline
+from . import columnar
+from .datastore import MLPERF_TABLE
+from . import casual_model
 from .casual_model import CausalBNN  # your BNN definition, used only for training
+from .inference import PosteriorSampleBank, summarize_samples, DEFAULT_QUANTILES
+from . import telemetry
 
 ##################################################################
 '''
     Training the BNN model because loading saved probablistic model is not directly supported by pyro.
     See comments at the end of (causal_model.py) for a list of model-loading methods tried.
+
+    The trained posterior (guide parameters from the pyro param store) and the fitted scaler are
+    persisted to POSTERIOR_filepath together with a fingerprint of the training data, the model
+    definition and the training settings. On import the artifact is restored when the fingerprint
+    still matches, otherwise the model is retrained and the artifact rewritten.
+
+    New PUE measurements are ingested with update_posterior(): they are appended to MEASUREMENTS_filepath,
+    the scaler statistics are updated incrementally and SVI is warm-started from the current guide
+    parameters for NUM_UPDATE_STEPS steps. The result is saved as the new artifact and swapped in;
+    other processes pick it up on their next prediction (see refresh_posterior).
 '''
 file_dir = os.path.dirname(__file__)
 PUE_CSV_filepath = os.path.join(file_dir, 'PUE_data.csv')
-df = pd.read_csv(PUE_CSV_filepath)  
+POSTERIOR_filepath = os.path.join(file_dir, 'causal_bnn_posterior.pt')
+MEASUREMENTS_filepath = os.path.join(file_dir, 'PUE_measurements.csv')    # ingested rows: features + target
+# held by the process updating the measurements and the posterior (see update_posterior)
+UPDATE_LOCK_filepath = os.path.join(file_dir, 'PUE_measurements.lock')
+
+logger = logging.getLogger(__name__)
+
+NUM_SVI_STEPS = 2000
+LEARNING_RATE = 0.01
+NUM_POSTERIOR_SAMPLES = 100
+
+# Online updates: warm-started SVI steps per ingestion, and the most rows used per update
+# (beyond that, the new rows plus a random sample of the older ones)
+NUM_UPDATE_STEPS = 200
+UPDATE_MAX_ROWS = 20_000
+
+# Serving mode for PUE inference:
+#   "predictive"  - pyro Predictive over the guide (NUM_POSTERIOR_SAMPLES fresh samples per call)
+#   "monte_carlo" - closed-form forward pass over a fixed bank of NUM_BANK_SAMPLES weight samples
+SERVING_MODES = ("predictive", "monte_carlo")
+NUM_BANK_SAMPLES = 500
+BANK_SEED = 42
 
 features = ['# of Nodes', '# of Accelerators', 'Host Processor Core Count',
        'Avg. Result at System Name', 'Temperature_C', 'Humidity_%',
@@ -37,35 +81,368 @@ features = ['# of Nodes', '# of Accelerators', 'Host Processor Core Count',
 
 target = 'PUE'
 
-# Scale features
-_scaler = StandardScaler()
-df[features] = _scaler.fit_transform(df[features])
-
-X = df[features]
-y = df[target]
-
-# Train/Test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-X_train_tensor = torch.tensor(X_train.values, dtype=torch.float32)
-y_train_tensor = torch.tensor(y_train.values, dtype=torch.float32)
-X_test_tensor = torch.tensor(X_test.values, dtype=torch.float32)
-y_test_tensor = torch.tensor(y_test.values, dtype=torch.float32)
-
-# Train BNN
-bnn = CausalBNN()
-guide = pyro.infer.autoguide.AutoDiagonalNormal(bnn)
-optimizer = Adam({"lr": 0.01})
-svi = SVI(bnn, guide, optimizer, loss=Trace_ELBO())
-
-pyro.clear_param_store()
-for step in range(2000):
-    loss = svi.step(X_train_tensor, y_train_tensor)
-    # if step % 200 == 0:
-    #     print(f"Step {step}: Loss = {loss:.2f}")
-
-_predictive = Predictive(bnn, guide=guide, num_samples=100)
+
+def get_fingerprint():
+    """Hash of everything the trained posterior depends on: the training CSV,
+    the CausalBNN definition and the training settings."""
+    digest = hashlib.sha256()
+    with open(PUE_CSV_filepath, 'rb') as f:
+        digest.update(f.read())
+    if os.path.exists(MEASUREMENTS_filepath):
+        with open(MEASUREMENTS_filepath, 'rb') as f:
+            digest.update(f.read())
+    manifest = columnar.read_manifest(MLPERF_TABLE)
+    if manifest is not None:
+        # parts are append-only, so the list of parts identifies the ingested rows
+        digest.update(json.dumps(manifest["parts"]).encode('utf-8'))
+    digest.update(inspect.getsource(casual_model).encode('utf-8'))
+    digest.update(json.dumps({
+        "features": features,
+        "target": target,
+        "num_svi_steps": NUM_SVI_STEPS,
+        "learning_rate": LEARNING_RATE,
+    }).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_training_data() -> pd.DataFrame:
+    """PUE_data.csv plus the ingested MLPerf results (ingest_mlperf.py) and measurements
+    (which only have the feature and target columns)."""
+    df = pd.read_csv(PUE_CSV_filepath)
+    mlperf = columnar.load_parts(MLPERF_TABLE, columns=features + [target])
+    if mlperf is not None:
+        df = pd.concat([df, mlperf], ignore_index=True)
+    if os.path.exists(MEASUREMENTS_filepath):
+        df = pd.concat([df, pd.read_csv(MEASUREMENTS_filepath)], ignore_index=True)
+    return df
+
+
+@telemetry.span("model.train_posterior")
+def train_posterior():
+    """Fit the scaler and run SVI from scratch. Leaves the guide parameters in the pyro param store."""
+    df = read_training_data()
+
+    # Scale features
+    scaler = StandardScaler()
+    df[features] = scaler.fit_transform(df[features].to_numpy())    # fit on arrays, as served
+
+    X = df[features]
+    y = df[target]
+
+    # Train/Test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train_tensor = torch.tensor(X_train.values, dtype=torch.float32)
+    y_train_tensor = torch.tensor(y_train.values, dtype=torch.float32)
+
+    # Train BNN
+    bnn = CausalBNN()
+    guide = pyro.infer.autoguide.AutoDiagonalNormal(bnn)
+    optimizer = Adam({"lr": LEARNING_RATE})
+    svi = SVI(bnn, guide, optimizer, loss=Trace_ELBO())
+
+    pyro.clear_param_store()
+    for step in range(NUM_SVI_STEPS):
+        loss = svi.step(X_train_tensor, y_train_tensor)
+        # if step % 200 == 0:
+        #     print(f"Step {step}: Loss = {loss:.2f}")
+    return bnn, guide, scaler
+
+
+def save_posterior(scaler, fingerprint, filepath=POSTERIOR_filepath, param_state=None):
+    """Write the guide parameters (default: the pyro param store) and scaler statistics atomically to `filepath`."""
+    artifact = {
+        "fingerprint": fingerprint,
+        "param_store": pyro.get_param_store().get_state() if param_state is None else param_state,
+        "scaler": {
+            "mean_": scaler.mean_,
+            "scale_": scaler.scale_,
+            "var_": scaler.var_,
+            "n_samples_seen_": scaler.n_samples_seen_,
+        },
+    }
+    # a temp file of its own, so processes training at the same time never write into each other's
+    fd, tmp_filepath = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(artifact, f)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        os.unlink(tmp_filepath)
+        raise
+
+
+def _restore(param_state):
+    """A (bnn, guide) pair serving the guide parameters in `param_state`, which become the param store."""
+    bnn = CausalBNN()
+    guide = pyro.infer.autoguide.AutoDiagonalNormal(bnn)
+    pyro.clear_param_store()
+    pyro.get_param_store().set_state(copy.deepcopy(param_state))
+    # The guide builds its prototype lazily; run it once with an observed target so that
+    # it picks up the restored parameters and treats "obs" as observed, as during training.
+    guide(torch.zeros(1, len(features)), torch.zeros(1))
+    return bnn, guide
+
+
+@telemetry.span("model.load_posterior")
+def load_posterior(fingerprint, filepath=POSTERIOR_filepath):
+    """Restore a saved posterior. Returns (bnn, guide, scaler), or None if the
+    artifact is missing, unreadable or was trained on different inputs."""
+    if not os.path.exists(filepath):
+        return None
+    try:
+        artifact = torch.load(filepath, weights_only=False)
+    except Exception:
+        return None
+    if artifact.get("fingerprint") != fingerprint:
+        return None
+
+    scaler = StandardScaler()
+    for name, value in artifact["scaler"].items():
+        setattr(scaler, name, value)
+    scaler.n_features_in_ = len(features)
+
+    bnn, guide = _restore(artifact["param_store"])
+    return bnn, guide, scaler
+
+
+def load_model(force_retrain=False):
+    """Load the persisted posterior, retraining (and re-saving) only if it is stale."""
+    fingerprint = get_fingerprint()
+    restored = None if force_retrain else load_posterior(fingerprint)
+    if restored is None:
+        bnn, guide, scaler = train_posterior()
+        save_posterior(scaler, fingerprint)
+    else:
+        bnn, guide, scaler = restored
+    return bnn, guide, scaler
+
+
+def _file_version(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _activate(new_bnn, new_guide, new_scaler):
+    """Swap in a posterior for serving. Readers take `_serving` in one step, so a prediction
+    never mixes the scaler of one posterior with the samples of another."""
+    global bnn, guide, _scaler, _predictive, _sample_bank, _serving, _posterior_version
+    predictive = Predictive(new_bnn, guide=new_guide, num_samples=NUM_POSTERIOR_SAMPLES)
+    sample_bank = PosteriorSampleBank.from_guide(new_bnn, new_guide, NUM_BANK_SAMPLES, len(features), seed=BANK_SEED)
+    _serving = (new_scaler, predictive, sample_bank)
+    bnn, guide, _scaler, _predictive, _sample_bank = new_bnn, new_guide, new_scaler, predictive, sample_bank
+    _posterior_version = _file_version(POSTERIOR_filepath)
+
+
+# serializes posterior updates and reloads within a process
+_posterior_lock = threading.Lock()
+
+
+@contextmanager
+def _update_lock(filepath=UPDATE_LOCK_filepath):
+    """Exclusive lock across processes (workers of the same deployment) on `filepath`."""
+    with open(filepath, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+_activate(*load_model())
+_serving_mode = os.environ.get("EAVE_INFERENCE_MODE", "predictive")
+
+
+def refresh_posterior():
+    """Reload the posterior if another process saved a newer one (e.g. after update_posterior)."""
+    global _posterior_version
+    version = _file_version(POSTERIOR_filepath)
+    if version is None or version == _posterior_version:
+        return False
+    with _posterior_lock:
+        if _file_version(POSTERIOR_filepath) == _posterior_version:
+            return False    # another thread already reloaded it
+        restored = load_posterior(get_fingerprint())
+        if restored is None:
+            # not (yet) consistent with the training data; keep serving the current posterior
+            logger.warning("Could not load the posterior in %s, keeping the current one", POSTERIOR_filepath)
+            _posterior_version = version
+            return False
+        _activate(*restored)
+        telemetry.count("posterior.reload")
+        return True
+
+
+def validate_measurements(measurements) -> pd.DataFrame:
+    """New PUE measurements (DataFrame or list of dicts with every feature and the target) as floats."""
+    df = pd.DataFrame(measurements)
+    missing = [column for column in features + [target] if column not in df.columns]
+    if missing:
+        raise ValueError(f"Measurements are missing the columns {missing}")
+    if df.empty:
+        raise ValueError("No measurements given")
+    try:
+        df = df[features + [target]].astype(float)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Measurements must be numeric: {e}")
+    if not np.isfinite(df.to_numpy()).all():
+        raise ValueError("Measurements must be finite numbers")
+    return df
+
+
+@telemetry.span("model.update_posterior")
+def update_posterior(measurements, steps=NUM_UPDATE_STEPS, seed=0):
+    """
+    Ingest new PUE measurements and update the serving posterior without retraining from scratch.
+
+    The rows are appended to MEASUREMENTS_filepath, the scaler's mean/variance are updated with
+    `partial_fit`, and SVI continues from the current guide parameters for `steps` steps on the old
+    and new rows. Training runs in a separate pyro param store scope, so the serving posterior is
+    untouched until the new one is saved and swapped in. The whole update holds UPDATE_LOCK_filepath, so
+    updates from several workers run one after the other, each starting from the posterior the last one saved.
+
+    Returns a summary: rows ingested, rows trained on, final ELBO loss and the new fingerprint.
+    """
+    new = validate_measurements(measurements)
+    # other workers may ingest at the same time: the append, fingerprint and save happen under one file lock
+    with _posterior_lock, _update_lock():
+        # continue from the posterior another worker may have saved since this one loaded its own
+        if _file_version(POSTERIOR_filepath) != _posterior_version:
+            restored = load_posterior(get_fingerprint())
+            if restored is not None:
+                _activate(*restored)
+        history = read_training_data()[features + [target]]
+        new.to_csv(MEASUREMENTS_filepath, mode='a', index=False, header=not os.path.exists(MEASUREMENTS_filepath))
+
+        scaler = copy.deepcopy(_serving[0])
+        scaler.partial_fit(new[features].to_numpy())
+
+        train = pd.concat([history, new], ignore_index=True)
+        if len(train) > UPDATE_MAX_ROWS:
+            replay = history.sample(max(UPDATE_MAX_ROWS - len(new), 0), random_state=seed)
+            train = pd.concat([replay, new], ignore_index=True)
+        X_tensor = torch.tensor(scaler.transform(train[features].to_numpy()), dtype=torch.float32)
+        y_tensor = torch.tensor(train[target].to_numpy(), dtype=torch.float32)
+
+        param_store = pyro.get_param_store()
+        with torch.random.fork_rng(), param_store.scope(copy.deepcopy(param_store.get_state())) as param_state:
+            torch.manual_seed(seed)
+            new_bnn = CausalBNN()
+            new_guide = pyro.infer.autoguide.AutoDiagonalNormal(new_bnn)
+            new_guide(X_tensor[:1], y_tensor[:1])   # bind the guide to the current parameters
+            svi = SVI(new_bnn, new_guide, Adam({"lr": LEARNING_RATE}), loss=Trace_ELBO())
+            loss = None
+            for step in range(steps):
+                loss = svi.step(X_tensor, y_tensor)
+
+        fingerprint = get_fingerprint()
+        save_posterior(scaler, fingerprint, param_state=param_state)
+        _activate(*_restore(param_state), scaler)
+        telemetry.count("posterior.update")
+        return {
+            "ingested": len(new),
+            "trained_rows": len(train),
+            "steps": steps,
+            "loss": loss,
+            "fingerprint": fingerprint,
+        }
+
+
+def set_serving_mode(mode: str):
+    """Select how PUE is inferred, one of SERVING_MODES."""
+    global _serving_mode
+    if mode not in SERVING_MODES:
+        raise ValueError(f"Unknown serving mode '{mode}', expected one of {SERVING_MODES}")
+    _serving_mode = mode
+
+
+def get_serving_mode() -> str:
+    return _serving_mode
 ##################################################################
 
+# keyword arguments of get_PUE_prediction, i.e. the fields of one scenario (see pipeline.PUERequest)
+SCENARIO_FIELDS = pipeline.FIELDS
+
+
+def _scale_features(raw):
+    """The serving posterior and the scaled N x 19 feature matrix for the raw one."""
+    refresh_posterior()
+    serving = _serving
+    with telemetry.span("model.scaler_transform"):
+        return serving, serving[0].transform(raw)
+
+
+def get_sample_bank():
+    """The scaler and posterior sample bank currently served (whatever the serving mode)."""
+    refresh_posterior()
+    scaler, _, sample_bank = _serving
+    return scaler, sample_bank
+
+
+def _predict_mean_pue(raw):
+    """Posterior-mean PUE for each row of the raw N x 19 feature matrix, in one pass."""
+    (_, predictive, sample_bank), X = _scale_features(raw)
+    if _serving_mode == "monte_carlo":
+        with telemetry.span("model.monte_carlo"):
+            return sample_bank.sample_mean(X).mean(0)
+    X_tensor = torch.tensor(X, dtype=torch.float32)
+    with telemetry.span("model.predictive"):
+        samples = predictive(X_tensor)     # samples["obs"]: (num_samples, N)
+        return samples["obs"].mean(0).detach().numpy()
+
+
+def _predict_pue_samples(raw):
+    """Posterior predictive PUE samples (with observation noise) for the raw N x 19 feature matrix: (S, N)."""
+    (_, predictive, sample_bank), X = _scale_features(raw)
+    if _serving_mode == "monte_carlo":
+        with telemetry.span("model.monte_carlo"):
+            return sample_bank.sample(X)
+    X_tensor = torch.tensor(X, dtype=torch.float32)
+    with telemetry.span("model.predictive"):
+        return predictive(X_tensor)["obs"].detach().numpy()
+
+
+def _build_features(scenarios):
+    """Environment data, energy data and raw feature rows for a list of scenarios (or a DataFrame)."""
+    with telemetry.span("model.build_features"):
+        # environment -> hardware -> energy -> features, each stage batched over all scenarios
+        output = pipeline.run(scenarios)
+        return output.environment_rows(), output.energy_rows(), output.features
+
+
+def get_PUE_prediction_batch(scenarios):
+    """
+    Predict PUE for many scenarios at once.
+
+    scenarios: list of dicts (or a DataFrame) with the keyword arguments of get_PUE_prediction,
+               see SCENARIO_FIELDS, or of pipeline.PUERequest.
+    Returns:
+      environment_data (list of dicts),
+      energy_data      (list of dicts),
+      pue_prediction   (np.ndarray of shape (N,))
+    """
+    environment_batch, energy_batch, raw = _build_features(scenarios)
+    if not len(raw):
+        return [], [], np.empty(0)
+
+    # 3) Scale the whole N x 19 matrix and run a single posterior predictive pass
+    pue_batch = _predict_mean_pue(raw)
+    return environment_batch, energy_batch, pue_batch
+
+
+def get_PUE_distribution_batch(scenarios, quantiles=DEFAULT_QUANTILES):
+    """
+    Like get_PUE_prediction_batch, but summarizes the posterior predictive samples instead of only
+    averaging them: the third value is {"mean", "std", "p5", "p50", "p95", ...} (one array of shape (N,)
+    per statistic, with a "p<q*100>" entry per quantile), reduced from the same single sampling pass.
+    """
+    environment_batch, energy_batch, raw = _build_features(scenarios)
+    if not len(raw):
+        return [], [], {}
+    return environment_batch, energy_batch, summarize_samples(_predict_pue_samples(raw), quantiles)
+
+
 def get_PUE_prediction(
     system_name: str,
     processor: str,
@@ -83,84 +460,44 @@ def get_PUE_prediction(
       energy_data      (dict),
       pue_prediction   (float)
     """
-    # 1) Fetch environment & energy data
-    environment_data = get_env_data(date_input=date, location=location)
-    energy_data = calculate_energy_values(
-        system_name,
-        processor,
-        accelerator,
-        num_nodes,
-        num_accelerator,
-        model_mlc,
-        cooling_efficiency,
-        environment_data["Environmental_Impact_Factor"],
-    )
+    environment_batch, energy_batch, pue_batch = get_PUE_prediction_batch([{
+        'system_name': system_name,
+        'processor': processor,
+        'accelerator': accelerator,
+        'num_nodes': num_nodes,
+        'num_accelerator': num_accelerator,
+        'model_mlc': model_mlc,
+        'cooling_efficiency': cooling_efficiency,
+        'date': date,
+        'location': location,
+    }])
+    mean_pue = float(pue_batch[0])
 
-    # 2) Build raw feature vector matching the 19 trained features
-    raw = np.array([
-        num_nodes,                                     # # of Nodes
-        num_accelerator,                               # # of Accelerators
-        energy_data["host_proc_core_count"],          # Host Processor Core Count
-        energy_data["average_result_at_system_name"], # Avg. Result at System Name
-        environment_data["Temperature_C"],            # Temperature_C
-        environment_data["Humidity_%"],               # Humidity_%
-        environment_data["Solar_Radiation_Wm2"],      # Solar_Radiation_Wm2
-        environment_data["Wind_Speed_mps"],           # Wind_Speed_mps
-        energy_data["tdp_acc"],                       # TDP_acc
-        energy_data["tdp_proc"],                      # TDP_proc
-        cooling_efficiency,                             # Cooling_Efficiency_Factor
-        energy_data["cores_per_processor"],           # Cores per Processor
-        energy_data["no_of_processors"],              # No_of_Processors
-        energy_data["runtime_hours"],                 # runtime_hours
-        energy_data["E_IT_Total_kWh"],                # E_IT_Total_kWh
-        energy_data["E_Cooling_total_kWh"],           # E_Cooling_total_kWh
-        energy_data["UPS_and_battery_inefficiency"],  # UPS_and_battery_inefficiency
-        energy_data["UPS_and_battery_inefficiency_kWh"], # UPS_and_battery_inefficiency_kWh
-        energy_data["E_Total_Facility_kWh"],          # E_Total_Facility_kWh
-    ]).reshape(1, -1)
-    # 3) Scale & convert to tensor
-    # X = _scaler.fit_transform(raw)
-    print('RAW SAMPLE: ',raw)
-    X = _scaler.transform(raw)
-    print('X: ', X)
-    X_tensor = torch.tensor(X, dtype=torch.float32)
-    print('x_tensor: ', X_tensor)
-
-    # 4) Forward pass through TorchScripted BNN
-    # with torch.no_grad():
-    #     mean_pue = _traced_bnn(X_tensor).item()
-        # mean_pue = _bnn(X_tensor).item()
-
-    samples = _predictive(X_tensor)
-    print(samples)
-    # y_samples = samples["obs"].detach().numpy()
-    mean_pue = samples["obs"].mean(0).item()
-    
-    
-    #####################################
-    # # 3) Monte Carlo over the posterior
-    # num_samples = 1
-    # #    draw num_samples independent weight/bias samples
-    # w1_samps = dist_w1.sample((num_samples,))  # (S,10,19)
-    # b1_samps = dist_b1.sample((num_samples,))  # (S,10)
-    # w2_samps = dist_w2.sample((num_samples,))  # (S,1,10)
-    # b2_samps = dist_b2.sample((num_samples,))  # (S,1)
-
-    # # 4) Forward pass for each sample
-    # #    hidden = ReLU(w1·x + b1)
-    # #    out    = (w2 · hidden) + b2
-    # hidden_pre = torch.einsum("sij,j->si", w1_samps, x) + b1_samps    # (S,10)
-    # hidden_act = torch.relu(hidden_pre)                              # (S,10)
-    # # flatten w2 to (S,10)
-    # w2_flat    = w2_samps.view(num_samples, 10)                      # (S,10)
-    # out_pre    = (w2_flat * hidden_act).sum(dim=1) + b2_samps.view(-1)  # (S,)
-
-    # # 5) Average the S forward‐passes → your posterior‐mean PUE
-    # mean_pue = float(out_pre.mean().item())
-    #####################################
-
-    print('mean PUE: ',mean_pue)
-    return environment_data, energy_data, mean_pue
+    logger.debug("mean PUE: %s", mean_pue)
+    return environment_batch[0], energy_batch[0], mean_pue
+
+
+def get_PUE_distribution(system_name: str, processor: str, accelerator: str, num_nodes: int, num_accelerator: int,
+                         model_mlc: str, cooling_efficiency: float, date: date, location: str,
+                         quantiles=DEFAULT_QUANTILES):
+    """
+    Returns:
+      environment_data (dict),
+      energy_data      (dict),
+      pue_summary      (dict: "mean", "std" and "p<q*100>" per quantile, as floats)
+    """
+    environment_batch, energy_batch, summary = get_PUE_distribution_batch([{
+        'system_name': system_name,
+        'processor': processor,
+        'accelerator': accelerator,
+        'num_nodes': num_nodes,
+        'num_accelerator': num_accelerator,
+        'model_mlc': model_mlc,
+        'cooling_efficiency': cooling_efficiency,
+        'date': date,
+        'location': location,
+    }], quantiles)
+    return environment_batch[0], energy_batch[0], {name: float(values[0]) for name, values in summary.items()}
 
 
 if __name__ == "__main__":
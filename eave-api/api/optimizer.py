@@ -0,0 +1,221 @@
+import functools
+from datetime import timedelta
+
+import numpy as np
+
+from .model import get_PUE_prediction_batch, get_PUE_distribution_batch, SCENARIO_FIELDS
+from .costs import calculate_cost, calculate_co2_equivalents
+from .mappings import selected_countries
+from .executor import inference_executor
+from . import telemetry, timeseries
+
+'''
+Scenario optimizer for /api/predict.
+
+Candidates are (date, location, configuration) combinations. They are evaluated through the PUE,
+cost and CO₂ pipeline in chunks, fanned out over the inference process pool (see executor.py),
+then ranked by an objective (cost, CO₂ or a weighted combination of both) and reduced to the
+top-k candidates and the cost/CO₂ Pareto front.
+
+Cost and CO₂ are priced at the candidate's date ("daily" pricing), or integrated over the run that
+starts at that date (see timeseries.py, "runtime" pricing).
+'''
+
+OBJECTIVES = ("cost", "co2", "weighted")
+PRICING = ("daily", "runtime")
+CHUNK_SIZE = 256
+# below this many candidates the pool's pickling overhead outweighs the parallelism
+MIN_PARALLEL_CANDIDATES = 2 * CHUNK_SIZE
+# bounds on one search: a daily search over two years of every selected country fits
+MAX_HORIZON_DAYS = 731
+MAX_CANDIDATES = 10_000
+
+
+def candidate_dates(start_date, horizon_days=360, step_days=90):
+    """Dates after `start_date`, every `step_days` days up to `horizon_days` days ahead.
+    The defaults give the four seasonal dates /api/predict has always tried."""
+    if step_days <= 0:
+        raise ValueError("step_days must be positive")
+    return [start_date + timedelta(days=offset) for offset in range(step_days, horizon_days + 1, step_days)]
+
+
+def build_candidates(configurations, dates, locations=None):
+    """Cross product of configurations (dicts with the hardware fields of a scenario), dates and locations."""
+    locations = list(selected_countries) if locations is None else locations
+    return [
+        {**configuration, "date": date, "location": location}
+        for configuration in configurations
+        for date in dates
+        for location in locations
+    ]
+
+
+def _propagate(summary, value, pue_mean):
+    # facility energy, and with it cost and CO₂, scales with PUE at a fixed IT load
+    return {name: value * statistic / pue_mean for name, statistic in summary.items()}
+
+
+def evaluate_candidates(candidates, quantiles=None, pricing="daily"):
+    """
+    Run PUE, energy, cost and CO₂ for a list of candidates (one batched PUE prediction).
+
+    With pricing="runtime", cost and CO₂ are integrated over the workload's runtime from the candidate's
+    date on, and co2_equivalents is the mean carbon intensity over that window.
+
+    With `quantiles`, each result also gets "uncertainty": summary statistics of the PUE posterior
+    predictive (mean, std and the quantiles) and the same statistics for energy, cost and CO₂, which
+    scale with PUE relative to its mean.
+    """
+    scenarios = [{field: candidate[field] for field in SCENARIO_FIELDS} for candidate in candidates]
+    if quantiles is None:
+        _, energy_batch, pue_batch = get_PUE_prediction_batch(scenarios)
+        summaries = None
+    else:
+        _, energy_batch, summary = get_PUE_distribution_batch(scenarios, quantiles)
+        pue_batch = summary.get("mean", [])
+        summaries = [dict(zip(summary, values)) for values in zip(*(array.tolist() for array in summary.values()))]
+
+    if pricing not in PRICING:
+        raise ValueError(f"Unknown pricing '{pricing}', expected one of {PRICING}")
+
+    results = []
+    # the location loop: prices and carbon intensity per (date, location)
+    with telemetry.span("optimizer.cost_co2"):
+        if pricing == "runtime":
+            priced = timeseries.price_windows(
+                [energy_data['E_Total_Facility_kWh'] for energy_data in energy_batch],
+                [candidate["date"] for candidate in candidates],
+                [energy_data['runtime_hours'] for energy_data in energy_batch],
+                [candidate["location"] for candidate in candidates],
+            )
+            windows = zip(priced["cost"].tolist(), priced["co2_equivalents"].tolist(), priced["co2"].tolist())
+        for candidate, energy_data, pue in zip(candidates, energy_batch, list(map(float, pue_batch))):
+            energy_consumption = energy_data['E_Total_Facility_kWh']
+            if pricing == "runtime":
+                cost, co2_equivalents, co2_consumption = next(windows)
+            else:
+                cost = calculate_cost(energy_consumption, candidate["date"], candidate["location"])
+                co2_equivalents, co2_consumption = calculate_co2_equivalents(energy_consumption, candidate["date"], candidate["location"])
+            results.append({
+                **candidate,
+                "pue": pue,
+                "energy": energy_consumption,
+                "runtime_hours": energy_data['runtime_hours'],
+                "throughput_confidence": energy_data['throughput_confidence'],
+                "cost": cost,
+                "co2_equivalents": co2_equivalents,
+                "co2": co2_consumption,
+            })
+        if summaries is not None:
+            for result, pue_summary in zip(results, summaries):
+                result["uncertainty"] = {
+                    "pue": pue_summary,
+                    "energy": _propagate(pue_summary, result["energy"], result["pue"]),
+                    "cost": _propagate(pue_summary, result["cost"], result["pue"]),
+                    "co2": _propagate(pue_summary, result["co2"], result["pue"]),
+                }
+    return results
+
+
+def _evaluate(candidates, parallel=None, quantiles=None, pricing="daily"):
+    evaluate = functools.partial(evaluate_candidates, quantiles=quantiles, pricing=pricing)
+    chunks = [candidates[i:i + CHUNK_SIZE] for i in range(0, len(candidates), CHUNK_SIZE)]
+    if parallel is None:
+        parallel = len(candidates) >= MIN_PARALLEL_CANDIDATES and inference_executor.max_workers > 1
+    if not parallel:
+        return [result for chunk in chunks for result in evaluate(chunk)]
+    return [result for chunk_results in inference_executor.map(evaluate, chunks) for result in chunk_results]
+
+
+def score(results, objective="cost", weights=None):
+    """Objective value per result (lower is better).
+    "weighted" min-max normalizes cost and CO₂ over the candidates and combines them with `weights`."""
+    cost = np.array([result["cost"] for result in results], dtype=float)
+    co2 = np.array([result["co2"] for result in results], dtype=float)
+    return score_values(cost, co2, objective, weights)
+
+
+def score_values(cost, co2, objective="cost", weights=None):
+    """score() for arrays of cost and CO₂."""
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+    if objective == "cost":
+        return cost
+    if objective == "co2":
+        return co2
+    weights = weights or {"cost": 0.5, "co2": 0.5}
+
+    def normalize(values):
+        spread = values.max() - values.min()
+        return (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
+
+    return weights.get("cost", 0.0) * normalize(cost) + weights.get("co2", 0.0) * normalize(co2)
+
+
+def pareto_front(results):
+    """Candidates not dominated in (cost, CO₂), ordered by cost."""
+    if not results:
+        return []
+    cost = np.array([result["cost"] for result in results], dtype=float)
+    co2 = np.array([result["co2"] for result in results], dtype=float)
+    order = np.lexsort((co2, cost))
+    # after sorting by cost, a candidate is on the front iff its CO₂ beats every cheaper candidate's
+    best_co2_before = np.minimum.accumulate(np.concatenate(([np.inf], co2[order][:-1])))
+    on_front = co2[order] < best_co2_before
+    return [results[i] for i in order[on_front]]
+
+
+def pareto_mask(objectives):
+    """
+    Which rows of an (N, M) array of objectives (all minimized) no other row dominates.
+
+    The lexicographically smallest remaining row is always on the front; it is kept and every row it
+    dominates is dropped, until no rows remain (one vectorized pass per front member).
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    mask = np.zeros(len(objectives), dtype=bool)
+    remaining = np.lexsort(objectives.T[::-1])
+    while len(remaining):
+        head, rest = remaining[0], remaining[1:]
+        mask[head] = True
+        better = objectives[head] <= objectives[rest]
+        dominated = better.all(axis=1) & (objectives[head] < objectives[rest]).any(axis=1)
+        remaining = rest[~dominated]
+    return mask
+
+
+def optimize(configurations, start_date, locations=None, horizon_days=360, step_days=90,
+             objective="cost", weights=None, top_k=1, parallel=None, quantiles=None,
+             pricing="daily"):
+    """
+    Evaluate every (configuration, date, location) candidate and rank them.
+
+    With `quantiles`, every result carries its PUE/energy/cost/CO₂ uncertainty, and `pricing` selects
+    how cost and CO₂ are priced (see evaluate_candidates).
+
+    Raises ValueError if there are more than MAX_CANDIDATES candidates.
+
+    Returns:
+      {"top_k": [result, ...] best first, "pareto": [result, ...], "evaluated": number of candidates}
+    """
+    dates = candidate_dates(start_date, horizon_days, step_days)
+    count = len(configurations) * len(dates) * len(selected_countries if locations is None else locations)
+    if count > MAX_CANDIDATES:
+        raise ValueError(f"{count} candidates; at most {MAX_CANDIDATES} can be evaluated in one search")
+    candidates = build_candidates(configurations, dates, locations)
+    with telemetry.span("optimizer.evaluate"):
+        results = _evaluate(candidates, parallel, quantiles, pricing)
+    if not results:
+        return {"top_k": [], "pareto": [], "evaluated": 0}
+
+    with telemetry.span("optimizer.rank"):
+        scores = score(results, objective, weights)
+        for result, value in zip(results, scores.tolist()):
+            result["score"] = value
+        # stable sort keeps the candidate order (date, then location) for ties, like the original loop
+        ranking = np.argsort(scores, kind="stable")[:max(top_k, 1)]
+        return {
+            "top_k": [results[i] for i in ranking],
+            "pareto": pareto_front(results),
+            "evaluated": len(results),
+        }
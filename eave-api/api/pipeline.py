@@ -0,0 +1,298 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from .energy import lookup_hardware, compute_energy, HARDWARE_FIELDS, ENERGY_FIELDS
+from .environment import get_env_data_batch, _location_key
+from .catalog import processors, accelerators, systems
+from . import datastore, telemetry
+
+'''
+Typed feature pipeline behind the PUE predictors (model.py):
+
+    PUERequest -> environment stage -> hardware stage -> energy stage -> feature stage -> model stage
+
+Every stage takes a batch and returns a dict of arrays, one entry per request:
+
+    environment  weather and environmental impact factor at (date, location)      ENVIRONMENT_FIELDS
+    hardware     TDPs, core counts and benchmark throughput (measured or estimated)  energy.HARDWARE_FIELDS
+    energy       runtime and IT/cooling/UPS/facility energy (energy.compute_energy) energy.ENERGY_FIELDS
+    features     the N x 19 raw feature matrix in the order the BNN was trained on
+
+The model stage (scaling and posterior sampling) is in model.py. The environment and hardware stages
+depend only on a key of the request ((timestamp, location) and the hardware fields), so their rows are
+kept in an LRU of EAVE_STAGE_CACHE_SIZE entries per stage, and a batch only computes its missing keys
+once each. The energy stage isn't cached: it draws the UPS inefficiency per request. Hardware rows served
+from the cache still count their catalog lookups, so the catalog report counts requests, not cache misses.
+'''
+
+STAGE_CACHE_SIZE = int(os.environ.get("EAVE_STAGE_CACHE_SIZE", 4096))
+
+ENVIRONMENT_FIELDS = ["Temperature_C", "Humidity_%", "Solar_Radiation_Wm2", "Wind_Speed_mps", "Temp_Impact",
+                      "Humidity_Impact", "Solar_Impact", "Wind_Impact", "Environmental_Impact_Factor"]
+
+# the BNN's input columns (model.features) as (stage, field)
+FEATURE_SOURCES = [
+    ("request", "num_nodes"),                           # # of Nodes
+    ("request", "num_accelerator"),                     # # of Accelerators
+    ("energy", "host_proc_core_count"),                 # Host Processor Core Count
+    ("energy", "average_result_at_system_name"),        # Avg. Result at System Name
+    ("environment", "Temperature_C"),                   # Temperature_C
+    ("environment", "Humidity_%"),                      # Humidity_%
+    ("environment", "Solar_Radiation_Wm2"),             # Solar_Radiation_Wm2
+    ("environment", "Wind_Speed_mps"),                  # Wind_Speed_mps
+    ("energy", "tdp_acc"),                              # TDP_acc
+    ("energy", "tdp_proc"),                             # TDP_proc
+    ("request", "cooling_efficiency"),                  # Cooling_Efficiency_Factor
+    ("energy", "cores_per_processor"),                  # Cores per Processor
+    ("energy", "no_of_processors"),                     # No_of_Processors
+    ("energy", "runtime_hours"),                        # runtime_hours
+    ("energy", "E_IT_Total_kWh"),                       # E_IT_Total_kWh
+    ("energy", "E_Cooling_total_kWh"),                  # E_Cooling_total_kWh
+    ("energy", "UPS_and_battery_inefficiency"),         # UPS_and_battery_inefficiency
+    ("energy", "UPS_and_battery_inefficiency_kWh"),     # UPS_and_battery_inefficiency_kWh
+    ("energy", "E_Total_Facility_kWh"),                 # E_Total_Facility_kWh
+]
+
+
+@dataclass
+class PUERequest:
+    """One scenario to predict PUE for (the keyword arguments of get_PUE_prediction)."""
+    __slots__ = ("system_name", "processor", "accelerator", "num_nodes", "num_accelerator",
+                 "model_mlc", "cooling_efficiency", "date", "location")
+    system_name: str
+    processor: str
+    accelerator: str
+    num_nodes: int
+    num_accelerator: int
+    model_mlc: str
+    cooling_efficiency: float
+    date: Union[date, str, pd.Timestamp]
+    location: str
+
+    @classmethod
+    def from_scenario(cls, scenario):
+        return cls(*(scenario[name] for name in FIELDS))
+
+    def timestamp(self):
+        """The time the environment is looked up at; dates without a time default to midday, like get_env_data."""
+        timestamp = pd.Timestamp(self.date)
+        if timestamp.hour == 0 and timestamp.minute == 0 and timestamp.second == 0:
+            timestamp = timestamp.replace(hour=12)
+        return timestamp
+
+    def environment_key(self):
+        # the raw date rather than timestamp(): equal dates given as different types only cost a duplicate entry
+        return self.date, _location_key(self.location)
+
+    def hardware_key(self):
+        return (self.system_name, self.processor, self.accelerator, self.num_nodes, self.num_accelerator,
+                self.model_mlc)
+
+
+FIELDS = [field.name for field in fields(PUERequest)]
+
+
+def as_requests(scenarios):
+    """PUERequests from a list of PUERequests or scenario dicts, or a DataFrame of scenarios."""
+    if isinstance(scenarios, pd.DataFrame):
+        scenarios = scenarios.to_dict('records')
+    return [scenario if isinstance(scenario, PUERequest) else PUERequest.from_scenario(scenario)
+            for scenario in scenarios]
+
+
+##################################################################
+# Stage caches
+##################################################################
+
+class StageCache:
+    """LRU of a stage's output rows (tuples in the order of `fields`) by request key."""
+
+    def __init__(self, name, fields, maxsize=STAGE_CACHE_SIZE):
+        self.name = name
+        self.fields = fields
+        self.maxsize = maxsize
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, stage, requests, keys, on_hit=None):
+        """The output of `stage` for `requests`, computing only the keys that aren't cached (once each).
+        `on_hit` is called with the requests served from the cache."""
+        rows = [None] * len(requests)
+        missing = {}    # key -> positions of the requests with that key
+        hits = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._rows.move_to_end(key)
+                    rows[i] = row
+                    hits.append(i)
+        telemetry.count(f"stage.{self.name}.hit", len(hits))
+        telemetry.count(f"stage.{self.name}.miss", len(missing))
+        if hits and on_hit is not None:
+            on_hit([requests[i] for i in hits])
+
+        if missing:
+            computed = stage([requests[positions[0]] for positions in missing.values()])
+            computed_rows = list(zip(*(computed[field].tolist() for field in self.fields)))
+            with self._lock:
+                for (key, positions), row in zip(missing.items(), computed_rows):
+                    for i in positions:
+                        rows[i] = row
+                    if self.maxsize > 0:
+                        self._rows[key] = row
+                while len(self._rows) > self.maxsize:
+                    self._rows.popitem(last=False)
+
+        columns = np.array(rows, dtype=float).reshape(len(rows), len(self.fields))
+        return {field: columns[:, j] for j, field in enumerate(self.fields)}
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+##################################################################
+# Stages
+##################################################################
+
+def _environment(requests):
+    """Environment rows, one get_env_data_batch pass per location."""
+    timestamps = pd.DatetimeIndex([request.timestamp() for request in requests])
+    locations = np.array([_location_key(request.location) for request in requests], dtype=object)
+    environment = {field: np.empty(len(requests)) for field in ENVIRONMENT_FIELDS}
+    for location in pd.unique(locations):
+        rows = np.flatnonzero(locations == location)
+        batch = get_env_data_batch(timestamps[rows], location)
+        for field in ENVIRONMENT_FIELDS:
+            environment[field][rows] = batch[field]
+    return environment
+
+
+def _hardware(requests):
+    return lookup_hardware(
+        [request.system_name for request in requests],
+        [request.processor for request in requests],
+        [request.accelerator for request in requests],
+        [request.num_nodes for request in requests],
+        [request.num_accelerator for request in requests],
+        [request.model_mlc for request in requests],
+    )
+
+
+def _count_catalog_lookups(requests):
+    # the catalog lookups lookup_hardware would have made, so fallbacks are counted per request
+    processors.encode([request.processor for request in requests])
+    accelerators.encode([request.accelerator for request in requests])
+    systems.encode([request.system_name for request in requests])
+
+
+environment_cache = StageCache("environment", ENVIRONMENT_FIELDS)
+hardware_cache = StageCache("hardware", HARDWARE_FIELDS)
+
+
+def environment_stage(requests):
+    with telemetry.span("pipeline.environment"):
+        return environment_cache.run(_environment, requests, [request.environment_key() for request in requests])
+
+
+_hardware_source = None
+
+
+def hardware_stage(requests):
+    global _hardware_source
+    # the benchmark throughputs come from PUE_data.csv; drop cached rows when it was reloaded
+    source = datastore.get_avg_result_arrays()
+    if source is not _hardware_source:
+        hardware_cache.clear()
+        _hardware_source = source
+    with telemetry.span("pipeline.hardware"):
+        return hardware_cache.run(_hardware, requests, [request.hardware_key() for request in requests],
+                                  on_hit=_count_catalog_lookups)
+
+
+def energy_stage(requests, environment, hardware, rng=None):
+    """Energy per request (energy.ENERGY_FIELDS), with a fresh UPS inefficiency draw per request."""
+    with telemetry.span("pipeline.energy"):
+        n = len(requests)
+        if rng is None:
+            UPS_and_battery_inefficiency = np.random.uniform(0.85, 0.90, n)
+        else:
+            UPS_and_battery_inefficiency = rng.uniform(0.85, 0.90, n)
+        energy = compute_energy(
+            hardware["tdp_proc"],
+            hardware["no_of_processors"],
+            hardware["tdp_acc"],
+            np.array([request.num_accelerator for request in requests], dtype=float),
+            np.array([request.num_nodes for request in requests], dtype=float),
+            hardware["average_result_at_system_name"],
+            np.array([request.cooling_efficiency for request in requests], dtype=float),
+            environment["Environmental_Impact_Factor"],
+            UPS_and_battery_inefficiency,
+        )
+        energy = {**hardware, **energy}
+        return {field: energy[field] for field in ENERGY_FIELDS}
+
+
+def feature_stage(requests, environment, energy):
+    """The raw (unscaled) N x 19 feature matrix."""
+    with telemetry.span("pipeline.features"):
+        sources = {
+            "request": {
+                "num_nodes": np.array([request.num_nodes for request in requests], dtype=float),
+                "num_accelerator": np.array([request.num_accelerator for request in requests], dtype=float),
+                "cooling_efficiency": np.array([request.cooling_efficiency for request in requests], dtype=float),
+            },
+            "environment": environment,
+            "energy": energy,
+        }
+        if not requests:
+            return np.empty((0, len(FEATURE_SOURCES)))
+        return np.column_stack([sources[stage][field] for stage, field in FEATURE_SOURCES])
+
+
+@dataclass
+class PipelineOutput:
+    __slots__ = ("requests", "environment", "energy", "features")
+    requests: list
+    environment: dict     # ENVIRONMENT_FIELDS -> (N,)
+    energy: dict          # ENERGY_FIELDS -> (N,)
+    features: np.ndarray  # (N, 19)
+
+    def environment_rows(self):
+        """The environment as one dict per request, like get_env_data."""
+        columns = [self.environment[field].tolist() for field in ENVIRONMENT_FIELDS]
+        timestamps = {}
+        for request in self.requests:
+            if request.date not in timestamps:
+                timestamps[request.date] = request.timestamp()
+        return [{"Timestamp": timestamps[request.date], **dict(zip(ENVIRONMENT_FIELDS, row))}
+                for request, row in zip(self.requests, zip(*columns))]
+
+    def energy_rows(self):
+        """The energy as one dict per request, like calculate_energy_values."""
+        columns = [self.energy[field].tolist() for field in ENERGY_FIELDS]
+        return [dict(zip(ENERGY_FIELDS, row)) for row in zip(*columns)]
+
+
+def run(scenarios, rng=None) -> PipelineOutput:
+    """Run the stages up to the feature matrix for a batch of scenarios (see as_requests)."""
+    requests = as_requests(scenarios)
+    environment = environment_stage(requests)
+    hardware = hardware_stage(requests)
+    energy = energy_stage(requests, environment, hardware, rng)
+    return PipelineOutput(requests, environment, energy, feature_stage(requests, environment, energy))
+
+
+def clear():
+    environment_cache.clear()
+    hardware_cache.clear()
@@ -0,0 +1,106 @@
+import os
+import pickle
+import threading
+import warnings
+
+import joblib
+
+from . import telemetry
+
+'''
+Registry of the pickled forecast models used by costs.py.
+
+Each model is deserialized once and shared by all callers. On every lookup the registry
+compares the file's modification time and size against the loaded copy, so dropping a new
+pickle in place is picked up by the running worker without a restart. If the new file cannot
+be loaded, the previously loaded model keeps being served.
+
+The models are read from this directory, or from $EAVE_FORECAST_MODEL_DIR.
+'''
+file_dir = os.path.dirname(__file__)
+FORECAST_MODEL_DIR = os.environ.get("EAVE_FORECAST_MODEL_DIR", file_dir)
+
+
+def _load_joblib(filepath):
+    return joblib.load(filepath)
+
+
+def _load_pickle(filepath):
+    with open(filepath, "rb") as f:
+        return pickle.load(f)
+
+
+def _file_version(filepath):
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._sources = {}    # name -> (filepath, loader)
+        self._loaded = {}     # name -> (file version, model)
+        self._lock = threading.Lock()
+
+    def register(self, name, filepath, loader):
+        self._sources[name] = (filepath, loader)
+
+    def names(self):
+        return list(self._sources)
+
+    def get(self, name):
+        """Return the model registered as `name`, (re)loading it if the file changed on disk."""
+        filepath, _ = self._sources[name]
+        loaded = self._loaded.get(name)
+        try:
+            version = _file_version(filepath)
+        except OSError:
+            if loaded is not None:
+                return loaded[1]
+            raise
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        return self.reload(name)
+
+    def reload(self, name):
+        """Load `name` from disk now and swap it in."""
+        filepath, loader = self._sources[name]
+        with self._lock:
+            version = _file_version(filepath)
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]    # another thread already reloaded it
+            try:
+                with telemetry.span(f"registry.load.{name}"):
+                    model = loader(filepath)
+            except Exception as e:
+                if loaded is None:
+                    raise
+                warnings.warn(f"Could not reload forecast model '{name}' from {filepath}, keeping the loaded one: {e}")
+                # remember the bad version so it is not re-read on every lookup
+                self._loaded[name] = (version, loaded[1])
+                return loaded[1]
+            self._loaded[name] = (version, model)
+            return model
+
+    def warm_up(self):
+        """Load every registered model. Failures are reported, not raised, so the API can still start."""
+        for name in self._sources:
+            try:
+                self.get(name)
+            except Exception as e:
+                warnings.warn(f"Could not load forecast model '{name}': {e}")
+
+    def status(self):
+        return {
+            name: {"filepath": filepath, "loaded": name in self._loaded}
+            for name, (filepath, _) in self._sources.items()
+        }
+
+
+forecast_models = ModelRegistry()
+# US monthly price model (joblib)
+forecast_models.register("us_energy_price", os.path.join(FORECAST_MODEL_DIR, "us_energy_price_model.pkl"), _load_joblib)
+# daily price model for european markets: (model, country label encoder)
+forecast_models.register("daily_energy_price", os.path.join(FORECAST_MODEL_DIR, "daily_energy_price_model.pkl"), _load_pickle)
+# carbon intensity random forest: (model, country one-hot encoder)
+forecast_models.register("carbon_intensity", os.path.join(FORECAST_MODEL_DIR, "carbon_intensity_rf.pkl"), _load_pickle)
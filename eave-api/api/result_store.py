@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+'''
+Store for /api/measure results, keyed by the measurement ID returned to the client.
+
+/api/predict looks the baseline measurement up by that ID instead of reading it from
+app.state, so concurrent requests don't overwrite each other and any worker can serve it.
+Values are JSON-serializable dicts.
+
+Backends (EAVE_RESULT_STORE):
+    memory - in-process LRU with TTL (default; per worker)
+    file   - one JSON file per result in EAVE_RESULT_STORE_DIR; a local stand-in for a shared
+             cache that every worker on the host can read
+'''
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def new_measurement_id():
+    return uuid.uuid4().hex
+
+
+class ResultStore(ABC):
+    @abstractmethod
+    def get(self, key):
+        """Stored value, or None if it is missing or expired."""
+
+    @abstractmethod
+    def put(self, key, value):
+        """Store `value` under `key`, replacing any value stored before."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove `key`; missing keys are ignored."""
+
+
+class InMemoryResultStore(ResultStore):
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileResultStore(ResultStore):
+    def __init__(self, directory, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # keys are generated hex IDs; refuse anything that could escape the directory
+        if not key or not key.isalnum():
+            raise KeyError(key)
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            path = self._path(key)
+            if os.path.getmtime(path) + self.ttl_seconds < time.time():
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        # write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except (KeyError, OSError):
+            pass
+
+
+def create_result_store():
+    backend = os.environ.get("EAVE_RESULT_STORE", "memory")
+    ttl_seconds = int(os.environ.get("EAVE_RESULT_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    if backend == "memory":
+        max_entries = int(os.environ.get("EAVE_RESULT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        return InMemoryResultStore(ttl_seconds, max_entries)
+    if backend == "file":
+        directory = os.environ.get("EAVE_RESULT_STORE_DIR", os.path.join(tempfile.gettempdir(), "eave-results"))
+        return FileResultStore(directory, ttl_seconds)
+    raise ValueError(f"Unknown result store backend '{backend}', expected 'memory' or 'file'")
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from . import telemetry, timeseries
+from .energy import calculate_energy_values
+from .environment import get_env_table
+from .mappings import selected_countries
+from .optimizer import score_values
+
+'''
+Carbon- and price-aware scheduling: the start times and locations at which a workload that has to
+finish by a deadline is cheapest, lowest in CO₂ or best in a weighted combination.
+
+For each location the horizon [earliest start, deadline) is laid out hour by hour once:
+
+    facility power (kW)  = IT power * (1 + cooling efficiency * environmental impact factor(h)) + UPS losses
+    cost per hour (€)    = facility power * energy price(h) / 1000
+    CO₂ per hour (g)     = facility power * carbon intensity(h)
+
+with the environmental impact factor from the hourly tables behind get_env_data and the daily price
+and intensity series from timeseries.py (forecast where the data has gaps or ends). The totals of every
+start time are then sliding-window sums over the cumulative sums of these arrays, so all start times at
+all locations are scored without calling a model per candidate.
+'''
+
+HOUR = pd.Timedelta(hours=1)
+
+# longest schedulable horizon; the hourly arrays of every location are built for it
+MAX_HORIZON_DAYS = 731
+
+
+def _window_sums(values, starts, length):
+    """Sums of the hourly step function `values` over [start, start + length) (hours, may be fractional)."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+
+    def antiderivative(positions):
+        index = np.clip(np.floor(positions).astype(np.int64), 0, len(values) - 1)
+        return cumulative[index] + values[index] * (positions - index)
+
+    return antiderivative(starts + length) - antiderivative(starts)
+
+
+def _environmental_impact(hours, location):
+    """Hourly environmental impact factor, from the same tables as get_env_data."""
+    factors = np.empty(len(hours))
+    years = hours.year.to_numpy()
+    hour_of_year = (hours.dayofyear.to_numpy() - 1) * 24 + hours.hour.to_numpy()
+    for year in np.unique(years):
+        table = get_env_table(int(year), location)["Environmental_Impact_Factor"].to_numpy()
+        rows = years == year
+        factors[rows] = table[hour_of_year[rows]]
+    return factors
+
+
+def _daily_to_hourly(name, location, hours):
+    series = timeseries.get_series(name, location, hours[0].floor("D"), hours[-1].floor("D") + timeseries.DAY)
+    return series.point(series.positions(hours))
+
+
+def hourly_profile(energy_data, cooling_efficiency, location, hours):
+    """Facility power (kW), cost (€) and CO₂ (g) per hour of `hours` for one location."""
+    runtime_hours = energy_data["runtime_hours"]
+    it_power = energy_data["E_IT_Total_kWh"] / runtime_hours
+    ups_power = energy_data["UPS_and_battery_inefficiency_kWh"] / runtime_hours
+    power = it_power * (1 + cooling_efficiency * _environmental_impact(hours, location)) + ups_power
+    return {
+        "power": power,
+        "cost": power * _daily_to_hourly("energy_price", location, hours) / 1000,
+        "co2": power * _daily_to_hourly("carbon_intensity", location, hours),
+    }
+
+
+def _select(order, locations, starts, top_k, separation_hours):
+    """The first `top_k` windows of `order` whose start is at least `separation_hours` away from every
+    window already picked at the same location (otherwise the best windows are all one-hour shifts)."""
+    picked = []
+    for i in order:
+        if all(locations[j] != locations[i] or abs(starts[j] - starts[i]) >= separation_hours for j in picked):
+            picked.append(i)
+            if len(picked) == top_k:
+                break
+    return picked
+
+
+def schedule(configuration, earliest_start, deadline, locations=None, objective="cost", weights=None,
+             step_hours=1, top_k=5, separation_hours=24):
+    """
+    Rank the start windows of `configuration` (the hardware fields of a scenario and cooling_efficiency)
+    between `earliest_start` and `deadline`, which the run has to finish by.
+
+    Start times are every `step_hours` hours from `earliest_start` (rounded up to the hour) at every location.
+
+    Returns:
+      {"runtime_hours", "evaluated": number of windows scored,
+       "windows": [{"location", "start", "end", "energy", "cost", "co2", "energy_price", "co2_equivalents",
+                    "score"}, ...] best first}
+    """
+    if step_hours <= 0:
+        raise ValueError("step_hours must be positive")
+    locations = list(selected_countries) if locations is None else list(locations)
+    if not locations:
+        raise ValueError("locations must not be empty")
+    unknown = [location for location in locations if location.lower() not in selected_countries]
+    if unknown:
+        raise ValueError(f"Unknown locations {unknown}, expected some of {list(selected_countries)}")
+    first_hour = pd.Timestamp(earliest_start).ceil("h")
+    deadline = pd.Timestamp(deadline)
+    if deadline - first_hour > pd.Timedelta(days=MAX_HORIZON_DAYS):
+        raise ValueError(f"the deadline can be at most {MAX_HORIZON_DAYS} days after the earliest start")
+
+    energy_data = calculate_energy_values(
+        configuration["system_name"],
+        configuration["processor"],
+        configuration["accelerator"],
+        configuration["num_nodes"],
+        configuration["num_accelerator"],
+        configuration["model_mlc"],
+        configuration["cooling_efficiency"],
+        1.0,
+    )
+    runtime_hours = float(energy_data["runtime_hours"])
+    horizon_hours = (deadline - first_hour) / HOUR
+    if not runtime_hours <= horizon_hours:
+        raise ValueError(f"the workload runs {runtime_hours:.1f} hours, which doesn't fit between "
+                         f"{first_hour.isoformat()} and {deadline.isoformat()}")
+
+    hours = pd.date_range(first_hour, periods=int(np.ceil(horizon_hours)), freq="h")
+    starts = np.arange(0, horizon_hours - runtime_hours + 1e-9, step_hours, dtype=float)
+
+    energy, cost, co2, window_locations = [], [], [], []
+    with telemetry.span("scheduler.windows"):
+        for location in locations:
+            profile = hourly_profile(energy_data, configuration["cooling_efficiency"], location, hours)
+            energy.append(_window_sums(profile["power"], starts, runtime_hours))
+            cost.append(_window_sums(profile["cost"], starts, runtime_hours))
+            co2.append(_window_sums(profile["co2"], starts, runtime_hours))
+            window_locations.extend([location] * len(starts))
+    energy, cost, co2 = np.concatenate(energy), np.concatenate(cost), np.concatenate(co2)
+    window_starts = np.tile(starts, len(locations))
+
+    with telemetry.span("scheduler.rank"):
+        scores = score_values(cost, co2, objective, weights)
+        order = np.argsort(scores, kind="stable")
+        picked = _select(order, window_locations, window_starts, max(top_k, 1), separation_hours)
+
+    windows = []
+    for i in picked:
+        start = first_hour + window_starts[i] * HOUR
+        windows.append({
+            "location": window_locations[i],
+            "start": start.isoformat(),
+            "end": (start + runtime_hours * HOUR).round("s").isoformat(),
+            "energy": float(energy[i]),
+            "cost": float(cost[i]),
+            "co2": float(co2[i]),
+            # energy-weighted means over the window
+            "energy_price": float(cost[i] * 1000 / energy[i]) if energy[i] else None,
+            "co2_equivalents": float(co2[i] / energy[i]) if energy[i] else None,
+            "score": float(scores[i]),
+        })
+    return {"runtime_hours": runtime_hours, "evaluated": len(scores), "windows": windows}
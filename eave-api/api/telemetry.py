@@ -0,0 +1,214 @@
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+'''
+In-process telemetry: timing spans, histograms and counters, rendered in the Prometheus text format.
+
+    with telemetry.span("model.predictive"):
+        ...
+
+records the duration into the `eave_span_seconds{span="model.predictive"}` histogram and, while
+a request is being traced (see trace_request), into that request's timing breakdown.
+
+Inference runs in worker processes with their own registry. Work submitted through the process
+pool is wrapped by executor.py, which ships the worker's observations back with each result and
+merges them here, so /metrics reports spans from all processes.
+'''
+
+# upper bounds in seconds, from lookups (µs) to model training (minutes)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    def __init__(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}     # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            if position < len(self.buckets):
+                series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def merge(self, snapshot):
+        """Add the series of another process' snapshot() (same buckets)."""
+        with self._lock:
+            for label_value, other in snapshot.items():
+                series = self._series.setdefault(label_value, [0] * (len(self.buckets) + 2))
+                for i, value in enumerate(other):
+                    series[i] += value
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            snapshot = {label_value: list(series) for label_value, series in self._series.items()}
+            if reset:
+                self._series.clear()
+        return snapshot
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self.snapshot().items()):
+            labels = _format_labels(self.label, label_value)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]!r}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}     # label value -> count
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def merge(self, snapshot):
+        with self._lock:
+            for label_value, amount in snapshot.items():
+                self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            snapshot = dict(self._values)
+            if reset:
+                self._values.clear()
+        return snapshot
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{{{_format_labels(self.label, label_value)}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label, label_value):
+    """`label` and `label_value` are a name and a value, or tuples of names and values."""
+    if isinstance(label, tuple):
+        return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(label, label_value))
+    return f'{label}="{_escape(label_value)}"'
+
+
+##################################################################
+# Registry
+##################################################################
+
+span_seconds = Histogram("eave_span_seconds", "Duration of instrumented sections of the pipeline.", "span")
+http_request_seconds = Histogram("eave_http_request_duration_seconds", "Duration of HTTP requests by route.",
+                                 ("method", "route", "status"))
+events = Counter("eave_events_total", "Pipeline events such as dataset lookup hits and forecast fallbacks.", "event")
+
+# metrics that worker processes ship back to the parent
+_SHIPPED = {"span_seconds": span_seconds, "events": events}
+
+
+def drain():
+    """Snapshot of this process' span and event metrics, resetting them (used in worker processes)."""
+    return {key: metric.snapshot(reset=True) for key, metric in _SHIPPED.items()}
+
+
+def merge(drained):
+    """Add metrics drained in another process, and their spans to the current request's breakdown."""
+    for key, snapshot in drained.items():
+        _SHIPPED[key].merge(snapshot)
+    timings = _request_timings.get()
+    if timings is not None:
+        for span_name, series in drained.get("span_seconds", {}).items():
+            timings[span_name] = timings.get(span_name, 0.0) + series[-2]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = span_seconds.render() + http_request_seconds.render() + events.render()
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for metric in (span_seconds, http_request_seconds, events):
+        metric.snapshot(reset=True)
+
+
+##################################################################
+# Spans
+##################################################################
+
+# span name -> accumulated seconds for the request being traced, or None
+_request_timings = contextvars.ContextVar("eave_request_timings", default=None)
+
+
+class span:
+    """Time a block (`with span(name):`) or a function (`@span(name)`)."""
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+        span_seconds.observe(self.name, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def count(event, amount=1):
+    events.inc(event, amount)
+
+
+@contextmanager
+def trace_request():
+    """Collect the spans of the current request; yields {span name: seconds}."""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings, total=None):
+    """A Server-Timing header value for the collected spans (durations in ms)."""
+    entries = [f"{name};dur={seconds * 1e3:.3f}" for name, seconds in sorted(timings.items(), key=lambda item: -item[1])]
+    if total is not None:
+        entries.insert(0, f"total;dur={total * 1e3:.3f}")
+    return ", ".join(entries)
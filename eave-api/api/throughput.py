@@ -0,0 +1,181 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from . import datastore, telemetry
+from .catalog import processors, accelerators
+
+'''
+Benchmark throughput ("Avg. Result at System Name") of configurations, including ones PUE_data.csv
+doesn't have.
+
+A configuration that is in PUE_data.csv (all 7 columns of datastore.SYSTEM_KEY_COLUMNS equal) gets its
+measured throughput from the hash index. Any other configuration is estimated from the rows of the same
+Model MLC (throughputs of different models are in different units), which are indexed in one KD-tree
+per model over
+
+    log2 # of nodes, log2 # of accelerators, log2 accelerator TDP, log2 processor TDP,
+    log2 host processor core count
+
+(TDPs from the hardware catalog), scaled to unit variance and weighted by FEATURE_WEIGHTS. The estimate
+is the inverse-distance weighted mean of the K_NEIGHBOURS nearest rows' throughput per accelerator (per
+node for CPU-only systems), taken in log space and scaled to the configuration's accelerators and nodes.
+
+Each estimate has a confidence in [0, 1]: 1 for measured values, exp(-mean distance) / (1 + spread of
+the neighbours' log throughput) for estimates, and 0 for models without any rows, which keep the old
+dataset average DEFAULT_AVG_RESULT.
+'''
+
+DEFAULT_AVG_RESULT = 66869.50
+
+K_NEIGHBOURS = 5
+
+# relative importance of the features in the distance; the accelerator decides most of the throughput
+FEATURE_WEIGHTS = np.array([1.0, 1.0, 2.0, 0.5, 0.5])
+
+# keeps the weight of a neighbour at distance 0 finite
+DISTANCE_EPSILON = 1e-3
+
+# configurations kept in the LRU of scalar estimates
+ESTIMATE_CACHE_SIZE = 4096
+
+
+def _units(num_nodes, num_accelerator):
+    """What throughput scales with: accelerators per node times nodes (nodes for CPU-only systems)."""
+    return np.maximum(np.asarray(num_nodes, dtype=float), 1) * np.maximum(np.asarray(num_accelerator, dtype=float), 1)
+
+
+def _raw_features(num_nodes, processor, accelerator, num_accelerator, host_proc_core_count):
+    return np.column_stack([
+        np.log2(np.maximum(np.asarray(num_nodes, dtype=float), 1)),
+        np.log2(np.maximum(np.asarray(num_accelerator, dtype=float), 1)),
+        # the callers' names were already counted by lookup_hardware (or are the dataset's own)
+        np.log2(np.maximum(accelerators.lookup(accelerator, "tdp", record=False), 1)),
+        np.log2(np.maximum(processors.lookup(processor, "tdp", record=False), 1)),
+        np.log2(np.maximum(np.asarray(host_proc_core_count, dtype=float), 1)),
+    ])
+
+
+class ThroughputEstimator:
+    """Exact hash index plus per-model KD-trees over the rows of the avg. result index."""
+
+    def __init__(self, keys: pd.MultiIndex, values: np.ndarray):
+        self.keys = keys
+        self.values = values
+        system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc = (
+            keys.get_level_values(level).to_numpy() for level in range(keys.nlevels))
+        raw = _raw_features(num_nodes, processor, accelerator, num_accelerator, host_proc_core_count)
+        std = raw.std(axis=0)
+        self.scale = FEATURE_WEIGHTS / np.where(std > 0, std, 1)
+        log_per_unit = np.log(values) - np.log(_units(num_nodes, num_accelerator))
+
+        self.models = {}    # model MLC -> (KDTree, log throughput per unit of its rows)
+        model_mlc = model_mlc.astype(object)
+        for model in pd.unique(model_mlc):
+            rows = np.flatnonzero(model_mlc == model)
+            self.models[model] = (KDTree(raw[rows] * self.scale), log_per_unit[rows])
+
+    def estimate(self, system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count,
+                 model_mlc, count=True):
+        """(throughput, confidence) arrays for arrays of configurations. `count`: record avg_result.* events."""
+        queries = pd.MultiIndex.from_arrays([system_name, num_nodes, processor, accelerator,
+                                             num_accelerator, host_proc_core_count, model_mlc])
+        positions = self.keys.get_indexer(queries)
+        exact = positions >= 0
+        throughput = np.where(exact, self.values[positions], DEFAULT_AVG_RESULT)
+        confidence = exact.astype(float)
+        if count:
+            telemetry.count("avg_result.hit", int(exact.sum()))
+        if exact.all():
+            return throughput, confidence
+
+        missing = np.flatnonzero(~exact)
+        throughput[missing], confidence[missing] = self.neighbours(
+            *(np.asarray(values)[missing] for values in
+              (num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)))
+        if count:
+            estimated = int((confidence[missing] > 0).sum())
+            _count_misses(estimated, len(missing) - estimated)
+        return throughput, confidence
+
+    def neighbours(self, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc):
+        """(throughput, confidence) arrays estimated from the nearest rows of the same model, without
+        looking for exact matches; (DEFAULT_AVG_RESULT, 0) for unknown models."""
+        model_mlc = np.asarray(model_mlc, dtype=object)
+        throughput = np.full(len(model_mlc), DEFAULT_AVG_RESULT)
+        confidence = np.zeros(len(model_mlc))
+        features = _raw_features(num_nodes, np.asarray(processor, dtype=object), np.asarray(accelerator, dtype=object),
+                                 num_accelerator, host_proc_core_count) * self.scale
+        units = _units(num_nodes, num_accelerator)
+        with telemetry.span("throughput.neighbours"):
+            for model in pd.unique(model_mlc):
+                if model not in self.models:
+                    continue
+                tree, log_per_unit = self.models[model]
+                rows = np.flatnonzero(model_mlc == model)
+                distances, neighbours = tree.query(features[rows], k=min(K_NEIGHBOURS, len(log_per_unit)))
+                weights = 1 / (distances + DISTANCE_EPSILON)
+                weights /= weights.sum(axis=1, keepdims=True)
+                targets = log_per_unit[neighbours]
+                mean = (weights * targets).sum(axis=1)
+                spread = np.sqrt((weights * (targets - mean[:, None]) ** 2).sum(axis=1))
+                throughput[rows] = np.exp(mean) * units[rows]
+                confidence[rows] = np.exp(-(weights * distances).sum(axis=1)) / (1 + spread)
+        return throughput, confidence
+
+
+def _count_misses(estimated, fallbacks):
+    telemetry.count("avg_result.miss", estimated + fallbacks)
+    telemetry.count("avg_result.estimated", estimated)
+    telemetry.count("avg_result.fallback", fallbacks)
+
+
+_estimator = None
+_estimator_source = None
+_lock = threading.Lock()
+
+
+def get_estimator() -> ThroughputEstimator:
+    """The estimator over the current avg. result index, rebuilt when PUE_data.csv was reloaded."""
+    global _estimator, _estimator_source
+    source = datastore.get_avg_result_arrays()
+    if source is not _estimator_source:
+        with _lock:
+            if source is not _estimator_source:
+                with telemetry.span("throughput.build"):
+                    _estimator = ThroughputEstimator(*source)
+                _estimate_one.cache_clear()
+                _estimator_source = source
+    return _estimator
+
+
+def estimate_throughput(system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count,
+                        model_mlc):
+    """(throughput, confidence) arrays for arrays of configurations."""
+    return get_estimator().estimate(
+        np.asarray(system_name, dtype=object), np.asarray(num_nodes), np.asarray(processor, dtype=object),
+        np.asarray(accelerator, dtype=object), np.asarray(num_accelerator), np.asarray(host_proc_core_count),
+        np.asarray(model_mlc, dtype=object))
+
+
+@lru_cache(maxsize=ESTIMATE_CACHE_SIZE)
+def _estimate_one(key):
+    # keyed without the system name: it only matters for exact matches, which estimate_one has ruled out
+    throughput, confidence = get_estimator().neighbours(*([value] for value in key))
+    return float(throughput[0]), float(confidence[0])
+
+
+def estimate_one(system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc):
+    """(throughput, confidence) of one configuration; measured values are dict lookups, estimates are cached."""
+    get_estimator()     # rebuilds (and clears the cached estimates) if PUE_data.csv was reloaded
+    key = (system_name, num_nodes, processor, accelerator, num_accelerator, host_proc_core_count, model_mlc)
+    throughput = datastore.lookup_avg_result(*key)
+    if throughput is not None:
+        telemetry.count("avg_result.hit")
+        return throughput, 1.0
+    throughput, confidence = _estimate_one(key[1:])
+    _count_misses(int(confidence > 0), int(confidence == 0))
+    return throughput, confidence
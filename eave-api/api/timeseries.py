@@ -0,0 +1,219 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import datastore, telemetry
+from .costs import predict_energy_prices, predict_carbon_intensities
+from .mappings import selected_countries
+
+'''
+Cost and CO₂ of a workload spread over its runtime, instead of priced at its start date.
+
+calculate_cost and calculate_co2_equivalents price the whole workload at one day's energy price
+and carbon intensity. Here the energy is consumed evenly over [start, start + runtime_hours) and
+integrated against the daily series of energy_price_daily.csv and merged_carbon_intensity.csv.
+Days missing from the CSVs (gaps, dates after the data ends, all prices for the USA) are filled
+with the forecast models, in one model call per series.
+
+Each (series, location) is kept as a dense daily array with its cumulative sum, so the integral of
+the step function over any window is two lookups into the cumulative sum:
+
+    F(x) = cumulative[floor(x)] + values[floor(x)] * (x - floor(x))      (x in days since the origin)
+    mean over [a, b) = (F(b) - F(a)) / (b - a)
+
+which makes pricing a batch of candidates a handful of vectorized operations per location.
+'''
+
+# runs longer than this are spread over their first MAX_WINDOW_DAYS, which keeps the forecast horizon bounded
+MAX_WINDOW_DAYS = 3653
+
+# pandas frequency of the period starts in a breakdown
+PERIODS = {"day": "D", "week": "W-MON", "month": "MS"}
+
+DAY = pd.Timedelta(days=1)
+
+
+class DailySeries:
+    """Daily values from `origin` on, with cumulative[i] = values[:i].sum()."""
+    __slots__ = ("origin", "values", "cumulative", "source")
+
+    def __init__(self, origin, values, source):
+        self.origin = origin
+        self.values = values
+        self.cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        # the dataset the values were read from; a reloaded dataset is a new object
+        self.source = source
+
+    @property
+    def end(self):
+        return self.origin + len(self.values) * DAY
+
+    def positions(self, timestamps):
+        """Days since the origin (fractional) of a DatetimeIndex."""
+        return ((timestamps - self.origin) / DAY).to_numpy(dtype=float)
+
+    def antiderivative(self, positions):
+        index = np.clip(np.floor(positions).astype(np.int64), 0, len(self.values) - 1)
+        return self.cumulative[index] + self.values[index] * (positions - index)
+
+    def point(self, positions):
+        return self.values[np.clip(np.floor(positions).astype(np.int64), 0, len(self.values) - 1)]
+
+
+def _source(name):
+    if name == "energy_price":
+        return datastore.get_energy_price_data()
+    return datastore.get_carbon_intensity_data()
+
+
+def _observed(name, location, source):
+    """The values of a location in the dataset, by date (first row per date, like the datastore indexes)."""
+    if name == "energy_price":
+        if location.lower() == "usa":
+            # no US prices in the CSV; calculate_cost always forecasts them
+            return pd.Series(dtype=float)
+        observed = pd.Series(source[selected_countries[location.lower()]].to_numpy(dtype=float),
+                             index=pd.DatetimeIndex(source["Datum von"]))
+    else:
+        rows = source[source["Country"].str.lower() == location.lower()]
+        observed = pd.Series(rows[datastore.CARBON_INTENSITY_COLUMN].to_numpy(dtype=float),
+                             index=pd.DatetimeIndex(rows["Datetime (UTC)"]))
+    return observed[~observed.index.duplicated()]
+
+
+def _daily_values(name, location, days, source):
+    values = _observed(name, location, source).reindex(days).to_numpy(dtype=float, copy=True)
+    gaps = np.isnan(values)
+    if gaps.any():
+        telemetry.count(f"timeseries.{name}.forecast_days", int(gaps.sum()))
+        if name == "energy_price":
+            values[gaps] = predict_energy_prices(days[gaps], location.capitalize())
+        else:
+            values[gaps] = predict_carbon_intensities(days[gaps], location)
+    return values
+
+
+_series = {}    # (series name, location) -> DailySeries
+_lock = threading.Lock()
+
+
+def get_series(name, location, first, stop):
+    """The daily series `name` of `location`, covering at least the days [first, stop)."""
+    key = (name, location)
+    source = _source(name)
+    series = _series.get(key)
+    if series is not None and series.source is source and series.origin <= first and stop <= series.end:
+        return series
+    with _lock:
+        series = _series.get(key)
+        if series is not None and series.source is source and series.origin <= first and stop <= series.end:
+            return series
+        # cover whole years, so nearby windows don't each extend the series
+        origin = pd.Timestamp(year=first.year, month=1, day=1)
+        end = pd.Timestamp(year=stop.year + 1, month=1, day=1)
+        if series is not None and series.source is source:
+            origin, end = min(origin, series.origin), max(end, series.end)
+        days = pd.date_range(origin, end, freq="D", inclusive="left")
+        with telemetry.span("timeseries.build"):
+            series = _series[key] = DailySeries(origin, _daily_values(name, location, days, source), source)
+        return series
+
+
+def clear():
+    _series.clear()
+
+
+def _window_days(runtime_hours):
+    return np.minimum(np.asarray(runtime_hours, dtype=float) / 24, MAX_WINDOW_DAYS)
+
+
+def window_means(name, location, start_dates, runtime_hours):
+    """Mean of the series over each window [start, start + runtime_hours), for arrays of starts and runtimes."""
+    starts = pd.DatetimeIndex(pd.to_datetime(start_dates))
+    lengths = _window_days(runtime_hours)
+    finite = lengths[np.isfinite(lengths)]
+    longest = float(finite.max()) if len(finite) else 0.0
+    series = get_series(name, location, starts.min(), starts.max() + (np.ceil(longest) + 1) * DAY)
+    start = series.positions(starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (series.antiderivative(start + lengths) - series.antiderivative(start)) / lengths
+    # a zero-length run is priced at its start day
+    return np.where(lengths > 0, means, series.point(start))
+
+
+def price_windows(energy, start_dates, runtime_hours, locations):
+    """
+    Cost (€) and CO₂ (g) of consuming `energy` kWh evenly over each run, for arrays of equal length.
+
+    Returns {"cost", "co2_equivalents" (mean gCO₂eq/kWh over the run), "co2", "energy_price" (mean €/MWh)}.
+    """
+    energy = np.asarray(energy, dtype=float)
+    start_dates = np.asarray(start_dates, dtype=object)
+    runtime_hours = np.asarray(runtime_hours, dtype=float)
+    locations = np.asarray(locations, dtype=object)
+    prices = np.empty(len(energy))
+    intensities = np.empty(len(energy))
+    with telemetry.span("timeseries.integrate"):
+        for location in pd.unique(locations):
+            rows = locations == location
+            prices[rows] = window_means("energy_price", location, start_dates[rows], runtime_hours[rows])
+            intensities[rows] = window_means("carbon_intensity", location, start_dates[rows], runtime_hours[rows])
+    return {
+        "cost": energy * prices / 1000,
+        "co2_equivalents": intensities,
+        "co2": energy * intensities,
+        "energy_price": prices,
+    }
+
+
+def breakdown(energy, start_date, runtime_hours, location, period="month"):
+    """
+    Energy, cost and CO₂ of one run per calendar period ("day", "week" or "month") it overlaps.
+
+    Returns {"start", "end", "runtime_hours", "truncated", "energy", "cost", "co2", "energy_price", "co2_equivalents",
+             "periods": [{"start", "end", "energy", "cost", "co2", "energy_price", "co2_equivalents"}, ...]}
+    with the same totals as price_windows. "truncated" is True if the run was longer than MAX_WINDOW_DAYS.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {tuple(PERIODS)}")
+    start = pd.Timestamp(start_date)
+    length = float(_window_days(runtime_hours))
+    end = start + length * DAY
+    price_series = get_series("energy_price", location, start, end + DAY)
+    intensity_series = get_series("carbon_intensity", location, start, end + DAY)
+
+    inner = pd.date_range(start, end, freq=PERIODS[period])
+    edges = pd.DatetimeIndex([start, *inner[(inner > start) & (inner < end)], end])
+    if length > 0:
+        durations = np.diff(price_series.positions(edges))
+        prices = np.diff(price_series.antiderivative(price_series.positions(edges))) / durations
+        intensities = np.diff(intensity_series.antiderivative(intensity_series.positions(edges))) / durations
+        energies = energy * durations / length
+    else:
+        edges = edges[[0, -1]]
+        prices = price_series.point(price_series.positions(edges[:1]))
+        intensities = intensity_series.point(intensity_series.positions(edges[:1]))
+        energies = np.array([float(energy)])
+    costs = energies * prices / 1000
+    co2 = energies * intensities
+
+    periods = [
+        {"start": period_start.isoformat(), "end": period_end.isoformat(), "energy": period_energy,
+         "cost": period_cost, "co2": period_co2, "energy_price": price, "co2_equivalents": intensity}
+        for period_start, period_end, period_energy, period_cost, period_co2, price, intensity
+        in zip(edges[:-1], edges[1:], energies.tolist(), costs.tolist(), co2.tolist(), prices.tolist(), intensities.tolist())
+    ]
+    total_energy = float(energies.sum())
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "runtime_hours": length * 24,
+        "truncated": bool(runtime_hours / 24 > MAX_WINDOW_DAYS),
+        "energy": total_energy,
+        "cost": float(costs.sum()),
+        "co2": float(co2.sum()),
+        "energy_price": float(costs.sum()) * 1000 / total_energy if total_energy else float(prices[0]),
+        "co2_equivalents": float(co2.sum()) / total_energy if total_energy else float(intensities[0]),
+        "periods": periods,
+    }
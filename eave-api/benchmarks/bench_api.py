@@ -0,0 +1,301 @@
+'''
+Benchmark suite for the API: cold start, per-call latency of the core pipeline functions and
+throughput of every main.py route through an in-process ASGI client.
+
+Seeds are fixed and the output is JSON, so results of two commits can be diffed directly or with
+--compare, which reports every timing that got slower by more than --threshold.
+
+Run from eave-api/:
+    python -m benchmarks.bench_api --output bench.json
+    python -m benchmarks.bench_api --quick --compare bench.json
+'''
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date
+from urllib.parse import quote
+
+import numpy as np
+
+SEED = 42
+EAVE_API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (repeats, route requests) for a full and a --quick run
+FULL = {"cold_start": 5, "calls": 200, "batch_calls": 10, "requests": 50, "slow_requests": 5}
+QUICK = {"cold_start": 2, "calls": 20, "batch_calls": 3, "requests": 10, "slow_requests": 2}
+CONCURRENCY = 8
+
+MEASURE_DATE = "2024-05-01"
+LOCATION = "Germany"
+COOLING_EFFICIENCY = 0.3
+
+
+def _seed():
+    import torch
+    random.seed(SEED)
+    np.random.seed(SEED)
+    torch.manual_seed(SEED)
+
+
+def _summary(timings):
+    """Latency statistics in milliseconds."""
+    timings_ms = np.array(timings) * 1e3
+    return {
+        "n": len(timings),
+        "min_ms": round(float(timings_ms.min()), 4),
+        "median_ms": round(float(np.median(timings_ms)), 4),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 4),
+        "mean_ms": round(float(timings_ms.mean()), 4),
+    }
+
+
+def _time_calls(fn, repeats):
+    timings = []
+    # the pipeline prints progress on every call; keep it out of the measurement output
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()    # warm up
+        _seed()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return _summary(timings)
+
+
+def _metadata():
+    import torch
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=EAVE_API_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "torch": torch.__version__,
+        "seed": SEED,
+        "inference_mode": os.environ.get("EAVE_INFERENCE_MODE", "predictive"),
+    }
+
+
+##################################################################
+# Cold start
+##################################################################
+
+def bench_cold_start(repeats):
+    """`import api` in a fresh interpreter (restores the posterior, loads pickles and CSVs lazily)."""
+    code = "import time; start = time.perf_counter(); import api; print(time.perf_counter() - start)"
+    timings = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", code], cwd=EAVE_API_DIR,
+                                capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return {"import_api": _summary(timings)}
+
+
+##################################################################
+# Pipeline functions
+##################################################################
+
+def _sample_configuration():
+    """A configuration from PUE_data.csv, so the throughput lookup hits."""
+    from api import datastore
+    row = datastore.get_pue_data().iloc[0]
+    return {
+        "system_name": row["System Name"],
+        "processor": row["Processor"],
+        "accelerator": row["Accelerator"],
+        "num_nodes": int(row["# of Nodes"]),
+        "num_accelerator": int(row["# of Accelerators"]),
+        "model_mlc": row["Model MLC"],
+    }
+
+
+def bench_functions(repeats, batch_repeats):
+    import pandas as pd
+    from api import datastore, get_env_data, get_PUE_prediction, get_PUE_prediction_batch
+    from api.energy import calculate_energy_values, calculate_energy_values_batch
+    from api.costs import calculate_cost, calculate_co2_equivalents
+
+    datastore.load_all()
+    configuration = _sample_configuration()
+    target_date = date.fromisoformat(MEASURE_DATE)
+    future_date = date(2030, 5, 1)      # not in the datasets: exercises the forecast models
+
+    scenario = {**configuration, "cooling_efficiency": COOLING_EFFICIENCY, "date": target_date, "location": LOCATION}
+    scenarios = [scenario] * 1000
+    energy_rows = pd.DataFrame([{**configuration, "cooling_efficiency_factor": COOLING_EFFICIENCY,
+                                 "environmental_impact_factor": 1.0}] * 100_000)
+    energy_args = (configuration["system_name"], configuration["processor"], configuration["accelerator"],
+                   configuration["num_nodes"], configuration["num_accelerator"], configuration["model_mlc"],
+                   COOLING_EFFICIENCY, 1.0)
+
+    return {
+        "get_env_data": _time_calls(lambda: get_env_data(target_date, LOCATION), repeats),
+        "calculate_energy_values": _time_calls(lambda: calculate_energy_values(*energy_args), repeats),
+        "calculate_energy_values_batch[100000]": _time_calls(
+            lambda: calculate_energy_values_batch(energy_rows, np.random.default_rng(SEED)), batch_repeats),
+        "calculate_cost": _time_calls(lambda: calculate_cost(1000.0, target_date, LOCATION), repeats),
+        "calculate_cost[forecast]": _time_calls(lambda: calculate_cost(1000.0, future_date, LOCATION), repeats),
+        "calculate_cost[usa]": _time_calls(lambda: calculate_cost(1000.0, target_date, "usa"), repeats),
+        "calculate_co2_equivalents": _time_calls(lambda: calculate_co2_equivalents(1000.0, target_date, LOCATION), repeats),
+        "calculate_co2_equivalents[forecast]": _time_calls(
+            lambda: calculate_co2_equivalents(1000.0, future_date, LOCATION), repeats),
+        "get_PUE_prediction": _time_calls(lambda: get_PUE_prediction(**scenario), repeats),
+        "get_PUE_prediction_batch[1000]": _time_calls(lambda: get_PUE_prediction_batch(scenarios), batch_repeats),
+    }
+
+
+##################################################################
+# Routes
+##################################################################
+
+def _route_requests():
+    """(name, method, path, payload, slow) for every route in main.py."""
+    from api import datastore
+    configuration = _sample_configuration()
+    model_name, compression_tech = next(iter(datastore.get_compression_index()))
+    measure = {**configuration, "cooling_efficiency": COOLING_EFFICIENCY, "date": MEASURE_DATE,
+               "location": LOCATION, "task": "benchmark"}
+    baseline = {**configuration, "model_name": model_name, "compressionTech": compression_tech,
+                "cooling_efficiency": COOLING_EFFICIENCY, "date": MEASURE_DATE, "location": LOCATION}
+    del baseline["model_mlc"]
+    return [
+        ("getHardware", "POST", "/api/common/getHardware", {"model_mlc": configuration["model_mlc"]}, False),
+        ("hardware", "GET", "/api/common/hardware?model_mlc=" + quote(configuration["model_mlc"]), None, False),
+        ("getProcessors", "POST", "/api/common/getProcessors",
+         {"model_mlc": configuration["model_mlc"], "accelerator": configuration["accelerator"]}, False),
+        ("getAccelerators", "POST", "/api/common/getAccelerators",
+         {"model_mlc": configuration["model_mlc"], "processor": configuration["processor"]}, False),
+        ("getCompressionList", "POST", "/api/optimize/getCompressionList", {"model_name": model_name}, False),
+        ("getBaselineList", "POST", "/api/optimize/getBaselineList", None, False),
+        ("optimizeBaseline", "POST", "/api/optimize/baseline", baseline, False),
+        ("executorStats", "GET", "/api/executor/stats", None, False),
+        ("measure", "POST", "/api/measure", measure, False),
+        ("predict", "POST", "/api/predict", measure, True),
+        ("bulkEvaluate[100]", "POST", "/api/bulk/evaluate", [measure] * 50 + [baseline] * 50, True),
+    ]
+
+
+async def _bench_route(client, method, path, payload, requests):
+    async def call():
+        start = time.perf_counter()
+        response = await client.request(method, path, json=payload)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        return elapsed
+
+    await call()    # warm up
+    _seed()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def bounded_call():
+        async with semaphore:
+            return await call()
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(bounded_call() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    return {**_summary(timings), "concurrency": CONCURRENCY, "requests_per_s": round(requests / wall, 3)}
+
+
+async def _bench_routes(requests, slow_requests):
+    import httpx
+    import main
+
+    results = {}
+    # ASGITransport doesn't run the lifespan, so enter it here (data indexes, model and worker warm-up)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for name, method, path, payload, slow in _route_requests():
+                    results[name] = await _bench_route(client, method, path, payload,
+                                                       slow_requests if slow else requests)
+    return results
+
+
+def bench_routes(requests, slow_requests):
+    return asyncio.run(_bench_routes(requests, slow_requests))
+
+
+##################################################################
+# Comparison
+##################################################################
+
+def compare(previous, current, threshold):
+    """Timings in `current` that are more than `threshold` (relative) slower than in `previous`."""
+    regressions = []
+    for section in ("cold_start", "functions", "routes"):
+        for name, stats in current.get(section, {}).items():
+            before = previous.get(section, {}).get(name)
+            if not before:
+                continue
+            change = stats["median_ms"] / before["median_ms"] - 1
+            print(f"{section + '/' + name:<55} {before['median_ms']:>12.3f} -> {stats['median_ms']:>12.3f} ms  {change:>+8.1%}", file=sys.stderr)
+            if change > threshold:
+                regressions.append({"benchmark": f"{section}/{name}", "before_ms": before["median_ms"],
+                                    "after_ms": stats["median_ms"], "change": round(change, 4)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats, for a fast smoke run")
+    parser.add_argument("--only", nargs="+", choices=["cold_start", "functions", "routes"],
+                        help="run only these sections")
+    parser.add_argument("--compare", help="previous results JSON; exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown of the median counted as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, EAVE_API_DIR)
+    counts = QUICK if args.quick else FULL
+    sections = args.only or ["cold_start", "functions", "routes"]
+    _seed()
+
+    results = {"metadata": {**_metadata(), "quick": args.quick}}
+    if "cold_start" in sections:
+        results["cold_start"] = bench_cold_start(counts["cold_start"])
+    if "functions" in sections:
+        results["functions"] = bench_functions(counts["calls"], counts["batch_calls"])
+    if "routes" in sections:
+        results["routes"] = bench_routes(counts["requests"], counts["slow_requests"])
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = compare(previous, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression['benchmark']}: {regression['before_ms']} -> {regression['after_ms']} ms",
+                      file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+'''
+Compare the two PUE serving modes: pyro Predictive vs. the closed-form Monte Carlo sample bank.
+
+Run from eave-api/:
+    python -m benchmarks.bench_inference
+'''
+import time
+
+import numpy as np
+import torch
+
+from api import model
+
+BATCH_SIZES = [1, 100, 10_000]
+REPEATS = 5
+
+
+def _time(fn, repeats=REPEATS):
+    fn()    # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    raw_df = model.pd.read_csv(model.PUE_CSV_filepath)[model.features].to_numpy()
+    X_all = model._scaler.transform(raw_df)
+
+    print(f"posterior samples: predictive={model.NUM_POSTERIOR_SAMPLES}, monte_carlo bank={model.NUM_BANK_SAMPLES}")
+    print(f"{'batch':>8} {'predictive ms':>15} {'mc mean ms':>12} {'mc summary ms':>15} {'speedup':>9} {'max |Δmean|':>12}")
+    for batch_size in BATCH_SIZES:
+        X = X_all[rng.integers(0, len(X_all), batch_size)]
+        X_tensor = torch.tensor(X, dtype=torch.float32)
+
+        predictive_s = _time(lambda: model._predictive(X_tensor)["obs"].mean(0))
+        monte_carlo_s = _time(lambda: model._sample_bank.sample_mean(X).mean(0))
+        summary_s = _time(lambda: model._sample_bank.predict(X))
+
+        predictive_mean = model._predictive(X_tensor)["obs"].mean(0).numpy()
+        monte_carlo_mean = model._sample_bank.predict(X)["mean"]
+        max_diff = float(np.abs(predictive_mean - monte_carlo_mean).max())
+
+        print(f"{batch_size:>8} {predictive_s * 1e3:>15.2f} {monte_carlo_s * 1e3:>12.2f} {summary_s * 1e3:>15.2f} "
+              f"{predictive_s / monte_carlo_s:>8.1f}x {max_diff:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,78 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
 from fastapi.middleware.cors import CORSMiddleware
 
+import asyncio
+import csv
+import io
+import json
 import os
+import time
 import numpy as np
-import pandas as pd
 import random
+from collections import deque
 from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Optional
 
-from api import get_PUE_prediction, get_env_data
-from api.energy import get_avg_result
+from api import catalog, causal_effects, compression, get_env_data, datastore, executor, lookups, telemetry, timeseries
+from api.model import update_posterior, NUM_UPDATE_STEPS, DEFAULT_QUANTILES
+from api.energy import get_avg_result, compute_energy
 from api.costs import calculate_cost, calculate_co2_equivalents
-from api.mappings import average_energy_prices, selected_countries, energy_mix, host_proc_core_count_mapping, proc_cores_map
+from api.registry import forecast_models
+from api.optimizer import optimize, evaluate_candidates, MAX_HORIZON_DAYS
+from api.scheduler import schedule
+from api.executor import ExecutorSaturated, run_io, run_inference
+from api.result_store import create_result_store, new_measurement_id
+from api.mappings import average_energy_prices, selected_countries, energy_mix
 
 random.seed(42)
 np.random.seed(42)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the reference datasets and build their indexes before serving requests
+    datastore.load_all()
+    # render the dropdown answers
+    lookups.get_tables()
+    # deserialize the price and carbon-intensity forecast models once
+    forecast_models.warm_up()
+    # start the inference worker processes so the first request doesn't pay for it
+    executor.inference_executor.warm_up()
+    yield
+    executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# /api/measure results, looked up by /api/predict (see api/result_store.py)
+result_store = create_result_store()
+
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    # backpressure: tell clients to retry instead of queueing without bound
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# Send a Server-Timing header with the per-span breakdown when the client asks for it
+# (X-Eave-Timing: 1) or for every request with EAVE_TIMING_HEADER=1
+TIMING_HEADER_ALWAYS = os.environ.get("EAVE_TIMING_HEADER", "0") == "1"
+
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    start = time.perf_counter()
+    with telemetry.trace_request() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    # label by route template, not raw path, to keep the number of series bounded
+    route = request.scope.get("route")
+    telemetry.http_request_seconds.observe(
+        (request.method, route.path if route is not None else "unmatched", str(response.status_code)), elapsed)
+    if TIMING_HEADER_ALWAYS or request.headers.get("x-eave-timing") == "1":
+        response.headers["Server-Timing"] = telemetry.server_timing(timings, total=elapsed)
+    return response
 
 # Define the CORS middleware to allow the frontend to communicate
 app.add_middleware(
@@ -27,6 +83,12 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+def _check_locations(locations):
+    unknown = [location for location in locations if location.lower() not in selected_countries]
+    if unknown:
+        raise ValueError(f"Unknown locations {unknown}, expected some of {list(selected_countries)}")
+    return locations
+
 # Define Pydantic model to receive input data
 class PredictInput(BaseModel):
     system_name: str
@@ -39,187 +101,376 @@ class PredictInput(BaseModel):
     date: str
     location: str
     task: str
+    uncertainty: bool = False                           # also report intervals of PUE, energy, cost and CO2
+    quantiles: List[float] = list(DEFAULT_QUANTILES)    # ... at these quantiles
+    pricing: Literal["daily", "runtime"] = "daily"      # price at `date`, or over the runtime from `date` on
+    period: Literal["day", "week", "month"] = "month"   # periods of the "runtime" breakdown
+
+    @field_validator("location")
+    @classmethod
+    def _check_location(cls, location):
+        return _check_locations([location])[0]
+
+    @field_validator("date")
+    @classmethod
+    def _check_date(cls, date):
+        datetime.strptime(date, "%Y-%m-%d")     # ValueError -> 422
+        return date
+
+    @field_validator("quantiles")
+    @classmethod
+    def _check_quantiles(cls, quantiles):
+        if not quantiles or not all(0 < q < 1 for q in quantiles):
+            raise ValueError("quantiles must be a non-empty list of values between 0 and 1")
+        return sorted(set(quantiles))
+
+
+def _quantiles(input_data):
+    return input_data.quantiles if input_data.uncertainty else None
+
+
+def _format_uncertainty(uncertainty):
+    """Uncertainty in the units of the response: PUE, kWh, cost and kg CO2."""
+    return {
+        "pue": {name: round(value, 3) for name, value in uncertainty["pue"].items()},
+        "totalEnergy": {name: round(value/1000, 2) for name, value in uncertainty["energy"].items()},
+        "cost": {name: round(value, 2) for name, value in uncertainty["cost"].items()},
+        "co2Consumption": {name: round(value/1000, 2) for name, value in uncertainty["co2"].items()},
+    }
+
+
+def _format_breakdown(breakdown):
+    return {
+        "start": breakdown["start"],
+        "end": breakdown["end"],
+        "runtimeHours": round(breakdown["runtime_hours"], 2),
+        "truncated": breakdown["truncated"],
+        "periods": [
+            {
+                "start": period["start"],
+                "end": period["end"],
+                "totalEnergy": round(period["energy"]/1000, 2),
+                "cost": round(period["cost"], 2),
+                "co2Consumption": round(period["co2"]/1000, 2),
+                "energyPrice": round(period["energy_price"], 2),
+                "co2_equivalents": round(period["co2_equivalents"], 2),
+            }
+            for period in breakdown["periods"]
+        ],
+    }
+
+
+async def _breakdown(result, input_data):
+    """Per-period breakdown of a result priced over its runtime."""
+    breakdown = await run_io(timeseries.breakdown, result["energy"], result["date"], result["runtime_hours"],
+                             result["location"], input_data.period)
+    return _format_breakdown(breakdown)
+
+
+def _configuration(input_data):
+    return {
+        "system_name": input_data.system_name,
+        "processor": input_data.processor,
+        "accelerator": input_data.accelerator,
+        "num_nodes": input_data.num_nodes,
+        "num_accelerator": input_data.num_accelerator,
+        "model_mlc": input_data.model_mlc,
+        "cooling_efficiency": input_data.cooling_efficiency,
+    }
+
+
+def _scenario(input_data):
+    """The configuration at its own date and location, as evaluate_candidates takes it."""
+    target_date = datetime.strptime(input_data.date, "%Y-%m-%d").date()
+    return {**_configuration(input_data), "date": target_date, "location": input_data.location}
+
+
+async def _measure(input_data: PredictInput):
+    """Evaluate the requested configuration at its own date and location, and store the result."""
+    scenario = _scenario(input_data)
+    target_date = scenario["date"]
+    # PUE, energy, cost and CO2 in an inference worker process
+    [result] = await run_inference(evaluate_candidates, [scenario], _quantiles(input_data), input_data.pricing)
+    measurement = {
+        "cost": result["cost"],
+        "pue": result["pue"],
+        "energy": result["energy"],
+        "runtime_hours": result["runtime_hours"],
+        "throughput_confidence": result["throughput_confidence"],
+        "pricing": input_data.pricing,
+        "co2": result["co2"],
+        "co2_equivalents": result["co2_equivalents"],
+        "measureDate": target_date.isoformat(),
+    }
+    if "uncertainty" in result:
+        measurement["uncertainty"] = result["uncertainty"]
+    measurement_id = new_measurement_id()
+    await run_io(result_store.put, measurement_id, measurement)
+    return measurement_id, measurement
 
 
 # 🚀 API Endpoint: Receive POST request and perform calculations
 @app.post("/api/measure")
 async def calculate_measure_metrics(input_data: PredictInput):
-    target_date = datetime.strptime(input_data.date, "%Y-%m-%d").date()
-    environment_data, energy_data, pue = get_PUE_prediction(   
-                                input_data.system_name,
-                                input_data.processor,
-                                input_data.accelerator,
-                                input_data.num_nodes,
-                                input_data.num_accelerator,
-                                input_data.model_mlc,
-                                input_data.cooling_efficiency,
-                                target_date,)
-    
-    # Perform the calculations
-    energy_consumption = energy_data['E_Total_Facility_kWh']
-    cost = calculate_cost(energy_consumption, target_date, input_data.location)
-    co2_equivalents, co2_consumption = calculate_co2_equivalents(energy_consumption, target_date, input_data.location)
-
-    app.state.cost = cost
-    app.state.pue = pue
-    app.state.energy = energy_consumption
-    app.state.co2 = co2_consumption
-    app.state.measureDate = target_date
-    app.state.co2_equivalents = co2_equivalents
-    # global_cost = cost
+    measurement_id, measurement = await _measure(input_data)
 
     # Return the results as a response
-    return {
-      "cost": round(cost,2),
+    response = {
+      "measurementId": measurement_id,
+      "cost": round(measurement["cost"],2),
       "predictedPrice": None,
-      "totalEnergy": round(energy_consumption/1000,2),
+      "totalEnergy": round(measurement["energy"]/1000,2),
       "predicttotalEnergy": None,
-      "pue": round(pue,2),
+      "pue": round(measurement["pue"],2),
       "predictpue": None,
-      "co2Consumption": round((co2_consumption/1000), 2),
+      "co2Consumption": round((measurement["co2"]/1000), 2),
       "predictco2Consumption": None,
-      "co2_equivalents": round(app.state.co2_equivalents,2),
+      "co2_equivalents": round(measurement["co2_equivalents"],2),
       "predictco2_equivalents": None,
       "predictlocation" : None,
       "energyPrice": average_energy_prices[f'{input_data.location.lower()}'],
-      "measureDate" : target_date,
+      "measureDate" : measurement["measureDate"],
       "predictDate" : None,
       "energyMix": energy_mix[input_data.location.lower()],
+      # 1 if the configuration's throughput was measured, lower the further it is from measured ones
+      "throughputConfidence": round(measurement["throughput_confidence"], 3),
+    }
+    if input_data.uncertainty:
+        response["uncertainty"] = _format_uncertainty(measurement["uncertainty"])
+    if input_data.pricing == "runtime":
+        response["breakdown"] = await _breakdown(
+            {**measurement, "date": input_data.date, "location": input_data.location}, input_data)
+    return response
+
+class PredictQuery(PredictInput):
+    objective: Literal["cost", "co2", "weighted"] = "cost"
+    cost_weight: float = 0.5                # weights for the "weighted" objective
+    co2_weight: float = 0.5
+    # search this many days after `date` in steps of `step_days` days (default: the next 4 seasons)
+    horizon_days: int = Field(360, ge=1, le=MAX_HORIZON_DAYS)
+    step_days: int = Field(90, ge=1)
+    locations: Optional[List[str]] = Field(None, min_length=1)  # defaults to all selected countries
+    top_k: int = Field(1, ge=1)
+    measurement_id: Optional[str] = None    # from /api/measure; measured again if missing or expired
+
+    @field_validator("locations")
+    @classmethod
+    def _check_search_locations(cls, locations):
+        return locations if locations is None else _check_locations(locations)
+
+    @model_validator(mode="after")
+    def _check_horizon(self):
+        if self.horizon_days < self.step_days:
+            raise ValueError("horizon_days must be at least step_days")
+        return self
+
+
+def _format_candidate(result):
+    candidate = {
+        "location": result["location"],
+        "date": result["date"],
+        "pue": round(result["pue"], 2),
+        "totalEnergy": round(result["energy"]/1000, 2),
+        "cost": round(result["cost"], 2),
+        "co2Consumption": round(result["co2"]/1000, 2),
+        "co2_equivalents": round(result["co2_equivalents"], 2),
+        "throughputConfidence": round(result["throughput_confidence"], 3),
     }
+    if "uncertainty" in result:
+        candidate["uncertainty"] = _format_uncertainty(result["uncertainty"])
+    return candidate
+
 
 @app.post("/api/predict")
-async def calculate_predict_metrics(input_data: PredictInput):
+async def calculate_predict_metrics(input_data: PredictQuery):
     target_date = datetime.strptime(input_data.date, "%Y-%m-%d").date()
-    best_metric = 1e10
-    for _ in range(4):      # loop through all 4 seasons
-    # if target_date == app.state.measureDate:
-        target_date = target_date + timedelta(days=90)  # Approximate 3 months later
-        environment_data, energy_data, predictpue = get_PUE_prediction(   
-                                    input_data.system_name,
-                                    input_data.processor,
-                                    input_data.accelerator,
-                                    input_data.num_nodes,
-                                    input_data.num_accelerator,
-                                    input_data.model_mlc,
-                                    input_data.cooling_efficiency,
-                                    target_date)
-
-        for location in list(selected_countries.keys()):
-            # Perform the calculations
-            energy_consumption = energy_data['E_Total_Facility_kWh']
-            cost = calculate_cost(energy_consumption, target_date, location)
-            co2_equivalents, co2_consumption = calculate_co2_equivalents(energy_consumption, target_date, location)
-
-            # calculate metric
-            new_metric = cost
-            # check if the new metric is best, save outputs
-            if new_metric<best_metric:
-                # re-assign best_metric
-                best_metric = new_metric
-                # save outputs
-                best_cost = cost
-                best_energy_consumption = energy_consumption
-                best_predictpue = predictpue
-                best_co2_consumption = co2_consumption
-                best_location = location
-                best_target_date = target_date
-                best_co2_equivalents = co2_equivalents
+    configuration = _configuration(input_data)
+
+    # the baseline measurement comes from the result store, so any worker can serve this request
+    measurement_id = input_data.measurement_id
+    measurement = await run_io(result_store.get, measurement_id) if measurement_id else None
+    # a stored measurement without intervals or priced differently is measured again
+    if (measurement is None or (input_data.uncertainty and "uncertainty" not in measurement)
+            or measurement.get("pricing", "daily") != input_data.pricing):
+        measurement_id, measurement = await _measure(input_data)
+
+    # fail fast if the inference pool can't take more work, then fan the candidates out over it
+    executor.inference_executor.ensure_capacity()
+    optimized = await run_io(
+        optimize,
+        [configuration],
+        target_date,
+        locations=input_data.locations,
+        horizon_days=input_data.horizon_days,
+        step_days=input_data.step_days,
+        objective=input_data.objective,
+        weights={"cost": input_data.cost_weight, "co2": input_data.co2_weight},
+        top_k=input_data.top_k,
+        parallel=True,
+        quantiles=_quantiles(input_data),
+        pricing=input_data.pricing,
+    )
+    if not optimized["top_k"]:
+        raise HTTPException(status_code=400, detail="No candidates to evaluate for these dates and locations")
+    best = optimized["top_k"][0]
+    best_cost = best["cost"]
+    best_energy_consumption = best["energy"]
+    best_predictpue = best["pue"]
+    best_co2_consumption = best["co2"]
+    best_location = best["location"]
+    best_target_date = best["date"]
+    best_co2_equivalents = best["co2_equivalents"]
 
     # Return the results as a response
-    return {
-        "cost": round(app.state.cost,2),
+    response = {
+      "measurementId": measurement_id,
+      "cost": round(measurement["cost"],2),
       "predictedPrice": round(best_cost,2),
-      "totalEnergy": round(app.state.energy/1000,2),
+      "totalEnergy": round(measurement["energy"]/1000,2),
       "predicttotalEnergy": round(best_energy_consumption/1000,2),
-      "pue": round(app.state.pue,2),
+      "pue": round(measurement["pue"],2),
       "predictpue": round(best_predictpue,2),
-      "co2Consumption": round((app.state.co2/1000), 2),
+      "co2Consumption": round((measurement["co2"]/1000), 2),
       "predictco2Consumption": round((best_co2_consumption/1000), 2),
-      "co2_equivalents": round(app.state.co2_equivalents,2),
+      "co2_equivalents": round(measurement["co2_equivalents"],2),
       "predictco2_equivalents": round(best_co2_equivalents,2),
       "predictlocation" : best_location,
       "energyPrice": average_energy_prices[f'{best_location.lower()}'],
-      "measureDate": app.state.measureDate,
+      "measureDate": measurement["measureDate"],
       "predictDate" : best_target_date,
       "energyMix": energy_mix[input_data.location.lower()],
+      "candidates": [_format_candidate(result) for result in optimized["top_k"]],
+      "pareto": [_format_candidate(result) for result in optimized["pareto"]],
+      "evaluatedCandidates": optimized["evaluated"],
     }
+    if input_data.uncertainty:
+        response["uncertainty"] = _format_uncertainty(measurement["uncertainty"])
+        response["predictUncertainty"] = _format_uncertainty(best["uncertainty"])
+    if input_data.pricing == "runtime":
+        response["breakdown"] = await _breakdown(
+            {**measurement, "date": input_data.date, "location": input_data.location}, input_data)
+        response["predictBreakdown"] = await _breakdown(best, input_data)
+    return response
 
 
-class HardwareQuery(BaseModel):
+class ScheduleQuery(BaseModel):
+    system_name: str
+    processor: str
+    accelerator: str
+    num_nodes: int
+    num_accelerator: int
     model_mlc: str
+    cooling_efficiency: float
+    earliest_start: str                     # ISO date or datetime
+    deadline: str                           # the run has to finish by then
+    locations: Optional[List[str]] = None   # defaults to all selected countries
+    objective: Literal["cost", "co2", "weighted"] = "cost"
+    cost_weight: float = 0.5
+    co2_weight: float = 0.5
+    step_hours: int = 1                     # try a start every this many hours
+    top_k: int = 5
+    separation_hours: float = 24            # minimum distance between returned starts at one location
+
+
+@app.post("/api/schedule")
+async def scheduleWorkload(input_data: ScheduleQuery):
+    try:
+        earliest_start = datetime.fromisoformat(input_data.earliest_start)
+        deadline = datetime.fromisoformat(input_data.deadline)
+        scheduled = await run_io(
+            schedule,
+            _configuration(input_data),
+            earliest_start,
+            deadline,
+            locations=input_data.locations,
+            objective=input_data.objective,
+            weights={"cost": input_data.cost_weight, "co2": input_data.co2_weight},
+            step_hours=input_data.step_hours,
+            top_k=input_data.top_k,
+            separation_hours=input_data.separation_hours,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/api/common/getHardware")
-async def getHardware(input_data: HardwareQuery):
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    PUE_CSV_filepath = os.path.join(file_dir, 'api/PUE_data.csv')
-    df = pd.read_csv(PUE_CSV_filepath) 
+    return {
+        "runtimeHours": round(scheduled["runtime_hours"], 2),
+        "evaluatedWindows": scheduled["evaluated"],
+        "windows": [
+            {
+                "location": window["location"],
+                "start": window["start"],
+                "end": window["end"],
+                "totalEnergy": round(window["energy"]/1000, 2),
+                "cost": round(window["cost"], 2),
+                "co2Consumption": round(window["co2"]/1000, 2),
+                "energyPrice": round(window["energy_price"], 2),
+                "co2_equivalents": round(window["co2_equivalents"], 2),
+                "score": window["score"],
+            }
+            for window in scheduled["windows"]
+        ],
+    }
 
-    # Filter based on the given model_mlc
-    filtered_df = df[df["Model MLC"] == input_data.model_mlc]
 
-    if filtered_df.empty:
-        return {"processors": [], "accelerators": []}  # Return empty lists if no match found
+# Dropdown answers are precomputed (see api/lookups.py). The GET variants send a strong ETag and
+# Cache-Control, and answer 304 when the client's copy is current.
+LOOKUP_CACHE_CONTROL = f"public, max-age={int(os.environ.get('EAVE_LOOKUP_MAX_AGE', 60))}"
 
-    # Get unique values for processors and accelerators
-    processors = filtered_df["Processor"].dropna().unique().tolist()
-    accelerators = filtered_df["Accelerator"].dropna().unique().tolist()
 
-    return {
-        "processors": processors,
-        "accelerators": accelerators
-    }
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _lookup_response(request: Request, answer):
+    body, etag = answer
+    headers = {"ETag": etag, "Cache-Control": LOOKUP_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class HardwareQuery(BaseModel):
+    model_mlc: str
+
+@app.get("/api/common/hardware")
+async def hardware(request: Request, model_mlc: str):
+    return _lookup_response(request, await run_io(lookups.hardware, model_mlc))
+
+@app.post("/api/common/getHardware")
+async def getHardware(input_data: HardwareQuery):
+    body, _ = await run_io(lookups.hardware, input_data.model_mlc)  # empty lists if no match found
+    return Response(content=body, media_type="application/json")
 
 
 class ProcessorQuery(BaseModel):
     model_mlc: str
     accelerator: str
 
+@app.get("/api/common/processors")
+async def processors(request: Request, model_mlc: str, accelerator: str):
+    return _lookup_response(request, await run_io(lookups.processors, model_mlc, accelerator))
+
 @app.post("/api/common/getProcessors")
 async def getProcessors(input_data: ProcessorQuery):
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    PUE_CSV_filepath = os.path.join(file_dir, 'api/PUE_data.csv')
-    df = pd.read_csv(PUE_CSV_filepath) 
-    
-    # Filter based on model_mlc and accelerator
-    filtered_df = df[
-        (df["Model MLC"] == input_data.model_mlc) & 
-        (df["Accelerator"] == input_data.accelerator)
-    ]
-
-    if filtered_df.empty:
-        return {"processors": []}  # Return empty list if no match found
-
-    # Get unique processors
-    processors = filtered_df["Processor"].dropna().unique().tolist()
-
-    return {"processors": processors}
+    body, _ = await run_io(lookups.processors, input_data.model_mlc, input_data.accelerator)
+    return Response(content=body, media_type="application/json")
 
 class AcceleratorQuery(BaseModel):
     model_mlc: str
     processor: str
 
+@app.get("/api/common/accelerators")
+async def accelerators(request: Request, model_mlc: str, processor: str):
+    return _lookup_response(request, await run_io(lookups.accelerators, model_mlc, processor))
+
 @app.post("/api/common/getAccelerators")
 async def getAccelerators(input_data: AcceleratorQuery):
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    PUE_CSV_filepath = os.path.join(file_dir, 'api/PUE_data.csv')
-    df = pd.read_csv(PUE_CSV_filepath) 
-    
-    # Filter based on model_mlc and accelerator
-    filtered_df = df[
-        (df["Model MLC"] == input_data.model_mlc) & 
-        (df["Processor"] == input_data.processor)
-    ]
-
-    if filtered_df.empty:
-        return {"accelerators": []}  # Return empty list if no match found
-
-    # Get unique processors
-    accelerators = filtered_df["Accelerator"].dropna().unique().tolist()
-
-    return {"accelerators": accelerators}
+    body, _ = await run_io(lookups.accelerators, input_data.model_mlc, input_data.processor)
+    return Response(content=body, media_type="application/json")
 
 
 class OptimizeBaselineQuery(BaseModel):
@@ -236,27 +487,24 @@ class OptimizeBaselineQuery(BaseModel):
 
 @app.post("/api/optimize/baseline")
 async def getOptimizeInfo(input_data: OptimizeBaselineQuery):
+    return await run_io(optimize_baseline, input_data)
+
+
+def optimize_baseline(input_data: OptimizeBaselineQuery):
     target_date = datetime.strptime(input_data.date, "%Y-%m-%d").date()
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    compression_filepath = os.path.join(file_dir, 'data/compression_technique_data.csv')
-    df = pd.read_csv(compression_filepath) 
-    # Filter based on model_name and compressionTech
-    row = df[
-        (df["model_name"] == input_data.model_name) & 
-        (df["compressionTech"] == input_data.compressionTech)
-    ]
+    # Look up the row for model_name and compressionTech
+    row = datastore.get_compression_index()[(input_data.model_name, input_data.compressionTech)]
     # Save each column into a variable
-    tdp_proc = row['tdp_proc'].to_numpy()[0]
-    no_of_processors = row['no_of_processors'].to_numpy()[0]
-    tdp_acc = row['tdp_acc'].to_numpy()[0]
-    num_accelerator = row['num_accelerator'].to_numpy()[0]
-    num_nodes = row['num_nodes'].to_numpy()[0]
-    algorithm_performance = row['performance'].to_numpy()[0]
-    num_parameters = row['params'].to_numpy()[0]
-    cores_per_processor = proc_cores_map.get(input_data.processor, 62.56)  # Get cores per processor value
-    host_proc_core_count = host_proc_core_count_mapping.get(input_data.system_name, 63.21)  # Get host processor core count
-    throughput = row['throughput'].to_numpy()[0]
+    tdp_proc = row['tdp_proc']
+    no_of_processors = row['no_of_processors']
+    tdp_acc = row['tdp_acc']
+    num_accelerator = row['num_accelerator']
+    num_nodes = row['num_nodes']
+    algorithm_performance = row['performance']
+    num_parameters = row['params']
+    cores_per_processor = catalog.processors.value(input_data.processor, "cores_per_processor")  # Get cores per processor value
+    host_proc_core_count = catalog.systems.value(input_data.system_name, "host_proc_core_count")  # Get host processor core count
+    throughput = row['throughput']
 
     no_of_processors = host_proc_core_count / cores_per_processor
     # if ((num_nodes==input_data.num_nodes) and (num_accelerator==input_data.num_accelerator)):
@@ -265,33 +513,14 @@ async def getOptimizeInfo(input_data: OptimizeBaselineQuery):
     #     num_accelerator=input_data.num_accelerator
     #     throughput = 66869.50   # use average value if the data is not in excel
 
-    '''
-    use the following formula to calculate Total Energy
-    '''
-    total_tokens = 5e9 * 30 * 3     # avg. tokens per day (1e9) * days in a month * num. of months
-    runtime_hours = total_tokens / (throughput * 3600)    # runtime_hours = number of samples / throughput(per sec) * secs in hour
-    E_IT_per_node_kWh = (
-        (tdp_proc * no_of_processors) + 
-        (tdp_acc * num_accelerator)
-    ) * runtime_hours / 1000  # Convert Wh to kWh
-
-    # Scale by the number of nodes
-    E_IT_Total_kWh = E_IT_per_node_kWh * num_nodes
-
-    # Adjusted cooling efficiency
-    adjusted_cooling_efficiency = input_data.cooling_efficiency * get_env_data(target_date)["Environmental_Impact_Factor"]
-
-    # Calculate cooling energy per node
-    E_Cooling_per_node_kWh = E_IT_Total_kWh * adjusted_cooling_efficiency
-
     # Generate random percentages for UPS and battery inefficiency
     UPS_and_battery_inefficiency = np.random.uniform(0.85, 0.90)
 
-    # Calculate UPS inefficiency (as a percentage of the total energy)
-    UPS_and_battery_inefficiency_kWh = E_IT_Total_kWh * (1 - UPS_and_battery_inefficiency)
-
-    # Calculate total energy consumption for the facility (in kWh)
-    E_Total_Facility_kWh = E_IT_Total_kWh + E_Cooling_per_node_kWh + UPS_and_battery_inefficiency_kWh
+    environmental_impact_factor = get_env_data(target_date, input_data.location)["Environmental_Impact_Factor"]
+    energy = compute_energy(tdp_proc, no_of_processors, tdp_acc, num_accelerator, num_nodes, throughput,
+                            input_data.cooling_efficiency, environmental_impact_factor, UPS_and_battery_inefficiency)
+    E_IT_Total_kWh = energy["E_IT_Total_kWh"]
+    E_Total_Facility_kWh = energy["E_Total_Facility_kWh"]
 
     # calculate PUE
     pue = E_Total_Facility_kWh / E_IT_Total_kWh
@@ -308,26 +537,299 @@ async def getOptimizeInfo(input_data: OptimizeBaselineQuery):
         "params": int(num_parameters),
     }
 
+class HardwareOption(BaseModel):
+    system_name: str
+    processor: str
+    cooling_efficiency: Optional[float] = None  # defaults to the query's
+
+class CompressionParetoQuery(BaseModel):
+    hardware: List[HardwareOption]
+    dates: List[str]
+    locations: Optional[List[str]] = None       # defaults to all selected countries
+    model_names: Optional[List[str]] = None     # defaults to every model in compression_technique_data.csv
+    techniques: Optional[List[str]] = None      # defaults to every technique of those models
+    cooling_efficiency: float = 0.5
+    pricing: Literal["daily", "runtime"] = "daily"
+    min_performance: Optional[float] = None     # constraints applied before the front is taken
+    max_cost: Optional[float] = None
+
+    @field_validator("dates")
+    @classmethod
+    def _check_dates(cls, dates):
+        for value in dates:
+            datetime.strptime(value, "%Y-%m-%d")
+        return dates
+
+
+def _format_compression_candidate(result):
+    return {
+        "model_name": result["model_name"],
+        "compressionTech": result["compressionTech"],
+        "system_name": result["system_name"],
+        "processor": result["processor"],
+        "location": result["location"],
+        "date": result["date"],
+        "totalEnergy": round(result["energy"]/1000, 2),
+        "cost": round(result["cost"], 2),
+        "co2Equivalent": round(result["co2_equivalents"], 2),
+        "co2Consumption": round(result["co2"]/1000, 2),
+        "pue": round(result["pue"], 2),
+        "runtimeHours": round(result["runtime_hours"], 2),
+        "performance": result["performance"],
+        "params": result["params"],
+    }
+
+# Pareto front of compression techniques x hardware x locations x dates over energy, cost, CO₂, params and performance
+@app.post("/api/optimize/pareto")
+async def optimizeCompression(input_data: CompressionParetoQuery):
+    try:
+        searched = await run_io(
+            compression.search,
+            [option.model_dump() for option in input_data.hardware],
+            input_data.dates,
+            input_data.locations,
+            input_data.model_names,
+            input_data.techniques,
+            input_data.cooling_efficiency,
+            input_data.pricing,
+            input_data.min_performance,
+            input_data.max_cost,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "evaluated": searched["evaluated"],
+        "feasible": searched["feasible"],
+        "pareto": [_format_compression_candidate(result) for result in searched["front"]],
+    }
+
 class CompressionListQuery(BaseModel):
     model_name: str
 
+async def _compression_list(model_name):
+    answer = await run_io(lookups.compression_list, model_name)
+    if answer is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_name}'")
+    return answer
+
+@app.get("/api/optimize/compressionList")
+async def compressionList(request: Request, model_name: str):
+    return _lookup_response(request, await _compression_list(model_name))
+
 @app.post("/api/optimize/getCompressionList")
 async def getCompressionList(input_data: CompressionListQuery):
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    compression_filepath = os.path.join(file_dir, 'data/compression_technique_data.csv')
-    df = pd.read_csv(compression_filepath) 
-    compressionDF = df.groupby('model_name')['compressionTech'].apply(list).reset_index()
-    compressionList = compressionDF.loc[compressionDF['model_name'] == input_data.model_name,'compressionTech'].values[0]
-    # Remove 'original' from the list
-    filtered_compressionList = [tech for tech in compressionList if tech.lower() != 'original']
-    return {"compressionList": filtered_compressionList}
+    body, _ = await _compression_list(input_data.model_name)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/optimize/baselineList")
+async def baselineList(request: Request):
+    return _lookup_response(request, await run_io(lookups.baseline_list))
 
 @app.post("/api/optimize/getBaselineList")
 async def getBaselineList():
-    # Load the CSV file
-    file_dir = os.path.dirname(__file__)
-    compression_filepath = os.path.join(file_dir, 'data/compression_technique_data.csv')
-    df = pd.read_csv(compression_filepath) 
-    baselineList = pd.unique(df['model_name'])
-    return {"baselineList": baselineList.tolist()}
\ No newline at end of file
+    body, _ = await run_io(lookups.baseline_list)
+    return Response(content=body, media_type="application/json")
+
+
+BULK_BATCH_SIZE = 256
+
+
+def _parse_bulk_records(body: bytes, content_type: str):
+    """Records of a bulk request: a JSON array of objects, or CSV with a header row."""
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        return list(csv.DictReader(io.StringIO(text)))
+    records = json.loads(text)
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of records")
+    return records
+
+
+def _validate_bulk_record(record):
+    """("baseline", OptimizeBaselineQuery) or ("measure", (PredictInput, scenario)); raises ValidationError."""
+    if "compressionTech" in record or "model_name" in record:
+        return "baseline", OptimizeBaselineQuery.model_validate(record)
+    query = PredictInput.model_validate(record)
+    return "measure", (query, _scenario(query))
+
+
+def _evaluate_baselines(queries):
+    results = []
+    for query in queries:
+        try:
+            results.append({"result": optimize_baseline(query)})
+        except KeyError as e:
+            results.append({"error": f"Unknown model/compression technique: {e}"})
+    return results
+
+
+async def _run_waiting(run, fn, *args):
+    # inside a stream the 503 can't be sent any more, so wait for capacity instead
+    while True:
+        try:
+            return await run(fn, *args)
+        except ExecutorSaturated:
+            await asyncio.sleep(0.05)
+
+
+async def _evaluate_measures(scenarios, quantiles, pricing):
+    """evaluate_candidates results for `scenarios`, with the exception in place of the result of a scenario
+    that fails. A failing batch is evaluated again one scenario at a time, so only the failing ones error."""
+    try:
+        return await _run_waiting(run_inference, evaluate_candidates, scenarios, quantiles, pricing)
+    except Exception as e:
+        if len(scenarios) == 1:
+            return [e]
+    evaluated = await asyncio.gather(*(_evaluate_measures([scenario], quantiles, pricing) for scenario in scenarios))
+    return [result for [result] in evaluated]
+
+
+async def _evaluate_bulk_batch(batch):
+    """Evaluate one batch of (index, kind, query) and return its NDJSON lines in input order."""
+    measure = [(index, query) for index, kind, query in batch if kind == "measure"]
+    baseline = [(index, query) for index, kind, query in batch if kind == "baseline"]
+    results = {
+        index: {"index": index, "error": errors}
+        for index, kind, errors in batch if kind == "invalid"
+    }
+    # one evaluate_candidates call per (quantiles, pricing) in the batch, as /api/measure evaluates them
+    groups = {}
+    for index, (query, scenario) in measure:
+        quantiles = _quantiles(query)
+        groups.setdefault((quantiles and tuple(quantiles), query.pricing), []).append((index, scenario))
+    for (quantiles, pricing), group in groups.items():
+        evaluated = await _evaluate_measures([scenario for _, scenario in group], quantiles, pricing)
+        for (index, _), result in zip(group, evaluated):
+            if isinstance(result, Exception):
+                results[index] = {"index": index, "type": "measure", "error": f"{type(result).__name__}: {result}"}
+            else:
+                results[index] = {"index": index, "type": "measure", "result": _format_candidate(result)}
+    if baseline:
+        evaluated = await _run_waiting(run_io, _evaluate_baselines, [query for _, query in baseline])
+        for (index, _), result in zip(baseline, evaluated):
+            results[index] = {"index": index, "type": "baseline", **result}
+    return "".join(json.dumps(results[index], default=str) + "\n" for index, _, _ in batch)
+
+
+@app.post("/api/bulk/evaluate")
+async def bulkEvaluate(request: Request):
+    """
+    Evaluate many PredictInput / OptimizeBaselineQuery records (JSON array, or CSV with
+    Content-Type text/csv) and stream one NDJSON line per record, batch by batch, in input order.
+    Records with "model_name"/"compressionTech" are baseline queries, the rest measure queries, which
+    take "uncertainty", "quantiles" and "pricing" like /api/measure. Each record is validated on its own,
+    and a record that fails validation or evaluation gets an "error" line without affecting the others.
+    """
+    try:
+        records = _parse_bulk_records(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse records: {e}")
+    executor.inference_executor.ensure_capacity()
+
+    async def stream():
+        items = []
+        for index, record in enumerate(records):
+            try:
+                items.append((index, *_validate_bulk_record(record)))
+            except ValidationError as e:
+                items.append((index, "invalid", e.errors(include_url=False)))
+            except TypeError as e:
+                items.append((index, "invalid", str(e)))
+        batches = [items[i:i + BULK_BATCH_SIZE] for i in range(0, len(items), BULK_BATCH_SIZE)]
+        # keep as many batches in flight as there are inference workers, emit them in order
+        window = max(executor.inference_executor.max_workers, 1)
+        pending = deque()
+        for batch in batches:
+            pending.append(asyncio.ensure_future(_evaluate_bulk_batch(batch)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class MeasurementIngest(BaseModel):
+    # rows with the 19 model features and PUE, keyed by their PUE_data.csv column names
+    measurements: List[Dict[str, float]]
+    steps: int = NUM_UPDATE_STEPS
+
+@app.post("/api/ingest/measurements")
+async def ingestMeasurements(input_data: MeasurementIngest):
+    """Append new PUE measurements and update the BNN posterior from its current state."""
+    if not 1 <= input_data.steps <= 10 * NUM_UPDATE_STEPS:
+        raise HTTPException(status_code=400, detail=f"steps must be between 1 and {10 * NUM_UPDATE_STEPS}")
+    try:
+        summary = await run_io(update_posterior, input_data.measurements, input_data.steps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "ingested": summary["ingested"],
+        "trainedRows": summary["trained_rows"],
+        "steps": summary["steps"],
+        "loss": summary["loss"],
+        "posteriorFingerprint": summary["fingerprint"],
+    }
+
+@app.get("/api/executor/stats")
+async def getExecutorStats():
+    # queue depth and saturation of the io thread pool and the inference process pool
+    return executor.stats()
+
+
+@app.get("/api/catalog/fallbacks")
+async def getCatalogFallbacks():
+    # hardware names this worker resolved by fuzzy match or priced at the dataset averages
+    return catalog.report()
+
+
+def _format_effect(feature, effect):
+    formatted = {
+        "feature": feature,
+        "ate": {name: round(value, 4) for name, value in effect.items()
+                if name not in ("per_unit", "subset", "placebo")},
+        "atePerUnit": effect["per_unit"],
+        "subset": {"min": round(effect["subset"]["min"], 4), "max": round(effect["subset"]["max"], 4),
+                   "passed": effect["subset"]["passed"]},
+    }
+    if "placebo" in effect:
+        formatted["placebo"] = {name: value if name == "passed" else round(value, 4)
+                                for name, value in effect["placebo"].items()}
+    return formatted
+
+@app.get("/api/causal/ate")
+async def getAverageTreatmentEffects(placebo: bool = False, refresh: bool = False):
+    """ATE of every model feature on PUE (per standard deviation), cached per dataset."""
+    if placebo:
+        # the placebo tests train one posterior per feature in the inference pool
+        executor.inference_executor.ensure_capacity()
+    effects = await run_io(causal_effects.estimate, placebo=placebo, refresh=refresh)
+    return {
+        "datasetHash": effects["dataset"],
+        "cached": effects["cached"],
+        "rows": effects["rows"],
+        "posteriorSamples": effects["samples"],
+        "effects": [_format_effect(feature, effect) for feature, effect in effects["effects"].items()],
+    }
+
+
+def _executor_metrics():
+    pools = executor.stats()
+    lines = []
+    for field, kind, help in [
+        ("workers", "gauge", "Worker threads/processes of the executor."),
+        ("in_flight", "gauge", "Tasks running in the executor."),
+        ("queue_depth", "gauge", "Tasks waiting for a worker."),
+        ("saturation", "gauge", "Admitted tasks as a fraction of the executor's capacity."),
+        ("submitted", "counter", "Tasks admitted to the executor."),
+        ("completed", "counter", "Tasks finished by the executor."),
+        ("rejected", "counter", "Tasks rejected because the executor was saturated."),
+    ]:
+        name = f"eave_executor_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{executor="{pool}"}} {stats[field]}' for pool, stats in pools.items()]
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format: span and request histograms, pipeline events, executor state
+    return PlainTextResponse(telemetry.render() + _executor_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
@@ -0,0 +1,63 @@
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+
+# the API is imported as the top-level package "api", as uvicorn does when started in eave-api/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# callers pass the selected_countries keys ("germany") and their capitalized form ("Germany")
+COUNTRIES = [country for name in ("austria", "france", "germany", "italy", "netherlands", "poland", "usa")
+             for country in (name, name.capitalize())]
+
+
+def _write_forecast_models(directory):
+    """Small linear stand-ins for the forecast models, which are Git LFS objects that may not be checked out."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2023-01-01", "2026-12-31", periods=len(COUNTRIES) * 4)
+    countries = np.resize(COUNTRIES, len(dates))
+    target = rng.uniform(50, 400, len(dates))
+
+    us_price = LinearRegression().fit(np.column_stack([dates.year, dates.month]), rng.uniform(10, 20, len(dates)))
+    joblib.dump(us_price, os.path.join(directory, "us_energy_price_model.pkl"))
+
+    label_encoder = LabelEncoder().fit(COUNTRIES)
+    features = np.column_stack([dates.year, dates.month, dates.day, label_encoder.transform(countries)])
+    with open(os.path.join(directory, "daily_energy_price_model.pkl"), "wb") as f:
+        pickle.dump((LinearRegression().fit(features, target), label_encoder), f)
+
+    one_hot = OneHotEncoder(sparse_output=False).fit(np.array(COUNTRIES)[:, None])
+    features = pd.concat([
+        pd.DataFrame({"Year": dates.year, "Month": dates.month, "Day": dates.day}),
+        pd.DataFrame(one_hot.transform(countries[:, None]), columns=one_hot.get_feature_names_out(["Country"])),
+    ], axis=1)
+    with open(os.path.join(directory, "carbon_intensity_rf.pkl"), "wb") as f:
+        pickle.dump((LinearRegression().fit(features, target), one_hot), f)
+
+
+def pytest_configure(config):
+    # an environment variable rather than a monkeypatch, so the spawned inference workers load them too
+    config.forecast_model_dir = tempfile.mkdtemp(prefix="eave-forecast-models-")
+    _write_forecast_models(config.forecast_model_dir)
+    os.environ["EAVE_FORECAST_MODEL_DIR"] = config.forecast_model_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.forecast_model_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A TestClient of the app, started (datasets, forecast models, inference pool) once per test session."""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        yield client
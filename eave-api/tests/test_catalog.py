@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from api import catalog
+from api.catalog import HardwareCatalog, model_number, normalize_name
+
+
+@pytest.fixture
+def processors():
+    return HardwareCatalog("processor", {
+        "tdp": ({
+            "AMD EPYC 9654 96-Core Processor": 360.0,
+            "AMD EPYC 9124 16-Core Processor": 200.0,
+            "Intel(R) Xeon(R) Platinum 8480+": 350.0,
+            "INTEL(R) XEON(R) PLATINUM 8592+": 350.0,
+        }, catalog.DEFAULT_TDP_PROC),
+        "cores_per_processor": ({
+            "AMD EPYC 9654 96-Core Processor": 96,
+            "Intel(R) Xeon(R) Platinum 8592+": 64,
+        }, catalog.DEFAULT_CORES_PER_PROCESSOR),
+    })
+
+
+def test_normalize_name_drops_spelling_variants():
+    assert normalize_name("Intel(R) Xeon(R) Platinum 8480+ CPU @ 2.00GHz") == "INTEL XEON PLATINUM 8480+"
+    assert normalize_name("AMD EPYC 9654 96-Core Processor") == normalize_name("amd epyc 9654")
+
+
+def test_model_number():
+    assert model_number("AMD EPYC 9554 64-Core Processor") == (frozenset({"9554"}), 64)
+    assert model_number("NVIDIA H100-SXM-80GB") == (frozenset({"H100", "80GB"}), None)
+
+
+def test_exact_and_normalized(processors):
+    assert processors.resolve("AMD EPYC 9654 96-Core Processor").method == "exact"
+    resolution = processors.resolve("Intel Xeon Platinum 8592+ Processor")
+    assert (resolution.method, resolution.entry) == ("normalized", "INTEL(R) XEON(R) PLATINUM 8592+")
+    # spellings of one model are one entry, with the fields of all of them
+    assert processors.value("Intel(R) Xeon(R) Platinum 8592+", "cores_per_processor") == 64
+    assert processors.value("INTEL(R) XEON(R) PLATINUM 8592+", "tdp") == 350.0
+
+
+def test_fuzzy_match_of_the_same_model(processors):
+    resolution = processors.resolve("Intel Xeon Platinum 8480+ CPU")
+    assert (resolution.method, resolution.entry) == ("fuzzy", "Intel(R) Xeon(R) Platinum 8480+")
+    assert "Intel Xeon Platinum 8480+ CPU" in processors.report()["fuzzy"]
+
+
+@pytest.mark.parametrize("name", [
+    "AMD EPYC 9554 64-Core Processor",      # other model number and core count
+    "AMD EPYC 9654X 96-Core Processor",     # other model number
+    "AMD EPYC 9654 Processor v2",           # extra model token
+])
+def test_near_miss_skus_fall_back(processors, name):
+    resolution = processors.resolve(name)
+    assert (resolution.method, resolution.entry) == ("fallback", None)
+    assert processors.value(name, "tdp") == catalog.DEFAULT_TDP_PROC
+    assert processors.value(name, "cores_per_processor") == catalog.DEFAULT_CORES_PER_PROCESSOR
+    report = processors.report()
+    assert name in report["fallbacks"]
+    assert report["rejected"][name]["closest"].startswith("AMD EPYC")
+
+
+def test_near_miss_in_the_shipped_catalogs():
+    catalog.clear()
+    assert catalog.processors.resolve("AMD EPYC 9554 64-Core Processor").method == "fallback"
+    assert catalog.accelerators.resolve("NVIDIA A100-SXM-80GB").method == "fallback"
+    assert catalog.accelerators.resolve("NVIDIA L40S GPU").entry == "NVIDIA L40S"
+
+
+def test_lookup_is_batched_and_missing_fields_are_reported(processors):
+    values = processors.lookup(["AMD EPYC 9654 96-Core Processor", "AMD EPYC 9124 16-Core Processor", "unknown"],
+                               "cores_per_processor")
+    np.testing.assert_array_equal(values, [96, catalog.DEFAULT_CORES_PER_PROCESSOR, catalog.DEFAULT_CORES_PER_PROCESSOR])
+    report = processors.report()
+    assert report["missingFields"]["cores_per_processor"] == {"AMD EPYC 9124 16-Core Processor": 1}
+    assert report["fallbacks"] == {"unknown": 1}
+    processors.clear()
+    assert processors.report()["fallbacks"] == {}
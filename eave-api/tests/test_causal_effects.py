@@ -0,0 +1,90 @@
+import numpy as np
+import pyro
+import pytest
+
+from api import causal_effects, model
+from api.inference import PosteriorSampleBank
+
+
+def _linear_bank(w2):
+    """A bank whose network is linear on [-1, 1]^D: identity first layer, biases keeping ReLU active."""
+    samples, dimensions = w2.shape
+    return PosteriorSampleBank(
+        w1=np.repeat(np.eye(dimensions)[None], samples, axis=0),
+        b1=np.full((samples, dimensions), 10.0),
+        w2=w2,
+        b2=np.zeros(samples),
+        sigma=np.ones(samples),
+    )
+
+
+@pytest.mark.parametrize("max_pass_elements", [causal_effects.MAX_PASS_ELEMENTS, 1])
+def test_intervention_effects_of_a_linear_network(monkeypatch, max_pass_elements):
+    monkeypatch.setattr(causal_effects, "MAX_PASS_ELEMENTS", max_pass_elements)
+    w2 = np.array([[1.0, -2.0, 0.5], [3.0, 0.0, -1.0]])
+    X = np.random.default_rng(0).uniform(-1, 1, size=(50, 3)).astype(np.float32)
+    per_sample, per_row = causal_effects._intervention_effects(_linear_bank(w2), X, np.array([0, 1, 2]))
+    np.testing.assert_allclose(per_sample, w2, rtol=1e-5)
+    np.testing.assert_allclose(per_row, np.repeat(w2.mean(axis=0)[:, None], 50, axis=1), rtol=1e-5)
+
+
+def test_estimate_is_cached_per_dataset_and_settings(tmp_path):
+    causal_effects._cache.clear()
+    first = causal_effects.estimate(directory=str(tmp_path))
+    assert not first["cached"] and first["dataset"] == model.get_fingerprint()
+    assert set(first["effects"]) == set(model.features)
+    effect = first["effects"]["Cooling_Efficiency_Factor"]
+    assert effect["p5"] <= effect["p50"] <= effect["p95"] and effect["std"] > 0
+    assert {"min", "max", "passed"} <= set(effect["subset"])
+
+    assert causal_effects.estimate(directory=str(tmp_path))["cached"]
+    causal_effects._cache.clear()
+    from_file = causal_effects.estimate(directory=str(tmp_path))
+    assert from_file["cached"] and from_file["effects"] == first["effects"]
+    assert not causal_effects.estimate(directory=str(tmp_path), refresh=True)["cached"]
+    assert causal_effects.cache_key(seed=1) != causal_effects.cache_key(seed=0)
+
+
+def test_placebo_tests_are_added_to_the_cached_result(tmp_path, monkeypatch):
+    causal_effects._cache.clear()
+    ate = causal_effects.estimate(directory=str(tmp_path))["effects"]
+    calls = []
+
+    def placebo_effects(quantiles, seed, parallel):
+        calls.append(parallel)
+        # a placebo effect of 5% of the ATE passes, one of 50% with an interval excluding 0 fails
+        return {
+            feature: {"mean": factor * ate[feature]["mean"], "std": 0.0,
+                      "p5": factor * ate[feature]["mean"], "p50": factor * ate[feature]["mean"],
+                      "p95": factor * ate[feature]["mean"]}
+            for feature, factor in zip(model.features, [0.05] + [0.5] * (len(model.features) - 1))
+        }
+
+    monkeypatch.setattr(causal_effects, "placebo_effects", placebo_effects)
+    with_placebo = causal_effects.estimate(placebo=True, directory=str(tmp_path))
+    assert not with_placebo["cached"] and calls == [True]
+    placebo = {feature: effect["placebo"]["passed"] for feature, effect in with_placebo["effects"].items()}
+    assert placebo["# of Nodes"] and not placebo["Cooling_Efficiency_Factor"]
+
+    causal_effects._cache.clear()
+    assert causal_effects.estimate(placebo=True, directory=str(tmp_path))["cached"]
+    assert causal_effects.estimate(directory=str(tmp_path))["cached"]
+    assert calls == [True]
+
+
+def test_placebo_effect_leaves_the_serving_param_store_alone():
+    before = {name: value.detach().clone() for name, value in pyro.get_param_store().items()}
+    summary = causal_effects.placebo_effect(10, steps=20)
+    assert {"mean", "std", "p5", "p50", "p95"} <= set(summary)
+    after = dict(pyro.get_param_store().items())
+    assert before.keys() == after.keys()
+    assert all((before[name] == after[name].detach()).all() for name in before)
+
+
+def test_ate_route(client):
+    response = client.get("/api/causal/ate")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["datasetHash"] == model.get_fingerprint()
+    assert [effect["feature"] for effect in body["effects"]] == model.features
+    assert client.get("/api/causal/ate").json()["cached"]
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from api import columnar
+
+DF = pd.DataFrame({
+    "Datetime (UTC)": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+    "Country": ["Germany", None, "France"],
+    "Carbon Intensity gCO₂eq/kWh (direct)": [350.5, 120.0, 60.25],
+    "# of Nodes": [1, 2, 4],
+})
+
+
+def test_normalize_columns():
+    assert columnar.normalize_column("Carbon Intensity gCO₂eq/kWh (direct)") == "carbon_intensity_gco2eq_kwh_direct"
+    assert columnar.normalize_column("Börsenpreis ∅ €/MWh") == "boersenpreis_avg_eur_mwh"
+    assert columnar.normalize_column("# of Nodes") == "num_of_nodes"
+    assert columnar.normalize_columns(["A b", "a-b", "a_b", "?"]) == ["a_b", "a_b_2", "a_b_3", "column"]
+
+
+def test_build_and_load_round_trip(tmp_path):
+    source = tmp_path / "source.csv"
+    DF.to_csv(source, index=False)
+    meta = columnar.build_table(DF, "table", str(source), directory=str(tmp_path))
+    assert meta["rows"] == 3
+    assert [column["kind"] for column in meta["columns"]] == ["datetime", "category", "numeric", "numeric"]
+
+    loaded = columnar.load_table("table", str(source), directory=str(tmp_path))
+    assert list(loaded.columns) == list(DF.columns)
+    for column in DF.columns:
+        assert loaded[column].astype(object).tolist() == DF[column].astype(object).tolist(), column
+
+    subset = columnar.load_table("table", str(source), columns=["# of Nodes", "Country"], directory=str(tmp_path))
+    assert list(subset.columns) == ["# of Nodes", "Country"]
+    normalized = columnar.load_table("table", str(source), columns=["num_of_nodes"], original_names=False,
+                                     directory=str(tmp_path))
+    assert normalized["num_of_nodes"].tolist() == [1, 2, 4]
+
+
+def test_a_changed_source_makes_the_table_stale(tmp_path):
+    source = tmp_path / "source.csv"
+    DF.to_csv(source, index=False)
+    columnar.build_table(DF, "table", str(source), directory=str(tmp_path))
+    meta = columnar.read_meta("table", str(tmp_path))
+
+    # touched without changing its contents: still fresh by hash
+    os.utime(source, ns=(0, 0))
+    assert columnar.is_fresh(meta, str(source))
+
+    DF.head(2).to_csv(source, index=False)
+    assert not columnar.is_fresh(meta, str(source))
+    assert columnar.load_table("table", str(source), directory=str(tmp_path)) is None
+    assert not columnar.is_fresh(None, str(source))
+    assert not columnar.is_fresh({**meta, "format_version": columnar.FORMAT_VERSION + 1}, str(source))
+
+
+def test_append_parts(tmp_path):
+    directory = str(tmp_path)
+    assert columnar.read_manifest("parts", directory) is None
+    assert columnar.load_parts("parts", directory=directory) is None
+
+    columnar.append_part(DF.head(2), "parts", source="a.csv", sources={"hash-a": {"file": "a.csv"}}, directory=directory)
+    manifest = columnar.append_part(DF.tail(1), "parts", source="b.csv", directory=directory)
+    assert [(part["name"], part["rows"], part["source"]) for part in manifest["parts"]] == \
+        [("part-00000", 2, "a.csv"), ("part-00001", 1, "b.csv")]
+    assert manifest["sources"] == {"hash-a": {"file": "a.csv"}}
+
+    manifest = columnar.record_sources("parts", {"hash-b": {"file": "b.csv"}}, directory=directory)
+    assert len(manifest["parts"]) == 2 and set(manifest["sources"]) == {"hash-a", "hash-b"}
+
+    assert [len(part) for part in columnar.iter_parts("parts", directory=directory)] == [2, 1]
+    loaded = columnar.load_parts("parts", columns=["Carbon Intensity gCO₂eq/kWh (direct)"], directory=directory)
+    np.testing.assert_array_equal(loaded["Carbon Intensity gCO₂eq/kWh (direct)"], DF["Carbon Intensity gCO₂eq/kWh (direct)"])
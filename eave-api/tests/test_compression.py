@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from api import compression
+from api.optimizer import pareto_mask
+
+HARDWARE = [
+    {"system_name": "ASUSTeK ESC8000A-E12 (8x H100-PCIe-80GB, TensorRT)", "processor": "AMD EPYC 9654 96-Core Processor"},
+    {"system_name": "unknown system", "processor": "unknown processor", "cooling_efficiency": 0.3},
+]
+DATES = ["2024-01-15", "2024-07-15"]
+
+
+def _brute_force_mask(objectives):
+    return np.array([
+        not any((other <= row).all() and (other < row).any() for other in objectives)
+        for row in objectives
+    ])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pareto_mask_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    # few distinct values, so ties and duplicate rows are common
+    objectives = rng.integers(0, 4, size=(200, 3)).astype(float)
+    np.testing.assert_array_equal(pareto_mask(objectives), _brute_force_mask(objectives))
+
+
+def test_pareto_mask_edge_cases():
+    assert pareto_mask(np.empty((0, 3))).tolist() == []
+    assert pareto_mask([[1.0, 2.0]]).tolist() == [True]
+    # duplicates don't dominate each other
+    assert pareto_mask([[1.0, 1.0], [1.0, 1.0], [2.0, 2.0]]).tolist() == [True, True, False]
+    # a single objective keeps only its minimum (and its ties)
+    assert pareto_mask([[3.0], [1.0], [1.0], [2.0]]).tolist() == [False, True, True, False]
+    assert pareto_mask([[1.0, 3.0], [3.0, 1.0], [2.0, 2.0]]).tolist() == [True, True, True]
+
+
+def test_search_returns_the_front_of_every_candidate():
+    rows = compression.compression_rows()
+    searched = compression.search(HARDWARE, DATES, locations=["germany", "France"], rng=np.random.default_rng(0))
+    assert searched["evaluated"] == len(rows) * len(HARDWARE) * 2 * len(DATES)
+    assert searched["feasible"] == searched["evaluated"]
+    front = searched["front"]
+    assert front and [candidate["cost"] for candidate in front] == sorted(candidate["cost"] for candidate in front)
+    objectives = np.array([[direction * candidate[name] for name, direction in compression.OBJECTIVES.items()]
+                           for candidate in front])
+    assert pareto_mask(objectives).all()
+    assert {candidate["location"] for candidate in front} <= {"germany", "France"}
+
+
+def test_search_constraints():
+    searched = compression.search(HARDWARE, DATES, locations=["germany"], min_performance=80, max_cost=20000,
+                                  rng=np.random.default_rng(0))
+    assert searched["feasible"] < searched["evaluated"]
+    assert all(candidate["performance"] >= 80 and candidate["cost"] <= 20000 for candidate in searched["front"])
+    impossible = compression.search(HARDWARE, DATES, locations=["germany"], min_performance=101)
+    assert (impossible["feasible"], impossible["front"]) == (0, [])
+
+
+def test_runtime_pricing_prices_each_run_over_its_runtime():
+    daily = compression.search(HARDWARE[:1], DATES[:1], locations=["germany"], rng=np.random.default_rng(0))
+    runtime = compression.search(HARDWARE[:1], DATES[:1], locations=["germany"], pricing="runtime",
+                                 rng=np.random.default_rng(0))
+    assert runtime["evaluated"] == daily["evaluated"]
+    assert [c["co2_equivalents"] for c in runtime["front"]] != [c["co2_equivalents"] for c in daily["front"]]
+
+
+@pytest.mark.parametrize("arguments", [
+    {"locations": ["mars"]},
+    {"pricing": "hourly"},
+])
+def test_search_rejects_invalid_arguments(arguments):
+    with pytest.raises(ValueError):
+        compression.search(HARDWARE, DATES, **arguments)
+
+
+def test_search_bounds_the_grid(monkeypatch):
+    monkeypatch.setattr(compression, "MAX_CANDIDATES", 10)
+    with pytest.raises(ValueError):
+        compression.search(HARDWARE, DATES)
+    assert compression.search(HARDWARE, DATES, techniques=["no such technique"])["evaluated"] == 0
+
+
+def test_pareto_route(client):
+    body = {"hardware": HARDWARE, "dates": DATES, "locations": ["germany"], "min_performance": 80}
+    response = client.post("/api/optimize/pareto", json=body)
+    assert response.status_code == 200, response.text
+    assert all(candidate["performance"] >= 80 for candidate in response.json()["pareto"])
+    assert client.post("/api/optimize/pareto", json={**body, "locations": ["mars"]}).status_code == 400
+    assert client.post("/api/optimize/pareto", json={**body, "dates": ["15.01.2024"]}).status_code == 422
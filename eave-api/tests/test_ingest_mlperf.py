@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import columnar, datastore, ingest_mlperf
+from api.ingest_mlperf import MLPERF_TABLE, RESULT_KEY, SEASON_MONTHS
+
+
+@pytest.fixture
+def export(tmp_path):
+    """The first results of the bundled export, in its format (UTF-16, tab-separated, duplicated columns)."""
+    rows = next(pd.read_csv(datastore.MLPERF_CSV_filepath, chunksize=6, **datastore.DATASETS["mlperf"]["read_csv"]))
+    rows["Valid / Invalid"] = rows["Valid / Invalid"].astype(object)
+    rows.loc[4, "Valid / Invalid"] = "invalid"
+    rows.loc[5, "Processor"] = None
+    rows.loc[5, "Processor.1"] = None
+    filepath = tmp_path / "export.csv"
+    rows.to_csv(filepath, index=False, **datastore.DATASETS["mlperf"]["read_csv"])
+    return filepath
+
+
+def test_merge_duplicate_columns():
+    chunk = pd.DataFrame({"Processor": [None, "a"], "Processor.1": ["b", "c"], "Version 1.1": [1, 2]})
+    merged = ingest_mlperf.merge_duplicate_columns(chunk)
+    assert list(merged.columns) == ["Processor", "Version 1.1"]
+    assert merged["Processor"].tolist() == ["b", "a"]
+
+
+def test_clean_drops_invalid_and_incomplete_results():
+    chunk = pd.DataFrame({
+        "System Name (click + for details)": ["a", "b", "c", "d"],
+        "# of Nodes": [1, 1, 1, 1],
+        "Processor": ["p", "p", None, "p"],
+        "Accelerator": ["x", "x", "x", None],
+        "# of Accelerators": [8, 8, 8, 0],
+        "Model MLC": ["m"] * 4,
+        "Host Processor Core Count": [32] * 4,
+        "Avg. Result at System Name": [1.0] * 4,
+        "Valid / Invalid": [None, "Invalid ", None, None],
+    })
+    cleaned = next(ingest_mlperf.clean([chunk]))
+    assert cleaned["System Name"].tolist() == ["a", "d"]
+    assert cleaned["Accelerator"].tolist() == ["x", "CPU-only"]
+
+
+def test_ingest_appends_one_row_per_season(tmp_path, export):
+    directory = str(tmp_path / "columnar")
+    report = ingest_mlperf.ingest([str(export)], chunk_rows=2, seed=0, directory=directory)
+    stats = report["files"][str(export)]
+    assert stats == {"results": 4, "duplicates": 0, "rows": 4 * len(SEASON_MONTHS), "parts": 2}
+
+    table = columnar.load_parts(MLPERF_TABLE, directory=directory)
+    assert len(table) == stats["rows"]
+    assert (table.groupby(RESULT_KEY, observed=True)["Season"].nunique() == len(SEASON_MONTHS)).all()
+    assert (table["Timestamp"].dt.year == ingest_mlperf.DEFAULT_YEAR).all()
+    assert set(table["Source"]) == {"export.csv"}
+    np.testing.assert_allclose(table["PUE"], table["E_Total_Facility_kWh"] / table["E_IT_Total_kWh"])
+    assert (table["PUE"] > 1).all()
+
+
+def test_reingesting_skips_known_files_and_results(tmp_path, export):
+    directory = str(tmp_path / "columnar")
+    ingest_mlperf.ingest([str(export)], seed=0, directory=directory)
+    assert ingest_mlperf.ingest([str(export)], directory=directory)["files"][str(export)] == {"skipped": "already ingested"}
+
+    # a later export repeating the same results adds nothing
+    copy = tmp_path / "next_round.csv"
+    copy.write_bytes(export.read_bytes() + "\n".encode("utf-16-le"))
+    stats = ingest_mlperf.ingest([str(copy)], directory=directory)["files"][str(copy)]
+    assert (stats["results"], stats["duplicates"], stats["rows"]) == (4, 4, 0)
+    assert len(columnar.read_manifest(MLPERF_TABLE, directory)["sources"]) == 2
+    assert len(ingest_mlperf.ingested_keys(directory)) == 4
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+PREDICT = {
+    "system_name": "ASUSTeK ESC8000A-E12 (8x H100-PCIe-80GB, TensorRT)",
+    "processor": "AMD EPYC 9654 96-Core Processor",
+    "accelerator": "NVIDIA H100-PCIe-80GB",
+    "num_nodes": 1,
+    "num_accelerator": 8,
+    "model_mlc": "llama2-70b-99",
+    "cooling_efficiency": 0.5,
+    "date": "2024-03-01",
+    "location": "germany",
+    "task": "llm",
+}
+
+
+@pytest.mark.parametrize("search", [
+    {"step_days": 0},
+    {"horizon_days": 0},
+    {"horizon_days": 30, "step_days": 90},
+    {"horizon_days": 10_000_000, "step_days": 1},
+    {"top_k": 0},
+    {"locations": []},
+    {"locations": ["germany", "mars"]},
+    {"location": "mars"},
+])
+def test_predict_rejects_invalid_searches(client, search):
+    response = client.post("/api/predict", json={**PREDICT, **search})
+    assert response.status_code == 422, response.text
+
+
+def test_measure_rejects_unknown_location(client):
+    assert client.post("/api/measure", json={**PREDICT, "location": "mars"}).status_code == 422
+
+
+def test_predict_searches_the_given_locations(client):
+    response = client.post("/api/predict", json={**PREDICT, "locations": ["France", "poland"], "horizon_days": 90,
+                                                 "step_days": 30, "top_k": 2})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["evaluatedCandidates"] == 6
+    assert len(body["candidates"]) == 2
+    assert {candidate["location"] for candidate in body["pareto"]} <= {"France", "poland"}
+
+
+def test_measure_rejects_malformed_dates(client):
+    assert client.post("/api/measure", json={**PREDICT, "date": "01.03.2024"}).status_code == 422
+
+
+def _bulk(client, records):
+    response = client.post("/api/bulk/evaluate", json=records)
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_bulk_reports_a_malformed_date_on_its_own_line(client):
+    lines = _bulk(client, [PREDICT, {**PREDICT, "date": "2024-13-01"}, {**PREDICT, "location": "france"}])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert "result" in lines[0] and "result" in lines[2]
+    assert lines[1]["error"][0]["loc"] == ["date"]
+
+
+def test_bulk_reports_a_failing_record_on_its_own_line(client):
+    # passes validation, but evaluating it fails (pandas dates end before the year 10000)
+    lines = _bulk(client, [PREDICT, {**PREDICT, "date": "9999-01-01"}, {**PREDICT, "location": "france"}])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert "result" in lines[0] and "result" in lines[2]
+    assert "error" in lines[1] and "result" not in lines[1]
+
+
+def test_bulk_honours_uncertainty_and_pricing(client):
+    lines = _bulk(client, [
+        PREDICT,
+        {**PREDICT, "uncertainty": True, "quantiles": [0.1, 0.9]},
+        {**PREDICT, "pricing": "runtime"},
+    ])
+    daily, uncertain, runtime = (line["result"] for line in lines)
+    assert "uncertainty" not in daily
+    assert set(uncertain["uncertainty"]["pue"]) == {"mean", "std", "p10", "p90"}
+    # energy has a random UPS draw, so compare the energy prices (€/MWh) the results were priced at
+    measured = client.post("/api/measure", json={**PREDICT, "pricing": "runtime"}).json()
+    price = runtime["cost"] / runtime["totalEnergy"]
+    assert price == pytest.approx(measured["cost"] / measured["totalEnergy"], rel=1e-3)
+    assert price != pytest.approx(daily["cost"] / daily["totalEnergy"], rel=1e-3)
@@ -0,0 +1,34 @@
+import os
+import threading
+
+from api import model
+
+
+def test_save_posterior_round_trip(tmp_path):
+    filepath = str(tmp_path / "posterior.pt")
+    scaler = model._serving[0]
+    model.save_posterior(scaler, "fingerprint", filepath=filepath)
+    model.save_posterior(scaler, "fingerprint", filepath=filepath)
+    assert os.listdir(tmp_path) == ["posterior.pt"]
+
+    # the artifact holds the current param store, so restoring it leaves serving unchanged
+    restored = model.load_posterior("fingerprint", filepath=filepath)
+    assert restored is not None and (restored[2].mean_ == scaler.mean_).all()
+    assert model.load_posterior("another fingerprint", filepath=filepath) is None
+
+
+def test_update_lock_is_exclusive_across_open_files(tmp_path):
+    filepath = str(tmp_path / "update.lock")
+    acquired = threading.Event()
+
+    def update():
+        # a separate open file description, as another worker process has
+        with model._update_lock(filepath):
+            acquired.set()
+
+    with model._update_lock(filepath):
+        thread = threading.Thread(target=update)
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join()
@@ -0,0 +1,73 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from api import optimizer
+from api.mappings import selected_countries
+
+CONFIGURATION = {
+    "system_name": "ASUSTeK ESC8000A-E12 (8x H100-PCIe-80GB, TensorRT)",
+    "processor": "AMD EPYC 9654 96-Core Processor",
+    "accelerator": "NVIDIA H100-PCIe-80GB",
+    "num_nodes": 1,
+    "num_accelerator": 8,
+    "model_mlc": "llama2-70b-99",
+    "cooling_efficiency": 0.5,
+}
+
+
+def test_candidate_dates():
+    start = date(2024, 1, 1)
+    assert optimizer.candidate_dates(start) == [date(2024, 3, 31), date(2024, 6, 29), date(2024, 9, 27), date(2024, 12, 26)]
+    assert optimizer.candidate_dates(start, horizon_days=10, step_days=5) == [date(2024, 1, 6), date(2024, 1, 11)]
+    assert optimizer.candidate_dates(start, horizon_days=3, step_days=5) == []
+    with pytest.raises(ValueError):
+        optimizer.candidate_dates(start, step_days=0)
+
+
+def test_build_candidates_defaults_to_every_country():
+    candidates = optimizer.build_candidates([CONFIGURATION], [date(2024, 1, 1)])
+    assert [candidate["location"] for candidate in candidates] == list(selected_countries)
+    assert optimizer.build_candidates([CONFIGURATION], [date(2024, 1, 1)], []) == []
+
+
+def test_score_values():
+    cost, co2 = np.array([1.0, 2.0, 3.0]), np.array([30.0, 10.0, 20.0])
+    np.testing.assert_array_equal(optimizer.score_values(cost, co2, "cost"), cost)
+    np.testing.assert_array_equal(optimizer.score_values(cost, co2, "co2"), co2)
+    np.testing.assert_allclose(optimizer.score_values(cost, co2, "weighted", {"cost": 1.0, "co2": 1.0}), [1.0, 0.5, 1.5])
+    # no spread: every candidate scores 0 instead of dividing by zero
+    np.testing.assert_array_equal(optimizer.score_values(np.ones(2), np.ones(2), "weighted"), [0.0, 0.0])
+    with pytest.raises(ValueError):
+        optimizer.score_values(cost, co2, "energy")
+
+
+def test_pareto_front():
+    results = [{"cost": cost, "co2": co2} for cost, co2 in [(3, 1), (1, 3), (2, 2), (2, 3), (3, 3), (1, 4)]]
+    assert [(r["cost"], r["co2"]) for r in optimizer.pareto_front(results)] == [(1, 3), (2, 2), (3, 1)]
+    assert optimizer.pareto_front([]) == []
+
+
+def test_optimize_serially():
+    optimized = optimizer.optimize([CONFIGURATION], date(2024, 1, 1), locations=["germany", "france"],
+                                   horizon_days=180, step_days=90, top_k=2, parallel=False)
+    assert optimized["evaluated"] == 4
+    costs = [result["cost"] for result in optimized["top_k"]]
+    assert len(costs) == 2 and costs == sorted(costs)
+    assert {"pue", "energy", "cost", "co2", "throughput_confidence"} <= set(optimized["top_k"][0])
+    with pytest.raises(ValueError):
+        optimizer.optimize([CONFIGURATION], date(2024, 1, 1), locations=["germany"], pricing="weekly", parallel=False)
+
+
+def test_optimize_without_candidates():
+    assert optimizer.optimize([CONFIGURATION], date(2024, 1, 1), locations=[], parallel=False) == \
+        {"top_k": [], "pareto": [], "evaluated": 0}
+
+
+def test_optimize_bounds_the_search(monkeypatch):
+    monkeypatch.setattr(optimizer, "MAX_CANDIDATES", 7)
+    with pytest.raises(ValueError):
+        optimizer.optimize([CONFIGURATION], date(2024, 1, 1), horizon_days=180, step_days=90, parallel=False)
+    assert optimizer.optimize([CONFIGURATION], date(2024, 1, 1), horizon_days=90, step_days=90,
+                              parallel=False)["evaluated"] == len(selected_countries)
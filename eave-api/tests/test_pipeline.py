@@ -0,0 +1,29 @@
+from api import catalog, pipeline
+from api.pipeline import PUERequest
+
+PROCESSOR = "Not A Real Processor 1234"
+
+
+def _request(**changes):
+    fields = {
+        "system_name": "ASUSTeK ESC8000A-E12 (8x H100-PCIe-80GB, TensorRT)",
+        "processor": PROCESSOR,
+        "accelerator": "NVIDIA H100-PCIe-80GB",
+        "num_nodes": 1,
+        "num_accelerator": 8,
+        "model_mlc": "llama2-70b-99",
+        "cooling_efficiency": 0.5,
+        "date": "2024-03-01",
+        "location": "germany",
+    }
+    return PUERequest(**{**fields, **changes})
+
+
+def test_hardware_cache_hits_count_their_catalog_fallbacks():
+    pipeline.hardware_cache.clear()
+    catalog.clear()
+    first = pipeline.hardware_stage([_request()])
+    # one cache miss, then two hits of the same hardware
+    second = pipeline.hardware_stage([_request(date="2024-06-01"), _request(location="france")])
+    assert catalog.report()["processor"]["fallbacks"] == {PROCESSOR: 3}
+    assert (second["tdp_proc"] == first["tdp_proc"][0]).all()
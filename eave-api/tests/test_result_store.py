@@ -0,0 +1,68 @@
+import pytest
+
+from api import result_store
+from api.result_store import FileResultStore, InMemoryResultStore, ResultStore, create_result_store, new_measurement_id
+
+
+def test_incomplete_backends_fail_when_created():
+    class GetOnly(ResultStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        ResultStore()
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryResultStore(ttl_seconds=60, max_entries=2)
+    return FileResultStore(str(tmp_path), ttl_seconds=60)
+
+
+def test_put_get_delete(store):
+    key = new_measurement_id()
+    assert store.get(key) is None
+    store.put(key, {"cost": 1.5, "measureDate": "2024-03-01"})
+    assert store.get(key) == {"cost": 1.5, "measureDate": "2024-03-01"}
+    store.delete(key)
+    store.delete(key)
+    assert store.get(key) is None
+
+
+def test_expired_results_are_gone(store):
+    key = new_measurement_id()
+    store.ttl_seconds = -1
+    store.put(key, {"cost": 1.0})
+    assert store.get(key) is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemoryResultStore(ttl_seconds=60, max_entries=2)
+    store.put("a", 1)
+    store.put("b", 2)
+    store.get("a")
+    store.put("c", 3)
+    assert (store.get("a"), store.get("b"), store.get("c")) == (1, None, 3)
+    assert len(store) == 2
+
+
+def test_file_store_refuses_keys_outside_its_directory(tmp_path):
+    store = FileResultStore(str(tmp_path / "results"))
+    assert store.get("../secrets") is None
+    with pytest.raises(KeyError):
+        store.put("../secrets", {})
+    assert not (tmp_path / "secrets.json").exists()
+
+
+def test_create_result_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("EAVE_RESULT_STORE", "file")
+    monkeypatch.setenv("EAVE_RESULT_STORE_DIR", str(tmp_path))
+    assert isinstance(create_result_store(), FileResultStore)
+    monkeypatch.setenv("EAVE_RESULT_STORE", "redis")
+    with pytest.raises(ValueError):
+        create_result_store()
+    monkeypatch.delenv("EAVE_RESULT_STORE")
+    assert isinstance(result_store.create_result_store(), InMemoryResultStore)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from api.scheduler import _select, _window_sums, schedule
+
+CONFIGURATION = {
+    "system_name": "ASUSTeK ESC8000A-E12 (8x H100-PCIe-80GB, TensorRT)",
+    "processor": "AMD EPYC 9654 96-Core Processor",
+    "accelerator": "NVIDIA H100-PCIe-80GB",
+    "num_nodes": 1,
+    "num_accelerator": 8,
+    "model_mlc": "llama2-70b-99",
+    "cooling_efficiency": 0.5,
+}
+
+
+def test_window_sums_of_a_step_function():
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_allclose(_window_sums(values, np.array([0.0, 1.0, 0.5]), 2.0), [3.0, 5.0, 4.0])
+    np.testing.assert_allclose(_window_sums(values, np.array([1.5]), 0.5), [1.0])
+
+
+def test_select_keeps_windows_apart_per_location():
+    locations = ["germany", "germany", "france", "germany"]
+    starts = np.array([0.0, 1.0, 1.0, 30.0])
+    assert _select([0, 1, 2, 3], locations, starts, 3, separation_hours=24) == [0, 2, 3]
+
+
+@pytest.mark.parametrize("locations", [["mars"], ["germany", "Atlantis"], []])
+def test_unknown_or_no_locations_are_rejected(locations):
+    with pytest.raises(ValueError):
+        schedule(CONFIGURATION, "2024-03-01", "2024-06-01", locations=locations)
+
+
+def test_schedule_ranks_windows_by_cost():
+    scheduled = schedule(CONFIGURATION, "2024-01-01", "2025-12-01", locations=["germany", "France"], top_k=3,
+                         step_hours=24)
+    costs = [window["cost"] for window in scheduled["windows"]]
+    assert len(costs) == 3 and costs == sorted(costs)
+    assert {window["location"] for window in scheduled["windows"]} <= {"germany", "France"}
+
+
+def test_schedule_route_returns_400_for_unknown_locations(client):
+    body = {**CONFIGURATION, "earliest_start": "2024-01-01", "deadline": "2025-12-01", "step_hours": 24}
+    response = client.post("/api/schedule", json={**body, "locations": ["mars"]})
+    assert response.status_code == 400
+    assert "mars" in response.json()["detail"]
+    assert client.post("/api/schedule", json={**body, "deadline": "soon"}).status_code == 400
+    assert client.post("/api/schedule", json=body).status_code == 200
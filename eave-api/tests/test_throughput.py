@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import datastore, throughput
+from api.throughput import DEFAULT_AVG_RESULT, ThroughputEstimator
+
+PROCESSOR = "AMD EPYC 9654 96-Core Processor"
+ACCELERATOR = "NVIDIA H100-PCIe-80GB"
+
+
+def _keys(rows):
+    return pd.MultiIndex.from_tuples(rows, names=datastore.SYSTEM_KEY_COLUMNS)
+
+
+@pytest.fixture
+def estimator():
+    # throughput of model "a" is 100 per accelerator on every system; model "b" has a single row
+    rows = [(f"system {n}", 1, PROCESSOR, ACCELERATOR, n, 96, "a") for n in (1, 2, 4, 8)]
+    rows.append(("system b", 1, PROCESSOR, ACCELERATOR, 8, 96, "b"))
+    return ThroughputEstimator(_keys(rows), np.array([100.0, 200.0, 400.0, 800.0, 5.0]))
+
+
+def _estimate(estimator, *configurations):
+    return estimator.estimate(*(np.array(values, dtype=object) for values in zip(*configurations)), count=False)
+
+
+def test_exact_rows_are_measured(estimator):
+    values, confidence = _estimate(estimator, ("system 4", 1, PROCESSOR, ACCELERATOR, 4, 96, "a"))
+    assert values.tolist() == [400.0] and confidence.tolist() == [1.0]
+
+
+def test_unseen_configurations_scale_with_accelerators(estimator):
+    values, confidence = _estimate(estimator,
+                                   ("new", 1, PROCESSOR, ACCELERATOR, 16, 96, "a"),
+                                   ("new", 2, PROCESSOR, ACCELERATOR, 8, 96, "a"))
+    # every neighbour has 100 per accelerator, so the estimate is exact whatever their weights
+    np.testing.assert_allclose(values, [1600.0, 1600.0])
+    assert ((0 < confidence) & (confidence < 1)).all()
+
+
+def test_a_single_row_model_is_its_only_neighbour(estimator):
+    values, confidence = _estimate(estimator, ("new", 1, PROCESSOR, ACCELERATOR, 4, 96, "b"))
+    np.testing.assert_allclose(values, [2.5])
+    assert 0 < confidence[0] < 1
+
+
+def test_confidence_drops_with_distance(estimator):
+    _, confidence = _estimate(estimator,
+                              ("new", 1, PROCESSOR, ACCELERATOR, 8, 128, "a"),
+                              ("new", 1, PROCESSOR, ACCELERATOR, 8, 1024, "a"))
+    assert confidence[0] > confidence[1]
+
+
+def test_unknown_models_keep_the_dataset_average(estimator):
+    values, confidence = _estimate(estimator, ("new", 1, PROCESSOR, ACCELERATOR, 8, 96, "unknown"))
+    assert values.tolist() == [DEFAULT_AVG_RESULT] and confidence.tolist() == [0.0]
+
+
+def test_mixed_batches_keep_their_order(estimator):
+    values, confidence = _estimate(estimator,
+                                   ("new", 1, PROCESSOR, ACCELERATOR, 8, 96, "unknown"),
+                                   ("system 2", 1, PROCESSOR, ACCELERATOR, 2, 96, "a"),
+                                   ("new", 1, PROCESSOR, ACCELERATOR, 16, 96, "a"))
+    np.testing.assert_allclose(values, [DEFAULT_AVG_RESULT, 200.0, 1600.0])
+    assert confidence[0] == 0 and confidence[1] == 1 and 0 < confidence[2] < 1
+
+
+def test_estimate_one_matches_the_batch():
+    keys, values = datastore.get_avg_result_arrays()
+    measured = keys[0]
+    assert throughput.estimate_one(*measured) == (values[0], 1.0)
+    unseen = ("not a system", *measured[1:4], measured[4] * 2, *measured[5:])
+    batch_values, batch_confidence = throughput.estimate_throughput(*([value] for value in unseen))
+    assert throughput.estimate_one(*unseen) == pytest.approx((batch_values[0], batch_confidence[0]))
+
+
+def test_the_estimator_is_rebuilt_when_the_data_is_reloaded(monkeypatch):
+    rows = [("system", 1, PROCESSOR, ACCELERATOR, 8, 96, "a")]
+    monkeypatch.setattr(datastore, "get_avg_result_arrays", lambda source=(_keys(rows), np.array([42.0])): source)
+    assert throughput.get_estimator().values.tolist() == [42.0]
+    monkeypatch.undo()
+    assert len(throughput.get_estimator().values) == len(datastore.get_avg_result_arrays()[1])
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import datastore, telemetry, timeseries
+from api.costs import calculate_cost, calculate_co2_equivalents
+
+
+def _csv_intensities(country, start, days):
+    df = datastore.get_carbon_intensity_data()
+    rows = df[df["Country"] == country].set_index("Datetime (UTC)")[datastore.CARBON_INTENSITY_COLUMN]
+    return rows[~rows.index.duplicated()].reindex(pd.date_range(start, periods=days, freq="D")).to_numpy(dtype=float)
+
+
+@pytest.fixture(autouse=True)
+def fresh_series():
+    timeseries.clear()
+    telemetry.drain()
+    yield
+    timeseries.clear()
+
+
+@pytest.mark.parametrize("location", ["germany", "Germany"])
+def test_observed_carbon_intensity_is_used(location):
+    priced = timeseries.price_windows([1000.0], ["2023-01-01"], [365 * 24], [location])
+    events = telemetry.drain()["events"]
+    assert "timeseries.carbon_intensity.forecast_days" not in events
+    expected = _csv_intensities("Germany", "2023-01-01", 365)
+    assert not np.isnan(expected).any()
+    np.testing.assert_allclose(priced["co2_equivalents"], [expected.mean()], rtol=1e-9)
+    np.testing.assert_allclose(priced["co2"], [1000.0 * expected.mean()], rtol=1e-9)
+
+
+def test_days_after_the_data_are_forecast():
+    timeseries.price_windows([1000.0], ["2024-12-01"], [60 * 24], ["germany"])
+    assert telemetry.drain()["events"]["timeseries.carbon_intensity.forecast_days"] > 0
+
+
+@pytest.mark.parametrize("location", ["germany", "Germany"])
+def test_calculate_co2_equivalents_uses_the_csv(location):
+    intensity, co2 = calculate_co2_equivalents(1000.0, "2023-06-01", location)
+    assert intensity == _csv_intensities("Germany", "2023-06-01", 1)[0]
+    assert co2 == 1000.0 * intensity
+    assert "carbon_intensity.forecast_fallback" not in telemetry.drain()["events"]
+
+
+def test_zero_length_windows_match_start_day_pricing():
+    dates = ["2023-03-01", "2023-09-15"]
+    priced = timeseries.price_windows([500.0, 500.0], dates, [0.0, 0.0], ["germany", "france"])
+    for i, (date, location) in enumerate(zip(dates, ["germany", "france"])):
+        assert priced["cost"][i] == pytest.approx(calculate_cost(500.0, date, location))
+        assert priced["co2"][i] == pytest.approx(calculate_co2_equivalents(500.0, date, location)[1])
+
+
+def test_breakdown_totals_match_price_windows():
+    priced = timeseries.price_windows([2000.0], ["2023-01-20"], [24 * 70], ["italy"])
+    breakdown = timeseries.breakdown(2000.0, "2023-01-20", 24 * 70, "italy", period="month")
+    assert [period["start"][:10] for period in breakdown["periods"]] == ["2023-01-20", "2023-02-01", "2023-03-01"]
+    assert sum(period["energy"] for period in breakdown["periods"]) == pytest.approx(2000.0)
+    assert breakdown["cost"] == pytest.approx(priced["cost"][0])
+    assert breakdown["co2"] == pytest.approx(priced["co2"][0])
+    with pytest.raises(ValueError):
+        timeseries.breakdown(2000.0, "2023-01-20", 24, "italy", period="year")
@@ -107,13 +107,13 @@ const DropdownComponent: React.FC<DropdownComponentProps> = ({
     setIsLoadingProcessors(true);
     setIsLoadingAccelerators(true);
 
-    const requestBody = {
+    const params = {
       model_mlc: dropdownSelections.model_mlc,
     };
 
-    const hardwareData = await axios.post(
-      `${API_BASE_URL}/api/common/getHardware`,
-      requestBody
+    const hardwareData = await axios.get(
+      `${API_BASE_URL}/api/common/hardware`,
+      { params }
     );
 
     if (hardwareData.status === 200) {
@@ -129,14 +129,14 @@ const DropdownComponent: React.FC<DropdownComponentProps> = ({
 
     setIsLoadingAccelerators(true);
 
-    const requestBody = {
+    const params = {
       model_mlc: dropdownSelections.model_mlc,
       processor: dropdownSelections.processor,
     };
 
-    const acceleratorData = await axios.post(
-      `${API_BASE_URL}/api/common/getAccelerators`,
-      requestBody
+    const acceleratorData = await axios.get(
+      `${API_BASE_URL}/api/common/accelerators`,
+      { params }
     );
 
     if (acceleratorData.status === 200) {
@@ -148,7 +148,7 @@ const ModelEfficiencyComponent: React.FC<DropdownData> = ({
       setLoading(true);
       setSelectedBaselineModel("");
       try {
-        const response = await axios.post(`${API_BASE_URL}/api/optimize/getBaselineList`);
+        const response = await axios.get(`${API_BASE_URL}/api/optimize/baselineList`);
         if (response.status === 200) {
           setBaselineModelsDropdown(response.data.baselineList);
           if (response.data.baselineList.length > 0) {
@@ -213,10 +213,10 @@ const ModelEfficiencyComponent: React.FC<DropdownData> = ({
     setLoading(true);
     try {
       setLoading(true);
-      const requestBody = {
+      const params = {
         model_name: selectedBaselineModel,
       };
-      const response = await axios.post(`${API_BASE_URL}/api/optimize/getCompressionList`, requestBody);
+      const response = await axios.get(`${API_BASE_URL}/api/optimize/compressionList`, { params });
       if (response.status === 200) {
         setCompressedModelsDropdown(response.data.compressionList);
         setSelectedTechnique("");
@@ -151,6 +151,7 @@ export default function IndexPage() {
       num_nodes: dropdownSelections.num_nodes,
       num_accelerator: dropdownSelections.num_accelerators,
       data_center_size: dropdownSelections.data_center_size,
+      measurement_id: apiData?.measurementId,
     };
 
     console.log(requestBody);